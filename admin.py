@@ -1,9 +1,13 @@
 # admin.py - UPDATED WITH SUPER ADMIN ROLE ASSIGNMENT AND SECURITY VALIDATION + DIRECT APPROVAL AFTER DEPARTMENT HEAD
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from models import get_db_connection, dict_fetchall, dict_fetchone, hash_password
-from notifications import create_notification
+from notifications import create_notification, create_notifications_bulk, get_role_user_ids
+from notification_outbox import enqueue_notifications, wake_outbox_dispatcher
+from counter_cache import invalidate_counters
+from overdue_severity import SET_OVERDUE_SEVERITY_SQL
+from pagination import keyset_condition, fetch_page, get_page_size
 import MySQLdb
-from datetime import datetime
+from datetime import datetime, timedelta
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -345,15 +349,12 @@ def create_user():
         # ✅ UPDATED: Send notification to both Super Admin and Department Head (if applicable)
         if role != 'system_admin':
             # Notify Super Admin about new user
-            cursor.execute('SELECT id FROM users WHERE role = "system_admin" AND status = "approved"')
-            admins = dict_fetchall(cursor)
-            for admin in admins:
-                create_notification(
-                    admin['id'],
-                    f"👤 NEW USER CREATED: {name} ({username}) as {role.replace('_', ' ').title()}",
-                    'approval',
-                    user_id
-                )
+            create_notifications_bulk(
+                get_role_user_ids(cursor, 'system_admin'),
+                f"👤 NEW USER CREATED: {name} ({username}) as {role.replace('_', ' ').title()}",
+                'approval',
+                user_id
+            )
             
             # If role is department_head, also notify existing department heads
             if role == 'department_head':
@@ -362,13 +363,12 @@ def create_user():
                     WHERE u.department_id = %s AND u.role = "department_head" AND u.status = "approved"
                 ''', (department_id,))
                 existing_dept_heads = dict_fetchall(cursor)
-                for dept_head in existing_dept_heads:
-                    create_notification(
-                        dept_head['id'],
-                        f"🎖️ NEW DEPARTMENT HEAD: {name} assigned as Department Head for your department",
-                        'status',
-                        user_id
-                    )
+                create_notifications_bulk(
+                    [dept_head['id'] for dept_head in existing_dept_heads],
+                    f"🎖️ NEW DEPARTMENT HEAD: {name} assigned as Department Head for your department",
+                    'status',
+                    user_id
+                )
         
         conn.commit()
         
@@ -460,13 +460,12 @@ def update_user(user_id):
                 WHERE u.department_id = %s AND u.id != %s AND u.status = "approved"
             ''', (department_id, user_id))
             dept_users = dict_fetchall(cursor)
-            for user in dept_users:
-                create_notification(
-                    user['id'],
-                    f"🎖️ {name} has been assigned as your new Department Head",
-                    'status',
-                    None
-                )
+            create_notifications_bulk(
+                [user['id'] for user in dept_users],
+                f"🎖️ {name} has been assigned as your new Department Head",
+                'status',
+                None
+            )
         
         return jsonify({'success': True, 'message': 'User updated successfully!'})
         
@@ -558,37 +557,167 @@ def user_approvals():
                          total_users=total_users,
                          now=datetime.now())
 
+GATE_PASS_STATUSES = ('draft', 'pending_dept', 'pending_store', 'pending_security', 'ready_for_dispatch',
+                      'approved', 'rejected', 'inquiry', 'in_transit', 'returned', 'overdue',
+                      'gone_from_gate', 'force_returned')
+
+FULLTEXT_OPERATORS = '+-<>()~*"@'
+
+def _search_condition(text):
+    """Index-backed free text over pass_number / destination / receiver_name.
+
+    Words of 3+ characters go through the FULLTEXT index as prefix terms;
+    shorter input falls back to a pass_number prefix match on its unique index.
+    """
+    # Operators inside a word ("Dhaka-North", "A+B") would be parsed as exclusions /
+    # requirements - split on them like the FULLTEXT tokenizer does instead
+    words = text.translate(str.maketrans(FULLTEXT_OPERATORS, ' ' * len(FULLTEXT_OPERATORS))).split()
+    terms = [word for word in words if len(word) >= 3]
+
+    if terms:
+        boolean_query = ' '.join(f'+{term}*' for term in terms)
+        return ('MATCH(gp.pass_number, gp.destination, gp.receiver_name) AGAINST (%s IN BOOLEAN MODE)',
+                (boolean_query,))
+
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return 'gp.pass_number LIKE %s', (escaped + '%',)
+
+def build_gate_pass_filters(args):
+    """Turn query-string filters into (where_sql, params, active_filters).
+
+    Supported: status, material_type, department_id, division_id, store_location,
+    date_from / date_to (YYYY-MM-DD, inclusive), urgent=1 and q (free text).
+    Unknown or malformed values are ignored rather than rejected.
+    """
+    conditions = []
+    params = []
+    filters = {}
+
+    status = args.get('status', '').strip()
+    if status in GATE_PASS_STATUSES:
+        conditions.append('gp.status = %s')
+        params.append(status)
+        filters['status'] = status
+
+    material_type = args.get('material_type', '').strip()
+    if material_type in ('returnable', 'non_returnable'):
+        conditions.append('gp.material_type = %s')
+        params.append(material_type)
+        filters['material_type'] = material_type
+
+    for field in ('department_id', 'division_id'):
+        value = args.get(field, type=int)
+        if value:
+            conditions.append(f'gp.{field} = %s')
+            params.append(value)
+            filters[field] = value
+
+    store_location = args.get('store_location', '').strip()
+    if store_location in ('store_1', 'store_2'):
+        conditions.append('gp.store_location = %s')
+        params.append(store_location)
+        filters['store_location'] = store_location
+
+    # Half-open range on the raw column so idx_gp_*_created can be used
+    for field, operator, offset in (('date_from', '>=', 0), ('date_to', '<', 1)):
+        value = args.get(field, '').strip()
+        if not value:
+            continue
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            continue
+        conditions.append(f'gp.created_at {operator} %s')
+        params.append(day + timedelta(days=offset))
+        filters[field] = value
+
+    if args.get('urgent') == '1':
+        conditions.append('gp.urgent = TRUE')
+        filters['urgent'] = '1'
+
+    search_text = args.get('q', '').strip()
+    if search_text:
+        search_sql, search_params = _search_condition(search_text)
+        conditions.append(search_sql)
+        params.extend(search_params)
+        filters['q'] = search_text
+
+    where_sql = ' AND '.join(conditions) if conditions else '1=1'
+    return where_sql, tuple(params), filters
+
 @admin_bp.route('/all_gate_passes')
 def all_gate_passes():
+    """All gate passes with server-side filters - HTML first page, ?format=json&cursor=... for more"""
+    wants_json = request.args.get('format') == 'json'
+
     if 'user_id' not in session or session['role'] != 'system_admin':
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Access denied!'})
         flash('Access denied! Only System Admin can view all gate passes.', 'error')
         return redirect(url_for('dashboard'))
     
     conn = get_db_connection()
     if conn is None:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Database connection failed!'})
         flash('Database connection failed!', 'error')
-        return render_template('admin/all_gate_passes.html', gate_passes=[])
+        return render_template('admin/all_gate_passes.html', gate_passes=[], filters={},
+                               departments=[], divisions=[])
     
     cursor = conn.cursor()
+    gate_passes = []
+    next_cursor = None
+    departments = []
+    divisions = []
+    
+    filter_sql, filter_params, filters = build_gate_pass_filters(request.args)
+    page_size = get_page_size(request.args.get('per_page'))
     
     try:
-        cursor.execute('''
+        keyset_sql, keyset_params = keyset_condition(request.args.get('cursor'))
+        gate_passes, next_cursor = fetch_page(cursor, f'''
             SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
             FROM gate_passes gp 
             JOIN users u ON gp.created_by = u.id 
             JOIN departments d ON gp.department_id = d.id 
             JOIN divisions dv ON gp.division_id = dv.id 
-            ORDER BY gp.created_at DESC
-        ''')
-        gate_passes = dict_fetchall(cursor)
+            WHERE {filter_sql} AND {keyset_sql}
+            ORDER BY gp.created_at DESC, gp.id DESC
+        ''', filter_params + keyset_params, page_size)
+        
+        if wants_json:
+            return jsonify({
+                'success': True,
+                'gate_passes': gate_passes,
+                'html': render_template('admin/all_gate_passes_rows.html', gate_passes=gate_passes),
+                'modals_html': render_template('admin/all_gate_passes_modals.html', gate_passes=gate_passes),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'filters': filters
+            })
+        
+        # Filter dropdowns
+        cursor.execute('SELECT id, name FROM divisions ORDER BY name')
+        divisions = dict_fetchall(cursor)
+        cursor.execute('SELECT id, name, division_id FROM departments ORDER BY name')
+        departments = dict_fetchall(cursor)
     except Exception as e:
         print(f"Error fetching gate passes: {e}")
+        if wants_json:
+            return jsonify({'success': False, 'message': f'Error: {str(e)}'})
         gate_passes = []
+        next_cursor = None
     finally:
         cursor.close()
         conn.close()
     
-    return render_template('admin/all_gate_passes.html', gate_passes=gate_passes)
+    return render_template('admin/all_gate_passes.html',
+                           gate_passes=gate_passes,
+                           next_cursor=next_cursor,
+                           page_size=page_size,
+                           filters=filters,
+                           departments=departments,
+                           divisions=divisions)
 
 @admin_bp.route('/approve_gate_pass/<int:gate_pass_id>', methods=['POST'])
 def approve_gate_pass_admin(gate_pass_id):
@@ -607,10 +736,11 @@ def approve_gate_pass_admin(gate_pass_id):
     
     try:
         if action == 'approve':
-            cursor.execute('''
+            cursor.execute(f'''
                 UPDATE gate_passes 
                 SET status = 'approved', security_approval = 'approved',
-                    security_approval_date = %s, store_location = %s
+                    security_approval_date = %s, store_location = %s,
+                    {SET_OVERDUE_SEVERITY_SQL}
                 WHERE id = %s
             ''', (datetime.now(), store_location, gate_pass_id))
             
@@ -618,19 +748,21 @@ def approve_gate_pass_admin(gate_pass_id):
             cursor.execute('SELECT created_by, pass_number FROM gate_passes WHERE id = %s', (gate_pass_id,))
             result = cursor.fetchone()
             if result:
-                create_notification(
-                    result[0],
-                    f"Gate Pass {result[1]} has been approved by System Administrator!",
-                    'status',
-                    gate_pass_id
+                enqueue_notifications(
+                    cursor,
+                    [(result[0],
+                      f"Gate Pass {result[1]} has been approved by System Administrator!",
+                      'status', gate_pass_id)],
+                    event_type='admin_approve', gate_pass_id=gate_pass_id
                 )
             
             message = 'Gate Pass approved!'
             
         elif action == 'reject':
-            cursor.execute('''
+            cursor.execute(f'''
                 UPDATE gate_passes 
-                SET status = 'rejected', security_approval = 'rejected'
+                SET status = 'rejected', security_approval = 'rejected',
+                    {SET_OVERDUE_SEVERITY_SQL}
                 WHERE id = %s
             ''', (gate_pass_id,))
             
@@ -638,11 +770,12 @@ def approve_gate_pass_admin(gate_pass_id):
             cursor.execute('SELECT created_by, pass_number FROM gate_passes WHERE id = %s', (gate_pass_id,))
             result = cursor.fetchone()
             if result:
-                create_notification(
-                    result[0],
-                    f"Gate Pass {result[1]} has been rejected by System Administrator",
-                    'status',
-                    gate_pass_id
+                enqueue_notifications(
+                    cursor,
+                    [(result[0],
+                      f"Gate Pass {result[1]} has been rejected by System Administrator",
+                      'status', gate_pass_id)],
+                    event_type='admin_reject', gate_pass_id=gate_pass_id
                 )
             
             message = 'Gate Pass rejected!'
@@ -666,6 +799,8 @@ def approve_gate_pass_admin(gate_pass_id):
             return jsonify({'success': False, 'message': 'Invalid action!'})
         
         conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         return jsonify({'success': True, 'message': message})
         
     except Exception as e:
@@ -689,6 +824,7 @@ def delete_gate_pass(gate_pass_id):
     try:
         cursor.execute('DELETE FROM gate_passes WHERE id = %s', (gate_pass_id,))
         conn.commit()
+        invalidate_counters()
         
         return jsonify({'success': True, 'message': 'Gate Pass deleted successfully!'})
         
@@ -800,11 +936,12 @@ def process_store_request(request_id):
             ''', (admin_response, session['user_id'], gate_pass_id, request_id))
             
             # Notify store manager
-            create_notification(
-                request_data['store_manager_id'],
-                f"✅ Your store request has been approved! Gate Pass #{pass_number} created.",
-                'status',
-                gate_pass_id
+            enqueue_notifications(
+                cursor,
+                [(request_data['store_manager_id'],
+                  f"✅ Your store request has been approved! Gate Pass #{pass_number} created.",
+                  'status', gate_pass_id)],
+                event_type='store_request_approved', gate_pass_id=gate_pass_id
             )
             
             # Add to material log
@@ -829,11 +966,12 @@ def process_store_request(request_id):
             ''', (admin_response, session['user_id'], request_id))
             
             # Notify store manager
-            create_notification(
-                request_data['store_manager_id'],
-                f"❌ Your store request has been rejected. Reason: {admin_response}",
-                'status',
-                None
+            enqueue_notifications(
+                cursor,
+                [(request_data['store_manager_id'],
+                  f"❌ Your store request has been rejected. Reason: {admin_response}",
+                  'status', None)],
+                event_type='store_request_rejected'
             )
             
             message = 'Store request rejected!'
@@ -842,6 +980,8 @@ def process_store_request(request_id):
             return jsonify({'success': False, 'message': 'Invalid action!'})
         
         conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         return jsonify({'success': True, 'message': message})
         
     except Exception as e:
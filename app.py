@@ -1,19 +1,47 @@
 # app.py - COMPLETE VERSION WITH ALL FEATURES
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory
-from models import get_db_connection, init_db, dict_fetchall, dict_fetchone
-from notifications import start_notification_scheduler, start_overdue_alarm_scheduler, create_notification
+from flask import (Flask, render_template, request, redirect, url_for, flash, session, jsonify,
+                   Response, stream_with_context)
+from werkzeug.security import safe_join
+from models import get_db_connection, dict_fetchall, dict_fetchone
+from migrations import ensure_schema_current
+from dashboard_stats import get_dashboard_stats
+from counter_cache import get_cached_counters, counter_scope, invalidate_counters, add_invalidation_listener
+from pagination import keyset_condition, fetch_page, encode_cursor
+from config import config
+from notifications import (start_notification_scheduler, create_notification,
+                           create_notifications_bulk, get_role_user_ids, get_notification_counts)
+from notification_outbox import (enqueue_notifications, wake_outbox_dispatcher, start_outbox_dispatcher,
+                                 get_outbox_stats)
+from retention import start_retention_scheduler
+from overdue_scheduler import start_overdue_alarm_scheduler, cancel_overdue_check
+from scheduler_leader import start_leader_election, get_leader_elector
+from overdue_severity import OVERDUE_SEVERITY_SQL, SEVERITY_CASE_SQL, SET_OVERDUE_SEVERITY_SQL, overdue_condition
+from image_renditions import parse_photos, photo_src
+from photo_storage import save_photo_stream, PhotoStorageError, get_photo_storage, is_valid_key, content_type_for
+from media_serving import serve_file, serve_bytes, name_etag
+from qr_utils import QR_STORAGE_PREFIX
+from notification_pubsub import (get_broker, publish_counters_changed, notification_version, wait_for_notifications,
+                                 start_live_update_probe, get_probe_stats)
 from auth import auth_bp
 from gate_pass import gate_pass_bp
 from admin import admin_bp
 import MySQLdb
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import json
+import time
 from functools import wraps
 import traceback
 
 app = Flask(__name__)
 app.secret_key = 'gate-pass-system-secret-key-2024'
+app.use_x_sendfile = config['default'].MEDIA_OFFLOAD == 'x-sendfile'  # send_file emits X-Sendfile, the proxy sends the body
+app.add_template_global(photo_src)  # {{ media_url(photo_src(photo, 'print')) }}
+
+@app.template_global()
+def media_url(key):
+    """URL of a stored photo, whichever storage backend holds it"""
+    return url_for('media', key=key)
 
 # ==================== CUSTOM DECORATORS ====================
 def login_required(f):
@@ -51,15 +79,73 @@ app.register_blueprint(admin_bp, url_prefix='/admin')
 
 @app.route('/manifest.json')
 def manifest():
-    return send_from_directory('static', 'manifest.json')
+    return serve_file(os.path.join(app.static_folder, 'manifest.json'),
+                      mimetype='application/manifest+json', max_age=config['default'].STATIC_MAX_AGE)
 
 @app.route('/service-worker.js')
 def service_worker():
-    return send_from_directory('static', 'js/service-worker.js', mimetype='application/javascript')
+    # Always revalidated (a 304 when unchanged) so a new worker is picked up on the next load
+    return serve_file(os.path.join(app.static_folder, 'js', 'service-worker.js'),
+                      mimetype='application/javascript', revalidate=True)
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory('static', 'icons/icon-32x32.png')
+    return serve_file(os.path.join(app.static_folder, 'icons', 'icon-32x32.png'),
+                      max_age=config['default'].STATIC_MAX_AGE)
+
+# Photo storage prefixes under MEDIA_ROOT (= static/) that only the login-protected /media and /qr routes serve
+PROTECTED_STATIC_PREFIXES = ('uploads/', f"{QR_STORAGE_PREFIX}/")
+
+def static_files(filename):
+    """Replaces Flask's static handler: strong ETags, immutable caching for content-hashed assets"""
+    path = safe_join(app.static_folder, filename)
+    if path is None:
+        return 'Not found', 404
+    # Check the normalised path - /static/./uploads/... must not slip past the prefix test
+    relative = os.path.relpath(os.path.normpath(path), app.static_folder).replace(os.sep, '/')
+    if relative.startswith(PROTECTED_STATIC_PREFIXES):
+        return 'Not found', 404
+    return serve_file(path, max_age=config['default'].STATIC_MAX_AGE)
+
+app.view_functions['static'] = static_files
+
+@app.route('/qr/<key>.png')
+@login_required
+def qr_image(key):
+    """Cached QR PNG by content hash - immutable, so browsers keep it for QR_CACHE_MAX_AGE"""
+    from qr_utils import QR_KEY_PATTERN, get_cached_qr_png
+    png = get_cached_qr_png(key) if QR_KEY_PATTERN.match(key) else None
+    if png is None:
+        return 'QR code not found', 404
+    
+    return serve_bytes(png, 'image/png', etag=key, immutable=True, private=True,
+                       max_age=config['default'].QR_CACHE_MAX_AGE)
+
+@app.route('/media/<path:key>')
+@login_required
+def media(key):
+    """Material photos from the photo storage backend (local disk or S3-compatible)"""
+    if not is_valid_key(key):
+        return 'Not found', 404
+    
+    storage = get_photo_storage()
+    if config['default'].PHOTO_SERVE_MODE == 'redirect':
+        direct_url = storage.url(key)
+        if direct_url:
+            # Let the browser reuse the redirect while the presigned URL is still valid
+            response = redirect(direct_url)
+            response.headers['Cache-Control'] = f"private, max-age={config['default'].PHOTO_S3_PRESIGN_SECONDS // 2}"
+            return response
+    
+    local_path = storage.local_path(key)
+    if local_path:
+        return serve_file(local_path, mimetype=content_type_for(key), immutable=True, private=True)
+    
+    try:
+        return serve_bytes(storage.read(key), content_type_for(key), etag=name_etag(key), immutable=True, private=True)
+    except Exception as e:
+        print(f"Media read error for {key}: {e}")
+        return 'Not found', 404
 
 @app.route('/offline')
 def offline():
@@ -74,14 +160,25 @@ if not os.path.exists('static/uploads'):
     os.makedirs('static/uploads')
     print("✅ Created upload folder: static/uploads")
 
-# Initialize database and start scheduler
-with app.app_context():
-    if init_db():
-        print("✅ Database initialized successfully!")
-    else:
-        print("❌ Database initialization failed!")
-    start_notification_scheduler()
-    start_overdue_alarm_scheduler()  # ✅ THIS LINE WAS ADDED
+def start_background_services():
+    """Schema check plus the scheduler / outbox / retention threads - once per app process"""
+    with app.app_context():
+        if ensure_schema_current():
+            print("✅ Database schema is up to date!")
+        else:
+            print("❌ Database initialization failed!")
+        start_leader_election()  # Sweeps below only run in the process holding the leader lock
+        start_notification_scheduler()
+        start_overdue_alarm_scheduler()  # ✅ THIS LINE WAS ADDED
+        start_outbox_dispatcher()
+        start_retention_scheduler()
+        start_live_update_probe()  # Fans every process's notifications / counter changes out to this one's streams
+        add_invalidation_listener(publish_counters_changed)
+
+# Spawned workers (photo renditions) re-import `python app.py` as __mp_main__ -
+# they must not run migrations, join the leader election or start dispatchers
+if __name__ != '__mp_main__':
+    start_background_services()
 
 @app.route('/')
 def index():
@@ -109,276 +206,87 @@ def dashboard():
     cursor = conn.cursor()
     
     try:
-        # Get statistics based on role
-        if session['role'] == 'system_admin':
-            # System Admin - All statistics (NO PENDING APPROVALS)
-            cursor.execute('SELECT COUNT(*) FROM gate_passes')
-            total_passes = cursor.fetchone()[0]
-            
-            # System Admin doesn't need pending approvals count
-            pending_passes = 0
-            
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE material_type = 'returnable' 
-                           AND expected_return_date < NOW() 
-                           AND actual_return_date IS NULL 
-                           AND status = 'approved' ''')
-            overdue_passes = cursor.fetchone()[0]
-            
-            # System Admin doesn't have pending approvals
-            pending_approvals = 0
-            
-            # Approved today
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE DATE(created_at) = CURDATE() 
-                           AND status = 'approved' ''')
-            approved_today = cursor.fetchone()[0]
-            
-            # ✅ FIXED: Recent passes for admin (all)
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
-                ORDER BY gp.created_at DESC 
-                LIMIT 5
-            ''')
+        role = session['role']
+        user_id = session['user_id']
+        department_id = None
+        store_location = None
+        
+        recent_query = '''
+            SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
+            FROM gate_passes gp 
+            JOIN users u ON gp.created_by = u.id 
+            JOIN departments d ON gp.department_id = d.id 
+            JOIN divisions dv ON gp.division_id = dv.id 
+        '''
+        
+        # Recent passes (the list) still depends on role; counters come from one query below
+        if role == 'system_admin':
+            cursor.execute(f"{recent_query} ORDER BY gp.created_at DESC LIMIT 5")
             recent_passes = dict_fetchall(cursor)
             
             # ✅ ADDED: Get pending users count for System Admin badge in sidebar
             cursor.execute('''SELECT COUNT(*) FROM users WHERE status = "pending"''')
-            pending_users_count = cursor.fetchone()[0]
-            
-            # Add to session for sidebar badge
-            session['pending_users_count'] = pending_users_count
+            session['pending_users_count'] = cursor.fetchone()[0]
             
-        elif session['role'] == 'store_manager':
-            # Store Manager - Statistics for store approvals
+        elif role == 'store_manager':
             store_location = 'store_1' if 'store1' in session['username'] else 'store_2'
-            
-            # ✅ FIXED: Total passes for store manager's store location
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE store_location = %s OR status = 'pending_store' ''', (store_location,))
-            total_passes = cursor.fetchone()[0]
-            
-            # Pending store approvals
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE status = 'pending_store' ''')
-            pending_passes = cursor.fetchone()[0]
-            
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE material_type = 'returnable' 
-                           AND expected_return_date < NOW() 
-                           AND actual_return_date IS NULL 
-                           AND status = 'approved' 
-                           AND store_location = %s''', (store_location,))
-            overdue_passes = cursor.fetchone()[0]
-            
-            # Store managers don't have user approvals
-            pending_user_approvals = 0
-            
-            # Pending approvals = pending store approvals
-            pending_approvals = pending_passes
-            
-            # Approved today for this store
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE DATE(created_at) = CURDATE() 
-                           AND status = 'approved' 
-                           AND store_location = %s''', (store_location,))
-            approved_today = cursor.fetchone()[0]
-            
-            # ✅ FIXED: Recent passes for store manager (ALL gate passes, not just pending/approved)
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
+            cursor.execute(f'''{recent_query}
                 WHERE (gp.store_location = %s OR gp.status = 'pending_store')
-                ORDER BY gp.created_at DESC 
-                LIMIT 5
+                ORDER BY gp.created_at DESC LIMIT 5
             ''', (store_location,))
             recent_passes = dict_fetchall(cursor)
             
-        elif session['role'] == 'department_head':
-            # Department Head - Statistics for their department
-            # Get department ID first
-            cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
+        elif role == 'department_head':
+            cursor.execute('SELECT department_id FROM users WHERE id = %s', (user_id,))
             user_dept = cursor.fetchone()
             
             if user_dept:
                 department_id = user_dept[0]
-                
-                cursor.execute('''SELECT COUNT(*) FROM gate_passes gp 
-                               WHERE gp.department_id = %s''', (department_id,))
-                total_passes = cursor.fetchone()[0]
-                
-                cursor.execute('''SELECT COUNT(*) FROM gate_passes gp 
-                               WHERE gp.department_id = %s 
-                               AND gp.status = "pending_dept"''', (department_id,))
-                pending_passes = cursor.fetchone()[0]
-                
-                cursor.execute('''SELECT COUNT(*) FROM gate_passes gp 
-                               WHERE gp.department_id = %s 
-                               AND gp.material_type = 'returnable' 
-                               AND gp.expected_return_date < NOW() 
-                               AND gp.actual_return_date IS NULL 
-                               AND gp.status = 'approved' ''', (department_id,))
-                overdue_passes = cursor.fetchone()[0]
-                
-                # Pending user approvals for Department Head
-                cursor.execute('''SELECT COUNT(*) FROM users u 
-                               WHERE u.department_id = %s 
-                               AND u.status = "pending"''', (department_id,))
-                pending_user_approvals = cursor.fetchone()[0]
-                
-                pending_approvals = pending_user_approvals + pending_passes
-                
-                # Approved today for this department
-                cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                               WHERE department_id = %s 
-                               AND DATE(created_at) = CURDATE() 
-                               AND status = 'approved' ''', (department_id,))
-                approved_today = cursor.fetchone()[0]
-                
-                # ✅ FIXED: Recent passes for department (ALL passes from department)
-                cursor.execute('''
-                    SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
-                    FROM gate_passes gp 
-                    JOIN users u ON gp.created_by = u.id 
-                    JOIN departments d ON gp.department_id = d.id 
-                    JOIN divisions dv ON gp.division_id = dv.id 
+                cursor.execute(f'''{recent_query}
                     WHERE gp.department_id = %s
-                    ORDER BY gp.created_at DESC 
-                    LIMIT 5
+                    ORDER BY gp.created_at DESC LIMIT 5
                 ''', (department_id,))
                 recent_passes = dict_fetchall(cursor)
             else:
-                total_passes = pending_passes = overdue_passes = pending_approvals = approved_today = 0
                 recent_passes = []
             
-        elif session['role'] == 'security':
-            # Security - Statistics for security view
-            # ✅ FIXED: Security can see ALL gate passes (not just approved)
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE department_approval = 'approved' ''')
-            total_passes = cursor.fetchone()[0]
-            
-            # Pending security approvals (just for info)
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE status = 'pending_security' ''')
-            pending_passes = cursor.fetchone()[0]
-            
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE material_type = 'returnable' 
-                           AND expected_return_date < NOW() 
-                           AND actual_return_date IS NULL 
-                           AND status = 'approved' ''')
-            overdue_passes = cursor.fetchone()[0]
-            
-            # Security doesn't approve users
-            pending_user_approvals = 0
-            
-            # Security doesn't need to approve gate passes (view only)
-            pending_approvals = 0
-            
-            # Approved today
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE DATE(created_at) = CURDATE() 
-                           AND status = 'approved' ''')
-            approved_today = cursor.fetchone()[0]
-            
-            # ✅ FIXED: Recent passes for security (ALL department approved gate passes)
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
+        elif role == 'security':
+            cursor.execute(f'''{recent_query}
                 WHERE gp.department_approval = 'approved'
-                ORDER BY gp.created_at DESC 
-                LIMIT 5
+                ORDER BY gp.created_at DESC LIMIT 5
             ''')
             recent_passes = dict_fetchall(cursor)
             
         else:
-            # Regular user - Only their own passes
-            cursor.execute('SELECT COUNT(*) FROM gate_passes WHERE created_by = %s', (session['user_id'],))
-            total_passes = cursor.fetchone()[0]
-            
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE created_by = %s 
-                           AND status IN ("pending_dept", "pending_store", "pending_security")''', (session['user_id'],))
-            pending_passes = cursor.fetchone()[0]
-            
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE created_by = %s 
-                           AND material_type = 'returnable' 
-                           AND expected_return_date < NOW() 
-                           AND actual_return_date IS NULL 
-                           AND status = 'approved' ''', (session['user_id'],))
-            overdue_passes = cursor.fetchone()[0]
-            
-            pending_approvals = 0
-            
-            # Approved today for this user
-            cursor.execute('''SELECT COUNT(*) FROM gate_passes 
-                           WHERE created_by = %s 
-                           AND DATE(created_at) = CURDATE() 
-                           AND status = 'approved' ''', (session['user_id'],))
-            approved_today = cursor.fetchone()[0]
-            
-            # ✅ FIXED: Recent passes for user (their own passes)
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
+            cursor.execute(f'''{recent_query}
                 WHERE gp.created_by = %s
-                ORDER BY gp.created_at DESC 
-                LIMIT 5
-            ''', (session['user_id'],))
+                ORDER BY gp.created_at DESC LIMIT 5
+            ''', (user_id,))
             recent_passes = dict_fetchall(cursor)
         
+        # ✅ All role counters (cards + sidebar overdue badge) in a single aggregation query
+        stats = get_cached_counters(
+            'dashboard', counter_scope(role, user_id),
+            lambda: get_dashboard_stats(cursor, role, user_id, department_id, store_location)
+        )
+        total_passes = stats['total_passes']
+        pending_passes = stats['pending_passes']
+        overdue_passes = stats['overdue_passes']
+        pending_approvals = stats['pending_approvals']
+        approved_today = stats['approved_today']
+        session['overdue_count'] = stats['overdue_count']
+        
         # Get user notifications
         cursor.execute(''' 
             SELECT * FROM notifications 
             WHERE user_id = %s 
             ORDER BY created_at DESC 
             LIMIT 5
-        ''', (session['user_id'],))
+        ''', (user_id,))
         notifications = dict_fetchall(cursor)
         
-        # Get unread notification count
-        cursor.execute(''' 
-            SELECT COUNT(*) FROM notifications 
-            WHERE user_id = %s AND is_read = FALSE
-        ''', (session['user_id'],))
-        unread_notifications = cursor.fetchone()[0]
-        
-        # ✅ ADDED: Get overdue count for sidebar badge
-        cursor.execute('''
-            SELECT COUNT(*) FROM gate_passes 
-            WHERE material_type = 'returnable' 
-            AND expected_return_date < NOW() 
-            AND actual_return_date IS NULL 
-            AND status = 'approved'
-            AND (
-                (created_by = %s) OR
-                (department_id = %s AND %s IN ('department_head', 'system_admin', 'security')) OR
-                (%s = 'store_manager' AND store_location = %s) OR
-                (%s = 'system_admin') OR
-                (%s = 'security')
-            )
-        ''', (session['user_id'], 
-              session.get('department_id', 0), session['role'],
-              session['role'], 'store_1' if 'store1' in session.get('username', '') else 'store_2',
-              session['role'], session['role']))
-
-        overdue_count = cursor.fetchone()[0] or 0
-        session['overdue_count'] = overdue_count
+        # Get unread notification count (denormalized counter)
+        unread_notifications, _ = get_notification_counts(cursor, user_id)
         
     except Exception as e:
         print(f"Dashboard error: {e}")
@@ -545,6 +453,7 @@ def approve_user(user_id, action):
         cursor.execute('UPDATE users SET status = %s WHERE id = %s', (new_status, user_id))
         
         conn.commit()
+        invalidate_counters()
         
         # Create notification for the user
         try:
@@ -568,27 +477,23 @@ def approve_user(user_id, action):
                         AND u.id != %s
                     ''', (user['dept_id'], session['user_id']))
                     dept_heads = dict_fetchall(cursor2)
-                    for dept_head in dept_heads:
-                        create_notification(
-                            dept_head['id'],
-                            f"✅ User {user['name']} from your department has been approved by System Administrator",
-                            'status',
-                            None
-                        )
+                    create_notifications_bulk(
+                        [dept_head['id'] for dept_head in dept_heads],
+                        f"✅ User {user['name']} from your department has been approved by System Administrator",
+                        'status',
+                        None
+                    )
                     cursor2.close()
                     conn2.close()
                 else:
                     conn2 = get_db_connection()
                     cursor2 = conn2.cursor()
-                    cursor2.execute('SELECT id FROM users WHERE role = "system_admin" AND status = "approved"')
-                    admins = dict_fetchall(cursor2)
-                    for admin in admins:
-                        create_notification(
-                            admin['id'],
-                            f"✅ User {user['name']} has been approved by Department Head {session['name']}",
-                            'status',
-                            None
-                        )
+                    create_notifications_bulk(
+                        get_role_user_ids(cursor2, 'system_admin'),
+                        f"✅ User {user['name']} has been approved by Department Head {session['name']}",
+                        'status',
+                        None
+                    )
                     cursor2.close()
                     conn2.close()
             else:
@@ -616,96 +521,69 @@ def approve_user(user_id, action):
         cursor.close()
         conn.close()
 
-def notify_gate_pass_printed(gate_pass_id, printed_by_user_id, printed_by_name):
-    """Send notifications to all parties when security prints a gate pass"""
-    conn = get_db_connection()
-    if conn is None:
+def notify_gate_pass_printed(cursor, gate_pass_id, printed_by_user_id, printed_by_name):
+    """Queue notifications to all parties when security prints a gate pass.
+
+    Runs on the caller's cursor so the outbox event and security log commit
+    together with the print status update.
+    """
+    # Get gate pass details
+    cursor.execute('''
+        SELECT gp.*, u.id as creator_id, u.name as creator_name,
+               d.name as department_name, d.id as department_id,
+               dh.id as dept_head_id, dh.name as dept_head_name,
+               sm.id as store_manager_id, sm.name as store_manager_name
+        FROM gate_passes gp 
+        JOIN users u ON gp.created_by = u.id 
+        JOIN departments d ON gp.department_id = d.id 
+        LEFT JOIN users dh ON d.id = dh.department_id AND dh.role = 'department_head' AND dh.status = 'approved'
+        LEFT JOIN users sm ON gp.store_location = CASE 
+            WHEN sm.username = 'store1' THEN 'store_1'
+            WHEN sm.username = 'store2' THEN 'store_2'
+            ELSE NULL 
+        END AND sm.role = 'store_manager' AND sm.status = 'approved'
+        WHERE gp.id = %s
+    ''', (gate_pass_id,))
+    
+    gate_pass = dict_fetchone(cursor)
+    
+    if not gate_pass:
         return False
     
-    cursor = conn.cursor()
+    pass_number = gate_pass['pass_number']
     
-    try:
-        # Get gate pass details
-        cursor.execute('''
-            SELECT gp.*, u.id as creator_id, u.name as creator_name,
-                   d.name as department_name, d.id as department_id,
-                   dh.id as dept_head_id, dh.name as dept_head_name,
-                   sm.id as store_manager_id, sm.name as store_manager_name
-            FROM gate_passes gp 
-            JOIN users u ON gp.created_by = u.id 
-            JOIN departments d ON gp.department_id = d.id 
-            LEFT JOIN users dh ON d.id = dh.department_id AND dh.role = 'department_head' AND dh.status = 'approved'
-            LEFT JOIN users sm ON gp.store_location = CASE 
-                WHEN sm.username = 'store1' THEN 'store_1'
-                WHEN sm.username = 'store2' THEN 'store_2'
-                ELSE NULL 
-            END AND sm.role = 'store_manager' AND sm.status = 'approved'
-            WHERE gp.id = %s
-        ''', (gate_pass_id,))
-        
-        gate_pass = dict_fetchone(cursor)
-        
-        if not gate_pass:
-            return False
-        
-        pass_number = gate_pass['pass_number']
-        
-        # Send notifications to all parties
-        
+    # Notify all parties - one outbox event, committed with the print update
+    rows = [
         # 1. Notify CREATOR (user who created the gate pass)
-        create_notification(
-            gate_pass['creator_id'],
-            f"🖨️ Gate Pass {pass_number} has been printed and material has left the gate by Security ({printed_by_name})",
-            'status',
-            gate_pass_id
-        )
-        
+        (gate_pass['creator_id'],
+         f"🖨️ Gate Pass {pass_number} has been printed and material has left the gate by Security ({printed_by_name})",
+         'status', gate_pass_id),
         # 2. Notify DEPARTMENT HEAD (if exists)
-        if gate_pass['dept_head_id']:
-            create_notification(
-                gate_pass['dept_head_id'],
-                f"🖨️ Gate Pass {pass_number} from your department has left the gate",
-                'status',
-                gate_pass_id
-            )
-        
+        (gate_pass['dept_head_id'],
+         f"🖨️ Gate Pass {pass_number} from your department has left the gate",
+         'status', gate_pass_id),
         # 3. Notify STORE MANAGER (if store was involved)
-        if gate_pass['store_manager_id']:
-            create_notification(
-                gate_pass['store_manager_id'],
-                f"🖨️ Gate Pass {pass_number} has left the gate",
-                'status',
-                gate_pass_id
-            )
-        
-        # 4. Notify ALL SYSTEM ADMINS
-        cursor.execute('SELECT id FROM users WHERE role = "system_admin" AND status = "approved"')
-        admins = dict_fetchall(cursor)
-        for admin in admins:
-            create_notification(
-                admin['id'],
-                f"🖨️ Gate Pass {pass_number} has left the gate (Printed by Security: {printed_by_name})",
-                'alert',
-                gate_pass_id
-            )
-        
-        # 5. Log the printing event in security logs
-        cursor.execute('''
-            INSERT INTO security_logs (gate_pass_id, user_id, alert_type, details)
-            VALUES (%s, %s, 'dispatched_from_gate', %s)
-        ''', (gate_pass_id, printed_by_user_id, 
-              f'Gate pass printed and material left the gate. Dispatched by: {printed_by_name}'))
-        
-        conn.commit()
-        return True
-        
-    except Exception as e:
-        print(f"Error sending print notifications: {e}")
-        conn.rollback()
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+        (gate_pass['store_manager_id'],
+         f"🖨️ Gate Pass {pass_number} has left the gate",
+         'status', gate_pass_id)
+    ]
+    
+    # 4. Notify ALL SYSTEM ADMINS
+    enqueue_notifications(
+        cursor, rows,
+        [('system_admin', f"🖨️ Gate Pass {pass_number} has left the gate (Printed by Security: {printed_by_name})",
+          'alert', gate_pass_id)],
+        event_type='gate_pass_printed', gate_pass_id=gate_pass_id
+    )
+    
+    # 5. Log the printing event in security logs
+    cursor.execute('''
+        INSERT INTO security_logs (gate_pass_id, user_id, alert_type, details)
+        VALUES (%s, %s, 'dispatched_from_gate', %s)
+    ''', (gate_pass_id, printed_by_user_id, 
+          f'Gate pass printed and material left the gate. Dispatched by: {printed_by_name}'))
+    
+    return True
 
 # ✅ ADDED: Security Approve/Reject Gate Pass
 @app.route('/security/approve_gate_pass/<int:gate_pass_id>/<action>', methods=['POST'])
@@ -757,23 +635,19 @@ def security_approve_gate_pass(gate_pass_id, action):
             message = f"❌ Gate Pass {gate_pass['pass_number']} rejected by Security."
         
         # Update gate pass
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE gate_passes 
             SET status = %s, security_approval = %s, security_approval_date = %s,
-                approved_by_security = %s
+                approved_by_security = %s,
+                {SET_OVERDUE_SEVERITY_SQL}
             WHERE id = %s
         ''', (new_status, security_approval_status, datetime.now(), session['name'], gate_pass_id))
         
-        conn.commit()
-        
-        # Notify all parties
+        # Notify all parties (outbox event, committed with the update)
         # 1. Notify creator
-        create_notification(
-            gate_pass['created_by'],
-            f"🛡️ Your Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
-            'status',
-            gate_pass_id
-        )
+        rows = [(gate_pass['created_by'],
+                 f"🛡️ Your Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
+                 'status', gate_pass_id)]
         
         # 2. Notify department head
         cursor.execute('''
@@ -786,12 +660,9 @@ def security_approve_gate_pass(gate_pass_id, action):
         
         dept_head = cursor.fetchone()
         if dept_head:
-            create_notification(
-                dept_head[0],
-                f"🛡️ Gate Pass {gate_pass['pass_number']} from your department has been {action}d by Security",
-                'status',
-                gate_pass_id
-            )
+            rows.append((dept_head[0],
+                         f"🛡️ Gate Pass {gate_pass['pass_number']} from your department has been {action}d by Security",
+                         'status', gate_pass_id))
         
         # 3. Notify store manager (if store was involved)
         if gate_pass['store_location']:
@@ -802,23 +673,21 @@ def security_approve_gate_pass(gate_pass_id, action):
             ''')
             store_manager = cursor.fetchone()
             if store_manager:
-                create_notification(
-                    store_manager[0],
-                    f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
-                    'status',
-                    gate_pass_id
-                )
+                rows.append((store_manager[0],
+                             f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
+                             'status', gate_pass_id))
         
         # 4. Notify all system admins
-        cursor.execute('SELECT id FROM users WHERE role = "system_admin" AND status = "approved"')
-        admins = dict_fetchall(cursor)
-        for admin in admins:
-            create_notification(
-                admin['id'],
-                f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security ({session['name']})",
-                'status',
-                gate_pass_id
-            )
+        enqueue_notifications(
+            cursor, rows,
+            [('system_admin', f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security ({session['name']})",
+              'status', gate_pass_id)],
+            event_type=f'security_{action}', gate_pass_id=gate_pass_id
+        )
+        
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         
         return jsonify({'success': True, 'message': message})
         
@@ -911,6 +780,7 @@ def security_scan_qr():
             UPDATE gate_passes 
             SET actual_return_date = %s, 
                 status = 'returned',
+                overdue_severity = 'none',
                 security_approval_date = %s,
                 returned_by_security = %s
             WHERE id = %s
@@ -923,51 +793,42 @@ def security_scan_qr():
         ''', (gate_pass['id'], session['user_id'], 
               f'Material returned via QR scan. Scanned by: {session["name"]}, Gate Pass: {pass_number}'))
         
-        conn.commit()
-        
         # ✅ FIXED: Send notifications to ALL parties
         notifications_sent = []
         
         # 1. Notify Creator
-        create_notification(
-            gate_pass['creator_id'],
-            f"✅ আপনার Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে। Security: {session['name']}",
-            'status',
-            gate_pass['id']
-        )
+        rows = [(gate_pass['creator_id'],
+                 f"✅ আপনার Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে। Security: {session['name']}",
+                 'status', gate_pass['id'])]
         notifications_sent.append('Creator')
         
         # 2. Notify Department Head (if exists)
         if gate_pass['dept_head_id']:
-            create_notification(
-                gate_pass['dept_head_id'],
-                f"📦 আপনার ডিপার্টমেন্টের Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে",
-                'status',
-                gate_pass['id']
-            )
+            rows.append((gate_pass['dept_head_id'],
+                         f"📦 আপনার ডিপার্টমেন্টের Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে",
+                         'status', gate_pass['id']))
             notifications_sent.append('Department Head')
         
         # 3. Notify Store Manager (if store was involved)
         if gate_pass['store_manager_id']:
-            create_notification(
-                gate_pass['store_manager_id'],
-                f"📦 Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে",
-                'status',
-                gate_pass['id']
-            )
+            rows.append((gate_pass['store_manager_id'],
+                         f"📦 Gate Pass {pass_number} এর মালামাল রিটার্ন হয়েছে",
+                         'status', gate_pass['id']))
             notifications_sent.append('Store Manager')
         
         # 4. Notify ALL System Admins
-        cursor.execute('SELECT id, name FROM users WHERE role = "system_admin" AND status = "approved"')
-        admins = dict_fetchall(cursor)
-        for admin in admins:
-            create_notification(
-                admin['id'],
-                f"🔄 Material Return: Gate Pass {pass_number} ({gate_pass['department_name']}) returned by {session['name']}",
-                'status',
-                gate_pass['id']
-            )
-        notifications_sent.append(f'{len(admins)} System Admins')
+        enqueue_notifications(
+            cursor, rows,
+            [('system_admin', f"🔄 Material Return: Gate Pass {pass_number} ({gate_pass['department_name']}) returned by {session['name']}",
+              'status', gate_pass['id'])],
+            event_type='material_returned', gate_pass_id=gate_pass['id']
+        )
+        notifications_sent.append('System Admins')
+        
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
+        cancel_overdue_check(gate_pass['id'])
         
         return jsonify({
             'success': True,
@@ -1069,6 +930,7 @@ def manual_return_gate_pass():
             UPDATE gate_passes 
             SET actual_return_date = %s, 
                 status = 'returned',
+                overdue_severity = 'none',
                 security_approval_date = %s,
                 returned_by_security = %s
             WHERE id = %s
@@ -1081,51 +943,42 @@ def manual_return_gate_pass():
         ''', (gate_pass['id'], session['user_id'], 
               f'Material returned manually. Gate Pass: {pass_number}. Handled by: {session["name"]}'))
         
-        conn.commit()
-        
         # ✅ Send notifications
         notifications_sent = []
         
         # 1. Notify Creator
-        create_notification(
-            gate_pass['creator_id'],
-            f"✅ আপনার Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে। Security: {session['name']}",
-            'status',
-            gate_pass['id']
-        )
+        rows = [(gate_pass['creator_id'],
+                 f"✅ আপনার Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে। Security: {session['name']}",
+                 'status', gate_pass['id'])]
         notifications_sent.append('Creator')
         
         # 2. Notify Department Head (if exists)
         if dept_head:
-            create_notification(
-                dept_head['id'],
-                f"📦 আপনার ডিপার্টমেন্টের Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে",
-                'status',
-                gate_pass['id']
-            )
+            rows.append((dept_head['id'],
+                         f"📦 আপনার ডিপার্টমেন্টের Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে",
+                         'status', gate_pass['id']))
             notifications_sent.append('Department Head')
         
         # 3. Notify Store Manager (if store was involved)
         if store_manager_id:
-            create_notification(
-                store_manager_id,
-                f"📦 Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে",
-                'status',
-                gate_pass['id']
-            )
+            rows.append((store_manager_id,
+                         f"📦 Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে",
+                         'status', gate_pass['id']))
             notifications_sent.append('Store Manager')
         
         # 4. Notify ALL System Admins
-        cursor.execute('SELECT id, name FROM users WHERE role = "system_admin" AND status = "approved"')
-        admins = dict_fetchall(cursor)
-        for admin in admins:
-            create_notification(
-                admin['id'],
-                f"🔄 Manual Return: Gate Pass {pass_number} ({gate_pass['department_name']}) returned manually by {session['name']}",
-                'status',
-                gate_pass['id']
-            )
-        notifications_sent.append(f'{len(admins)} System Admins')
+        enqueue_notifications(
+            cursor, rows,
+            [('system_admin', f"🔄 Manual Return: Gate Pass {pass_number} ({gate_pass['department_name']}) returned manually by {session['name']}",
+              'status', gate_pass['id'])],
+            event_type='material_returned_manual', gate_pass_id=gate_pass['id']
+        )
+        notifications_sent.append('System Admins')
+        
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
+        cancel_overdue_check(gate_pass['id'])
         
         cursor.close()
         conn.close()
@@ -1192,30 +1045,34 @@ def security_print_gate_pass(gate_pass_id):
             gate_pass['images_list'] = json.loads(gate_pass['images']) if gate_pass['images'] else []
         except:
             gate_pass['images_list'] = []
+        gate_pass['photos'] = parse_photos(gate_pass)
         
-        # Generate QR codes
-        from qr_utils import generate_qr_code
+        # QR codes (cached PNG URLs - rendered once per payload)
+        from qr_utils import qr_image_url
         if gate_pass['qr_code_form']:
-            gate_pass['qr_form_img'] = generate_qr_code(gate_pass['qr_code_form'])
+            gate_pass['qr_form_img'] = qr_image_url(gate_pass['qr_code_form'])
         
         if gate_pass['qr_code_sticker']:
-            gate_pass['qr_sticker_img'] = generate_qr_code(gate_pass['qr_code_sticker'])
+            gate_pass['qr_sticker_img'] = qr_image_url(gate_pass['qr_code_sticker'])
         
         # ✅ CRITICAL UPDATE: Update gate pass status to 'gone_from_gate' when security prints
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE gate_passes 
             SET status = 'gone_from_gate',
                 security_approval = 'approved',
                 security_approval_date = %s,
                 approved_by_security = %s,
-                gate_exit_time = %s
+                gate_exit_time = %s,
+                {SET_OVERDUE_SEVERITY_SQL}
             WHERE id = %s
         ''', (datetime.now(), session['name'], datetime.now(), gate_pass_id))
         
-        conn.commit()
+        # ✅ Notifications + security log go in the same transaction as the status change
+        notify_gate_pass_printed(cursor, gate_pass_id, session['user_id'], session['name'])
         
-        # ✅ Now send notifications to all parties
-        notify_gate_pass_printed(gate_pass_id, session['user_id'], session['name'])
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         
     except Exception as e:
         print(f"Print error: {e}")
@@ -1293,24 +1150,26 @@ def mark_returned(gate_pass_id):
     try:
         cursor.execute('''
             UPDATE gate_passes 
-            SET actual_return_date = %s, status = 'returned' 
+            SET actual_return_date = %s, status = 'returned', overdue_severity = 'none'
             WHERE id = %s AND material_type = 'returnable'
         ''', (datetime.now(), gate_pass_id))
         
         if cursor.rowcount > 0:
-            conn.commit()
-            
-            # Notify creator
+            # Notify creator (outbox event, committed with the update)
             cursor.execute('SELECT created_by, pass_number FROM gate_passes WHERE id = %s', (gate_pass_id,))
             result = cursor.fetchone()
             if result:
-                create_notification(
-                    result[0],
-                    f"Your material with Gate Pass {result[1]} has been returned",
-                    'status',
-                    gate_pass_id
+                enqueue_notifications(
+                    cursor,
+                    [(result[0], f"Your material with Gate Pass {result[1]} has been returned", 'status', gate_pass_id)],
+                    event_type='material_returned', gate_pass_id=gate_pass_id
                 )
             
+            conn.commit()
+            invalidate_counters()
+            wake_outbox_dispatcher()
+            cancel_overdue_check(gate_pass_id)
+            
             return jsonify({'success': True, 'message': 'Material marked as returned!'})
         else:
             return jsonify({'success': False, 'message': 'Gate pass not found or not returnable'})
@@ -1335,7 +1194,7 @@ def overdue_returns():
     cursor = conn.cursor()
     
     try:
-        base_query = '''
+        base_query = f'''
             SELECT gp.*, u.name as creator_name, u.id as creator_id,
                    d.name as department_name, dv.name as division_name,
                    u.department_id as creator_dept_id,
@@ -1345,10 +1204,7 @@ def overdue_returns():
             JOIN users u ON gp.created_by = u.id
             JOIN departments d ON gp.department_id = d.id
             JOIN divisions dv ON gp.division_id = dv.id
-            WHERE gp.material_type = 'returnable' 
-            AND gp.expected_return_date < NOW() 
-            AND gp.actual_return_date IS NULL
-            AND gp.status = 'approved'
+            WHERE {overdue_condition('gp')}
         '''
         
         if session['role'] == 'system_admin':
@@ -1394,15 +1250,12 @@ def overdue_returns():
             overdue_passes = dict_fetchall(cursor)
         
         # Get statistics
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT COUNT(*) as total_overdue,
-                   COUNT(CASE WHEN TIMESTAMPDIFF(DAY, expected_return_date, NOW()) > 7 THEN 1 END) as critical_overdue,
-                   COUNT(CASE WHEN TIMESTAMPDIFF(DAY, expected_return_date, NOW()) BETWEEN 1 AND 7 THEN 1 END) as high_overdue
+                   COUNT(CASE WHEN {SEVERITY_CASE_SQL} = 'critical' THEN 1 END) as critical_overdue,
+                   COUNT(CASE WHEN {SEVERITY_CASE_SQL} IN ('warning', 'urgent') THEN 1 END) as high_overdue
             FROM gate_passes
-            WHERE material_type = 'returnable' 
-            AND expected_return_date < NOW() 
-            AND actual_return_date IS NULL
-            AND status = 'approved'
+            WHERE {OVERDUE_SEVERITY_SQL}
         ''')
         stats = dict_fetchone(cursor)
         
@@ -1460,10 +1313,15 @@ def returns_list_page():
 @app.route('/api/returns_list')
 @login_required
 def api_returns_list():
-    """Get paginated returns list"""
+    """Get paginated returns list.
+
+    Pass ?cursor= (from next_cursor) for keyset paging on (actual_return_date, id);
+    ?page= still works as an OFFSET fallback for direct page jumps.
+    """
     # Get pagination and filter parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), config['default'].GATE_PASS_MAX_PAGE_SIZE)
+    page_cursor = request.args.get('cursor', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     department_id = request.args.get('department_id', '', type=str)
@@ -1475,63 +1333,87 @@ def api_returns_list():
     cursor = conn.cursor()
     
     try:
-        # Base query for returned gate passes
-        base_query = '''
-            SELECT gp.*, u.name as creator_name, u.id as creator_id,
-                   d.name as department_name, dv.name as division_name,
-                   DATE(gp.actual_return_date) as return_date,
-                   TIME(gp.actual_return_date) as return_time,
-                   DATE(gp.created_at) as created_date,
-                   CASE 
-                       WHEN gp.security_approval_date IS NOT NULL THEN 'qr_scan'
-                       ELSE 'manual'
-                   END as return_type
-            FROM gate_passes gp
-            JOIN users u ON gp.created_by = u.id
-            JOIN departments d ON gp.department_id = d.id
-            JOIN divisions dv ON gp.division_id = dv.id
-            WHERE gp.actual_return_date IS NOT NULL
-        '''
+        conditions = ['gp.actual_return_date IS NOT NULL']
+        params = []
         
         # Role-based filtering
         if session['role'] == 'user':
-            base_query += ' AND gp.created_by = %s'
-            params = [session['user_id']]
+            conditions.append('gp.created_by = %s')
+            params.append(session['user_id'])
         elif session['role'] == 'department_head':
             cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
             user_dept = cursor.fetchone()
             if user_dept:
-                base_query += ' AND gp.department_id = %s'
-                params = [user_dept[0]]
+                conditions.append('gp.department_id = %s')
+                params.append(user_dept[0])
             else:
                 return jsonify({'success': True, 'returns': [], 'total': 0})
-        else:
-            params = []
-        
-        # Additional filters
-        if date_from:
-            base_query += ' AND DATE(gp.actual_return_date) >= %s'
-            params.append(date_from)
         
-        if date_to:
-            base_query += ' AND DATE(gp.actual_return_date) <= %s'
-            params.append(date_to)
+        # Additional filters - half-open ranges on the raw column keep the index usable
+        try:
+            if date_from:
+                conditions.append('gp.actual_return_date >= %s')
+                params.append(datetime.strptime(date_from, '%Y-%m-%d'))
+            
+            if date_to:
+                conditions.append('gp.actual_return_date < %s')
+                params.append(datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'})
         
         if department_id:
-            base_query += ' AND gp.department_id = %s'
+            conditions.append('gp.department_id = %s')
             params.append(int(department_id))
         
-        # Count total
-        count_query = 'SELECT COUNT(*) FROM (' + base_query + ') as t'
-        cursor.execute(count_query, tuple(params))
-        total_count = cursor.fetchone()[0]
+        where_sql = ' AND '.join(conditions)
+        
+        # Total is cached until a return happens (invalidate_counters) - no recount per page
+        def load_total():
+            cursor.execute(f'SELECT COUNT(*) FROM gate_passes gp WHERE {where_sql}', tuple(params))
+            return cursor.fetchone()[0]
         
-        # Get paginated data
-        base_query += ' ORDER BY gp.actual_return_date DESC LIMIT %s OFFSET %s'
-        params.extend([per_page, (page - 1) * per_page])
+        total_scope = (session['role'], session['user_id'], date_from, date_to, department_id)
+        total_count = get_cached_counters('returns_total', total_scope, load_total,
+                                          ttl=config['default'].RETURNS_TOTAL_CACHE_TTL)
+        
+        select_sql = f'''
+            SELECT gp.*, u.name as creator_name, u.id as creator_id,
+                   d.name as department_name, dv.name as division_name,
+                   DATE(gp.actual_return_date) as return_date,
+                   DATE_FORMAT(gp.actual_return_date, '%%H:%%i:%%s') as return_time,
+                   DATE(gp.created_at) as created_date,
+                   CASE 
+                       WHEN gp.security_approval_date IS NOT NULL THEN 'qr_scan'
+                       ELSE 'manual'
+                   END as return_type
+            FROM gate_passes gp
+            JOIN users u ON gp.created_by = u.id
+            JOIN departments d ON gp.department_id = d.id
+            JOIN divisions dv ON gp.division_id = dv.id
+            WHERE {where_sql}
+        '''
         
-        cursor.execute(base_query, tuple(params))
-        returns = dict_fetchall(cursor)
+        if page_cursor or page == 1:
+            # Keyset: cost is the same for page 2 and page 2000
+            keyset_sql, keyset_params = keyset_condition(page_cursor, 'gp.actual_return_date', 'gp.id')
+            returns, next_cursor = fetch_page(
+                cursor,
+                f'{select_sql} AND {keyset_sql} ORDER BY gp.actual_return_date DESC, gp.id DESC',
+                tuple(params) + keyset_params,
+                per_page,
+                sort_key='actual_return_date'
+            )
+        else:
+            # OFFSET fallback for clients that jump straight to ?page=N
+            cursor.execute(
+                f'{select_sql} ORDER BY gp.actual_return_date DESC, gp.id DESC LIMIT %s OFFSET %s',
+                tuple(params) + (per_page + 1, (page - 1) * per_page)
+            )
+            returns = dict_fetchall(cursor)
+            next_cursor = None
+            if len(returns) > per_page:
+                returns = returns[:per_page]
+                next_cursor = encode_cursor(returns[-1]['actual_return_date'], returns[-1]['id'])
         
         return jsonify({
             'success': True,
@@ -1539,7 +1421,9 @@ def api_returns_list():
             'total': total_count,
             'per_page': per_page,
             'current_page': page,
-            'total_pages': (total_count + per_page - 1) // per_page
+            'total_pages': (total_count + per_page - 1) // per_page,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except Exception as e:
@@ -1554,164 +1438,116 @@ def api_returns_list():
 @login_required
 def api_returns_statistics():
     """Get returns statistics"""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'success': False, 'message': 'Database connection failed!'})
-    
-    cursor = conn.cursor()
+    role = session['role']
+    user_id = session['user_id']
     
-    try:
-        statistics = {}
-        
-        # Total returns
-        if session['role'] == 'user':
-            cursor.execute('''
-                SELECT COUNT(*) FROM gate_passes 
-                WHERE actual_return_date IS NOT NULL AND created_by = %s
-            ''', (session['user_id'],))
-        elif session['role'] == 'department_head':
-            cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
-            user_dept = cursor.fetchone()
-            if user_dept:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM gate_passes 
-                    WHERE actual_return_date IS NOT NULL AND department_id = %s
-                ''', (user_dept[0],))
-            else:
-                cursor.execute('SELECT 0')
-        else:
-            cursor.execute('SELECT COUNT(*) FROM gate_passes WHERE actual_return_date IS NOT NULL')
-        
-        statistics['total_returns'] = cursor.fetchone()[0]
-        
-        # Today's returns
-        if session['role'] == 'user':
-            cursor.execute('''
-                SELECT COUNT(*) FROM gate_passes 
-                WHERE DATE(actual_return_date) = CURDATE() AND created_by = %s
-            ''', (session['user_id'],))
-        elif session['role'] == 'department_head':
-            if user_dept:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM gate_passes 
-                    WHERE DATE(actual_return_date) = CURDATE() AND department_id = %s
-                ''', (user_dept[0],))
-            else:
-                cursor.execute('SELECT 0')
-        else:
-            cursor.execute('SELECT COUNT(*) FROM gate_passes WHERE DATE(actual_return_date) = CURDATE()')
-        
-        statistics['today_returns'] = cursor.fetchone()[0]
-        
-        # This week's returns
-        if session['role'] == 'user':
-            cursor.execute('''
-                SELECT COUNT(*) FROM gate_passes 
-                WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 7 DAY) AND created_by = %s
-            ''', (session['user_id'],))
-        elif session['role'] == 'department_head':
-            if user_dept:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM gate_passes 
-                    WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 7 DAY) AND department_id = %s
-                ''', (user_dept[0],))
-            else:
-                cursor.execute('SELECT 0')
-        else:
-            cursor.execute('SELECT COUNT(*) FROM gate_passes WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 7 DAY)')
+    def load_statistics():
+        conn = get_db_connection()
+        if conn is None:
+            return None
         
-        statistics['week_returns'] = cursor.fetchone()[0]
+        cursor = conn.cursor()
         
-        # This month's returns
-        if session['role'] == 'user':
-            cursor.execute('''
-                SELECT COUNT(*) FROM gate_passes 
-                WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 30 DAY) AND created_by = %s
-            ''', (session['user_id'],))
-        elif session['role'] == 'department_head':
-            if user_dept:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM gate_passes 
-                    WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 30 DAY) AND department_id = %s
-                ''', (user_dept[0],))
+        try:
+            # Role scope
+            if role == 'user':
+                scope_sql, params = ' AND created_by = %s', (user_id,)
+            elif role == 'department_head':
+                cursor.execute('SELECT department_id FROM users WHERE id = %s', (user_id,))
+                user_dept = cursor.fetchone()
+                if not user_dept:
+                    return {'total_returns': 0, 'today_returns': 0, 'week_returns': 0, 'month_returns': 0}
+                scope_sql, params = ' AND department_id = %s', (user_dept[0],)
             else:
-                cursor.execute('SELECT 0')
-        else:
-            cursor.execute('SELECT COUNT(*) FROM gate_passes WHERE actual_return_date >= DATE_SUB(NOW(), INTERVAL 30 DAY)')
-        
-        statistics['month_returns'] = cursor.fetchone()[0]
-        
-        return jsonify({'success': True, 'statistics': statistics})
-        
-    except Exception as e:
-        print(f"Error loading statistics: {e}")
-        return jsonify({'success': False, 'message': str(e)})
-    finally:
-        cursor.close()
-        conn.close()
+                scope_sql, params = '', ()
+            
+            # Total / today / week / month in a single pass over returned rows
+            cursor.execute(f'''
+                SELECT COUNT(*) as total_returns,
+                       COALESCE(SUM(actual_return_date >= CURDATE()), 0) as today_returns,
+                       COALESCE(SUM(actual_return_date >= DATE_SUB(NOW(), INTERVAL 7 DAY)), 0) as week_returns,
+                       COALESCE(SUM(actual_return_date >= DATE_SUB(NOW(), INTERVAL 30 DAY)), 0) as month_returns
+                FROM gate_passes 
+                WHERE actual_return_date IS NOT NULL{scope_sql}
+            ''', params)
+            
+            row = dict_fetchone(cursor)
+            return {key: int(value or 0) for key, value in row.items()}
+            
+        except Exception as e:
+            print(f"Error loading statistics: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    
+    statistics = get_cached_counters('returns_statistics', counter_scope(role, user_id), load_statistics)
+    
+    if statistics is None:
+        return jsonify({'success': False, 'message': 'Could not load statistics!'})
+    
+    return jsonify({'success': True, 'statistics': statistics})
 
 @app.route('/api/check_overdue_alarm')
 @login_required
 def check_overdue_alarm():
     """Check if user has overdue materials for alarm"""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'has_overdue': False, 'overdue_count': 0})
-    
-    cursor = conn.cursor()
+    role = session['role']
+    user_id = session['user_id']
+    username = session.get('username', '')
     
-    try:
-        base_query = '''
-            SELECT COUNT(*) as overdue_count
-            FROM gate_passes gp
-            WHERE gp.material_type = 'returnable' 
-            AND gp.expected_return_date < NOW() 
-            AND gp.actual_return_date IS NULL
-            AND gp.status = 'approved'
-        '''
+    def load_overdue_count():
+        conn = get_db_connection()
+        if conn is None:
+            return None
         
-        if session['role'] == 'system_admin':
-            # System Admin - all overdue
-            cursor.execute(base_query)
-            
-        elif session['role'] == 'store_manager':
-            # Store Manager - their store's overdue
-            store_location = 'store_1' if 'store1' in session['username'] else 'store_2'
-            cursor.execute(f"{base_query} AND gp.store_location = %s", (store_location,))
+        cursor = conn.cursor()
+        
+        try:
+            base_query = f'''
+                SELECT COUNT(*) as overdue_count
+                FROM gate_passes gp
+                WHERE {overdue_condition('gp')}
+            '''
             
-        elif session['role'] == 'security':
-            # Security - all overdue
-            cursor.execute(base_query)
+            if role in ('system_admin', 'security'):
+                # System Admin / Security - all overdue
+                cursor.execute(base_query)
+                
+            elif role == 'store_manager':
+                # Store Manager - their store's overdue
+                store_location = 'store_1' if 'store1' in username else 'store_2'
+                cursor.execute(f"{base_query} AND gp.store_location = %s", (store_location,))
+                
+            elif role == 'department_head':
+                # Department Head - their department's overdue
+                cursor.execute('SELECT department_id FROM users WHERE id = %s', (user_id,))
+                dept_result = cursor.fetchone()
+                
+                if not dept_result:
+                    return 0
+                cursor.execute(f"{base_query} AND gp.department_id = %s", (dept_result[0],))
+                    
+            else:
+                # Regular user - their own overdue
+                cursor.execute(f"{base_query} AND gp.created_by = %s", (user_id,))
             
-        elif session['role'] == 'department_head':
-            # Department Head - their department's overdue
-            cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
-            dept_result = cursor.fetchone()
+            result = cursor.fetchone()
+            return result[0] if result else 0
             
-            if dept_result:
-                department_id = dept_result[0]
-                cursor.execute(f"{base_query} AND gp.department_id = %s", (department_id,))
-            else:
-                return jsonify({'has_overdue': False, 'overdue_count': 0})
-                
-        else:
-            # Regular user - their own overdue
-            cursor.execute(f"{base_query} AND gp.created_by = %s", (session['user_id'],))
-        
-        result = cursor.fetchone()
-        overdue_count = result[0] if result else 0
-        
-        return jsonify({
-            'has_overdue': overdue_count > 0,
-            'overdue_count': overdue_count
-        })
-        
-    except Exception as e:
-        print(f"Alarm check error: {e}")
-        return jsonify({'has_overdue': False, 'overdue_count': 0})
-    finally:
-        cursor.close()
-        conn.close()
+        except Exception as e:
+            print(f"Alarm check error: {e}")
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+    
+    overdue_count = get_cached_counters('overdue_alarm', counter_scope(role, user_id), load_overdue_count) or 0
+    
+    return jsonify({
+        'has_overdue': overdue_count > 0,
+        'overdue_count': overdue_count
+    })
 
 @app.route('/api/send_overdue_reminder/<int:gate_pass_id>', methods=['POST'])
 @login_required
@@ -1728,16 +1564,13 @@ def send_overdue_reminder(gate_pass_id):
     
     try:
         # Get gate pass details
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT gp.*, u.id as creator_id, u.name as creator_name,
                    d.name as department_name, TIMESTAMPDIFF(DAY, gp.expected_return_date, NOW()) as overdue_days
             FROM gate_passes gp
             JOIN users u ON gp.created_by = u.id
             JOIN departments d ON gp.department_id = d.id
-            WHERE gp.id = %s AND gp.material_type = 'returnable' 
-            AND gp.expected_return_date < NOW() 
-            AND gp.actual_return_date IS NULL
-            AND gp.status = 'approved'
+            WHERE gp.id = %s AND {overdue_condition('gp')}
         ''', (gate_pass_id,))
         
         gate_pass = dict_fetchone(cursor)
@@ -1757,12 +1590,7 @@ def send_overdue_reminder(gate_pass_id):
         overdue_days = gate_pass['overdue_days'] or 0
         reminder_message = f"⏰ REMINDER: Your material with Gate Pass {gate_pass['pass_number']} is {overdue_days} day(s) overdue! Please return immediately."
         
-        create_notification(
-            gate_pass['creator_id'],
-            reminder_message,
-            'alert',
-            gate_pass_id
-        )
+        rows = [(gate_pass['creator_id'], reminder_message, 'alert', gate_pass_id)]
         
         # Also notify department head (if not the one sending)
         if session['role'] == 'system_admin':
@@ -1776,12 +1604,12 @@ def send_overdue_reminder(gate_pass_id):
             
             dept_head = cursor.fetchone()
             if dept_head and dept_head[0] != session['user_id']:
-                create_notification(
-                    dept_head[0],
-                    f"⏰ Reminder sent to {gate_pass['creator_name']} for overdue Gate Pass {gate_pass['pass_number']}",
-                    'info',
-                    gate_pass_id
-                )
+                rows.append((dept_head[0],
+                             f"⏰ Reminder sent to {gate_pass['creator_name']} for overdue Gate Pass {gate_pass['pass_number']}",
+                             'reminder', gate_pass_id))
+        
+        # Outbox event commits with the reminder log below
+        enqueue_notifications(cursor, rows, event_type='overdue_reminder', gate_pass_id=gate_pass_id)
         
         # Log the reminder
         cursor.execute('''
@@ -1791,6 +1619,7 @@ def send_overdue_reminder(gate_pass_id):
               f"Manual reminder sent by {session['name']}"))
         
         conn.commit()
+        wake_outbox_dispatcher()
         
         return jsonify({
             'success': True, 
@@ -1846,6 +1675,7 @@ def mark_force_returned(gate_pass_id):
             UPDATE gate_passes 
             SET actual_return_date = %s, 
                 status = 'force_returned',
+                overdue_severity = 'none',
                 force_return_remarks = %s,
                 force_returned_by = %s
             WHERE id = %s
@@ -1857,43 +1687,31 @@ def mark_force_returned(gate_pass_id):
             VALUES (%s, %s, %s, %s)
         ''', (gate_pass_id, session['user_id'], datetime.now(), remarks))
         
-        conn.commit()
-        
-        # Send notifications if requested
+        # Send notifications if requested (outbox event, committed with the update)
         if notify_all:
             # Notify creator
-            create_notification(
-                gate_pass['creator_id'],
-                f"⚠️ Your material with Gate Pass {gate_pass['pass_number']} has been marked as force returned by System Admin. Remarks: {remarks}",
-                'alert',
-                gate_pass_id
-            )
+            rows = [(gate_pass['creator_id'],
+                     f"⚠️ Your material with Gate Pass {gate_pass['pass_number']} has been marked as force returned by System Admin. Remarks: {remarks}",
+                     'alert', gate_pass_id)]
             
             # Notify department head
             if gate_pass['dept_head_id']:
-                create_notification(
-                    gate_pass['dept_head_id'],
-                    f"⚠️ Material from your department (Gate Pass {gate_pass['pass_number']}) has been marked force returned by System Admin.",
-                    'alert',
-                    gate_pass_id
-                )
+                rows.append((gate_pass['dept_head_id'],
+                             f"⚠️ Material from your department (Gate Pass {gate_pass['pass_number']}) has been marked force returned by System Admin.",
+                             'alert', gate_pass_id))
             
             # Notify all system admins (except current)
-            cursor.execute('''
-                SELECT id FROM users 
-                WHERE role = "system_admin" 
-                AND status = "approved"
-                AND id != %s
-            ''', (session['user_id'],))
+            for admin_id in get_role_user_ids(cursor, 'system_admin', exclude_user_id=session['user_id']):
+                rows.append((admin_id,
+                             f"⚠️ Gate Pass {gate_pass['pass_number']} force returned by {session['name']}",
+                             'status', gate_pass_id))
             
-            other_admins = dict_fetchall(cursor)
-            for admin in other_admins:
-                create_notification(
-                    admin['id'],
-                    f"⚠️ Gate Pass {gate_pass['pass_number']} force returned by {session['name']}",
-                    'info',
-                    gate_pass_id
-                )
+            enqueue_notifications(cursor, rows, event_type='force_returned', gate_pass_id=gate_pass_id)
+        
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
+        cancel_overdue_check(gate_pass_id)
         
         return jsonify({
             'success': True, 
@@ -1908,11 +1726,104 @@ def mark_force_returned(gate_pass_id):
         cursor.close()
         conn.close()
 
+def format_notification_times(notifications):
+    """Add created_at_str / created_date display fields (JSON can't carry datetimes)"""
+    for notification in notifications:
+        if 'created_at' in notification and notification['created_at']:
+            if isinstance(notification['created_at'], datetime):
+                notification['created_at_str'] = notification['created_at'].strftime('%H:%M')
+                notification['created_date'] = notification['created_at'].strftime('%d/%m')
+            else:
+                # If it's already a string
+                notification['created_at_str'] = str(notification['created_at'])[:5]
+                notification['created_date'] = str(notification['created_at'])[:10]
+
+NOTIFICATIONS_SINCE_PAGE_SIZE = 20
+
+def fetch_notifications_since(user_id, since, limit=NOTIFICATIONS_SINCE_PAGE_SIZE):
+    """(notifications newer than since, unread count) - ([], None) when nothing is new, None on DB failure.
+
+    The first probe is an index-only "id > cursor" lookup, so a long-poll that
+    finds nothing new costs a single index dive.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT id FROM notifications WHERE user_id = %s AND id > %s ORDER BY id LIMIT 1
+        ''', (user_id, since))
+        if cursor.fetchone() is None:
+            return [], None
+        
+        cursor.execute('''
+            SELECT id, message, type, is_read, created_at, gate_pass_id
+            FROM notifications
+            WHERE user_id = %s AND id > %s
+            ORDER BY id ASC
+            LIMIT %s
+        ''', (user_id, since, limit))
+        # Oldest first so the cursor pages forward through everything; newest first for display
+        notifications = dict_fetchall(cursor)[::-1]
+        
+        unread_count, _ = get_notification_counts(cursor, user_id)
+        
+        format_notification_times(notifications)
+        return notifications, unread_count
+        
+    except Exception as e:
+        print(f"Error fetching notifications since {since}: {e}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def check_notifications_since(user_id, since, wait):
+    """Long-poll: answer as soon as the user has notifications newer than since, or after wait seconds"""
+    wait = max(0, min(wait, config['default'].STREAM_LONG_POLL_SECONDS))
+    deadline = time.monotonic() + wait
+    
+    while True:
+        # Read the version before probing so a publish between probe and wait isn't missed
+        version = notification_version(user_id)
+        result = fetch_notifications_since(user_id, since)
+        if result is None:
+            return jsonify({'success': False, 'notifications': [], 'last_id': since})
+        
+        notifications, unread_count = result
+        remaining = deadline - time.monotonic()
+        if notifications or remaining <= 0:
+            break
+        
+        # No DB connection is held while waiting; the live update probe wakes us for any process's writes
+        wait_for_notifications(user_id, version, remaining)
+    
+    response = {
+        'success': True,
+        'notifications': notifications,
+        'last_id': max(n['id'] for n in notifications) if notifications else since,
+        'has_more': len(notifications) >= NOTIFICATIONS_SINCE_PAGE_SIZE,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if notifications:
+        response['new_notifications'] = unread_count
+    return jsonify(response)
+
 # ✅ FIXED: Check Notifications - UPDATED VERSION
 @app.route('/check_notifications')
 @login_required
 def check_notifications():
-    """Enhanced notification check with better error handling - FIXED VERSION"""
+    """Enhanced notification check with better error handling - FIXED VERSION
+
+    With ?since=<last_id>[&wait=<seconds>] it long-polls for newer notifications only.
+    """
+    since = request.args.get('since', type=int)
+    if since is not None:
+        return check_notifications_since(session['user_id'], since, request.args.get('wait', 0, type=int))
+    
     conn = get_db_connection()
     if conn is None:
         # Fallback to simple response
@@ -1925,26 +1836,8 @@ def check_notifications():
     cursor = conn.cursor()
     
     try:
-        # Get unread count - FIXED QUERY
-        cursor.execute(''' 
-            SELECT COUNT(*) as unread_count 
-            FROM notifications 
-            WHERE user_id = %s AND is_read = FALSE
-        ''', (session['user_id'],))
-        
-        unread_result = cursor.fetchone()
-        # ✅ FIXED: Properly extract count from tuple
-        unread_count = unread_result[0] if unread_result else 0
-        
-        # Get total notifications (optional - for additional info)
-        cursor.execute(''' 
-            SELECT COUNT(*) as total_count 
-            FROM notifications 
-            WHERE user_id = %s
-        ''', (session['user_id'],))
-        
-        total_result = cursor.fetchone()
-        total_count = total_result[0] if total_result else 0
+        # Unread / total counts - one primary-key lookup on notification_counters
+        unread_count, total_count = get_notification_counts(cursor, session['user_id'])
         
         # Get recent notifications for preview (optional)
         cursor.execute('''
@@ -1965,15 +1858,7 @@ def check_notifications():
             recent_notifications.append(notification_dict)
         
         # Convert datetime to string for JSON serialization
-        for notification in recent_notifications:
-            if 'created_at' in notification and notification['created_at']:
-                if isinstance(notification['created_at'], datetime):
-                    notification['created_at_str'] = notification['created_at'].strftime('%H:%M')
-                    notification['created_date'] = notification['created_at'].strftime('%d/%m')
-                else:
-                    # If it's already a string
-                    notification['created_at_str'] = str(notification['created_at'])[:5]
-                    notification['created_date'] = str(notification['created_at'])[:10]
+        format_notification_times(recent_notifications)
         
         return jsonify({
             'success': True,
@@ -1981,6 +1866,7 @@ def check_notifications():
             'total': total_count,
             'has_notifications': total_count > 0,
             'notifications': recent_notifications,
+            'last_id': max((n['id'] for n in recent_notifications), default=0),
             'user_id': session['user_id'],
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         })
@@ -2002,6 +1888,67 @@ def check_notifications():
         cursor.close()
         conn.close()
 
+def _sse_message(event, data):
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/stream/notifications')
+@login_required
+def stream_notifications():
+    """Push channel for notifications and counter changes (SSE, or long-poll with ?mode=poll).
+
+    Streams sit on an in-process queue fed by the live update probe (one DB probe
+    per process, not per client) - an idle client costs no queries.
+    """
+    cfg = config['default']
+    broker = get_broker()
+    subscription = broker.subscribe(session['user_id'])
+    
+    if request.args.get('mode') == 'poll':
+        if subscription is None:
+            return jsonify({'success': False, 'message': 'Too many open streams', 'retry_after': 5}), 503
+        try:
+            # Wait for the first event, then hand back everything queued with it
+            first = subscription.get(timeout=cfg.STREAM_LONG_POLL_SECONDS)
+            events = ([first] + subscription.drain()) if first else []
+            return jsonify({
+                'success': True,
+                'events': [{'event': event, 'data': data} for event, data in events],
+                'resync': subscription.overflowed
+            })
+        finally:
+            broker.unsubscribe(subscription)
+    
+    if subscription is None:
+        # Client switches to ?mode=poll on a failed stream
+        return Response('Too many open streams', status=503, headers={'Retry-After': '5'})
+    
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            yield _sse_message('ready', {'user_id': subscription.user_id})
+            
+            deadline = time.monotonic() + cfg.STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                item = subscription.get(timeout=cfg.STREAM_HEARTBEAT_SECONDS)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    subscription.drain()
+                    yield _sse_message('resync', {})
+                    continue
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event, data = item
+                yield _sse_message(event, data)
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/mark_notification_read/<int:notification_id>', methods=['POST'])
 @login_required
 def mark_notification_read(notification_id):
@@ -2030,6 +1977,14 @@ def mark_all_notifications_read():
                 SET is_read = TRUE 
                 WHERE user_id = %s AND is_read = FALSE
             ''', (session.get('user_id'),))
+            marked = cursor.rowcount
+            if marked > 0:
+                # Decrement rather than zero - a notification committed after the UPDATE above stays counted
+                cursor.execute('''
+                    UPDATE notification_counters
+                    SET unread_count = GREATEST(unread_count - %s, 0)
+                    WHERE user_id = %s
+                ''', (marked, session.get('user_id')))
             conn.commit()
             flash('All notifications marked as read', 'success')
         except Exception as e:
@@ -2053,21 +2008,17 @@ def upload_photo():
         if photo.filename == '':
             return jsonify({'success': False, 'message': 'No selected file'})
         
-        # Save the photo
-        upload_folder = 'static/uploads'
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-        
-        filename = f"upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{session['user_id']}.jpg"
-        filepath = os.path.join(upload_folder, filename)
-        photo.save(filepath)
+        # Save the photo (streamed into content-addressed storage)
+        key = save_photo_stream(photo.stream)
         
         return jsonify({
             'success': True, 
             'message': 'Photo uploaded successfully',
-            'filepath': filepath.replace('static/', '')
+            'filepath': key
         })
         
+    except PhotoStorageError as e:
+        return jsonify({'success': False, 'message': str(e)})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -2165,5 +2116,17 @@ def api_notify_gate_pass_print_complete():
     
     return jsonify({'success': True, 'message': 'Print completion logged'})
 
+@app.route('/api/notification_queue_stats')
+@role_required('system_admin')
+def api_notification_queue_stats():
+    """Notification outbox backlog, open streams, live update probe and scheduler leader state"""
+    return jsonify({
+        'success': True,
+        'outbox': get_outbox_stats(),
+        'streams': get_broker().stats(),
+        'live_update_probe': get_probe_stats(),
+        'scheduler': get_leader_elector().stats()
+    })
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,7 +1,8 @@
 # auth.py - COMPLETELY FIXED REGISTRATION
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models import get_db_connection, hash_password, check_password, dict_fetchone, dict_fetchall
-from notifications import create_notification
+from notifications import create_notifications_bulk, get_role_user_ids
+from counter_cache import invalidate_counters
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -149,16 +150,14 @@ def register():
             # FIXED: Send notification to BOTH Super Admin AND Department Head
             
             # 1. Notify ALL System Administrators
-            cursor.execute('SELECT id, name FROM users WHERE role = "system_admin" AND status = "approved"')
-            admins = dict_fetchall(cursor)
-            for admin in admins:
-                create_notification(
-                    admin['id'],
-                    f"👤 NEW USER REGISTRATION: {name} ({username}) wants to join as {designation} in {department_name}",
-                    'approval',
-                    user_id
-                )
-                print(f"DEBUG: Notification sent to System Admin {admin['name']}")
+            admin_ids = get_role_user_ids(cursor, 'system_admin')
+            create_notifications_bulk(
+                admin_ids,
+                f"👤 NEW USER REGISTRATION: {name} ({username}) wants to join as {designation} in {department_name}",
+                'approval',
+                user_id
+            )
+            print(f"DEBUG: Notification sent to {len(admin_ids)} System Admin(s)")
             
             # 2. Notify Department Head (if exists for this department)
             cursor.execute('''
@@ -171,18 +170,18 @@ def register():
             
             dept_heads = dict_fetchall(cursor)
             if dept_heads:
-                for dept_head in dept_heads:
-                    create_notification(
-                        dept_head['id'],
-                        f"👤 NEW USER REGISTRATION: {name} ({username}) wants to join your department ({department_name}) as {designation}",
-                        'approval',
-                        user_id
-                    )
-                    print(f"DEBUG: Notification sent to Department Head {dept_head['name']}")
+                create_notifications_bulk(
+                    [dept_head['id'] for dept_head in dept_heads],
+                    f"👤 NEW USER REGISTRATION: {name} ({username}) wants to join your department ({department_name}) as {designation}",
+                    'approval',
+                    user_id
+                )
+                print(f"DEBUG: Notification sent to Department Head(s) {', '.join(dept_head['name'] for dept_head in dept_heads)}")
             else:
                 print(f"DEBUG: No Department Head found for department ID {department_id}")
             
             conn.commit()
+            invalidate_counters()
             flash('Registration successful! Please wait for Super Admin OR Department Head approval. You will be notified once approved.', 'success')
             print(f"DEBUG: Registration completed successfully for user {username}")
             return redirect(url_for('auth.login'))
@@ -13,6 +13,71 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     SESSION_PERMANENT = True
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    # Database connection pool
+    DB_POOL_SIZE = 10  # Max open MySQL connections per worker process
+    DB_POOL_CHECKOUT_TIMEOUT = 10  # Seconds to wait for a free connection
+    DB_POOL_MAX_IDLE_SECONDS = 300  # Close idle connections older than this
+    DB_POOL_PING_AFTER_SECONDS = 30  # Ping connections idle longer than this before reuse
+    # Dashboard / alarm / returns counter cache
+    COUNTER_CACHE_TTL = 30  # Seconds before cached counters are recomputed
+    COUNTER_CACHE_MAX_ENTRIES = 1024
+    RETURNS_TOTAL_CACHE_TTL = 300  # Returns list total; also dropped whenever a return is recorded
+    # Notification outbox dispatcher
+    OUTBOX_POLL_INTERVAL = 2  # Seconds between outbox polls when nothing wakes the dispatcher
+    OUTBOX_BATCH_SIZE = 200  # Events expanded per transaction
+    OUTBOX_MAX_ATTEMPTS = 5  # Failed dispatches before an event is parked as 'failed'
+    OUTBOX_STALE_SECONDS = 300  # Reclaim events stuck in 'processing' this long
+    # Notification push (SSE stream / long-poll fallback)
+    STREAM_MAX_CLIENTS = 200  # Open streams per process; beyond this clients fall back to long-poll
+    STREAM_QUEUE_SIZE = 100  # Undelivered events per stream before the client is told to resync
+    STREAM_HEARTBEAT_SECONDS = 20  # Keep-alive comment interval on idle SSE streams
+    STREAM_MAX_SECONDS = 300  # Close SSE streams after this long; EventSource reconnects on its own
+    STREAM_LONG_POLL_SECONDS = 25  # Longest a long-poll request waits for an event
+    STREAM_PROBE_INTERVAL = 2  # Seconds between DB probes that fan other processes' notifications / counter changes out to local streams
+    # Overdue sweeps
+    OVERDUE_SWEEP_BATCH_SIZE = 500  # Passes per sweep transaction (one SELECT, one INSERT, one UPDATE each)
+    OVERDUE_TIMER_RELOAD_SECONDS = 600  # Re-arm overdue deadlines from the DB (passes created in other processes)
+    # Material photo uploads (streamed to staging, referenced by image token)
+    MEDIA_ROOT = 'static'  # Photo keys (uploads/yyyy/mm/dd/ab/<sha256>.jpg) are relative to this
+    UPLOAD_TEMP_FOLDER = 'upload_staging/tmp'  # Partially written photos (same filesystem as MEDIA_ROOT)
+    PHOTO_STAGING_FOLDER = 'upload_staging'  # Uploaded but not yet attached to a gate pass
+    PHOTO_UPLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read from the request per write - the only buffer held in memory
+    PHOTO_MAX_BYTES = 8 * 1024 * 1024  # Largest single photo
+    PHOTO_MAX_PER_PASS = 8  # Photos attached to one gate pass (the create form's limit) - extra tokens are ignored
+    PHOTO_STAGING_MAX_AGE_HOURS = 24  # Unclaimed staged photos are deleted by the retention job after this
+    # Photo storage backend ('local' = MEDIA_ROOT on disk, 's3' = any S3-compatible store such as MinIO)
+    PHOTO_STORAGE_BACKEND = 'local'
+    PHOTO_S3_BUCKET = 'gate-pass-photos'
+    PHOTO_S3_ENDPOINT_URL = None  # e.g. 'http://localhost:9000' for a local MinIO; None = AWS
+    PHOTO_S3_REGION = None
+    PHOTO_S3_ACCESS_KEY = os.environ.get('PHOTO_S3_ACCESS_KEY')
+    PHOTO_S3_SECRET_KEY = os.environ.get('PHOTO_S3_SECRET_KEY')
+    PHOTO_S3_PREFIX = ''  # Object key prefix inside the bucket
+    PHOTO_S3_PRESIGN_SECONDS = 3600  # Lifetime of the presigned URLs the media route redirects to
+    PHOTO_S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024  # Uploads above this go up as multipart
+    PHOTO_S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024  # Part size (S3 minimum is 5MB)
+    PHOTO_SERVE_MODE = 'redirect'  # 'redirect' to a presigned URL or 'proxy' the bytes through the app
+    PHOTO_READ_CACHE_MAX_BYTES = 64 * 1024 * 1024  # In-process read-through cache per worker (0 = off)
+    IMAGE_RENDITION_WORKERS = 2  # Processes resizing photos into thumb / print / medium renditions
+    # Rendered QR code cache (content-addressed PNGs)
+    QR_CACHE_MAX_ENTRIES = 256  # PNGs kept in memory per worker process
+    QR_CACHE_MAX_AGE = 31536000  # Browser cache lifetime - a key never changes content
+    # Media serving (photos, static files, PWA assets)
+    STATIC_MAX_AGE = 3600  # Browser cache lifetime of non-hashed static files - revalidated with a 304 after that
+    MEDIA_OFFLOAD = None  # None = the app sends file bodies, 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx)
+    MEDIA_OFFLOAD_ROOT = '.'  # Directory the proxy's internal location maps to (file paths are sent relative to it)
+    MEDIA_ACCEL_PREFIX = '/_protected'  # nginx 'internal' location that aliases MEDIA_OFFLOAD_ROOT
+    # Scheduler leader election (one process runs the sweeps)
+    SCHEDULER_LEADER_CHECK_SECONDS = 5  # How often followers try the leader lock - also the takeover delay
+    # Retention / archival job
+    RETENTION_INTERVAL_HOURS = 24  # How often the retention job runs
+    RETENTION_BATCH_SIZE = 1000  # Rows moved per transaction
+    NOTIFICATION_RETENTION_DAYS = 30  # Read notifications older than this move to notifications_archive
+    SECURITY_LOG_RETENTION_DAYS = 365  # Security logs older than this move to security_logs_archive
+    OUTBOX_RETENTION_DAYS = 7  # Delivered outbox events are deleted after this
+    # Gate pass list pagination (keyset / infinite scroll)
+    GATE_PASS_PAGE_SIZE = 50  # Rows per page when ?per_page= isn't given
+    GATE_PASS_MAX_PAGE_SIZE = 200  # Upper bound for ?per_page=
     
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,120 @@
+# counter_cache.py - TTL + LRU CACHE FOR DASHBOARD / ALARM / RETURNS COUNTERS
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import config
+
+GENERATION_KEY = 'counters:generation'
+
+# Roles whose counters don't depend on who is asking
+GLOBAL_SCOPE_ROLES = ('system_admin', 'security')
+
+
+class LocalLRUBackend:
+    """In-process LRU store with per-entry expiry (default backend).
+
+    Any object exposing the same get/set/delete methods (e.g. a thin wrapper
+    around a shared Redis/memcached client) can be plugged in via set_backend()
+    so every worker process sees the same counters and invalidations.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_invalidation_listeners = []
+
+_backend = LocalLRUBackend(max_entries=config['default'].COUNTER_CACHE_MAX_ENTRIES)
+
+def set_backend(backend):
+    """Swap the cache store (e.g. for a shared cache across worker processes)"""
+    global _backend
+    _backend = backend
+
+def get_backend():
+    return _backend
+
+def counter_scope(role, user_id):
+    """Cache scope for a user's counters.
+
+    Admin and security counters are global. Department, store and own-pass
+    counters are derived from the user (department_id / store username), so
+    role + user_id identifies them without an extra lookup.
+    """
+    if role in GLOBAL_SCOPE_ROLES:
+        return (role,)
+    return (role, user_id)
+
+def _generation():
+    generation = _backend.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        _backend.set(GENERATION_KEY, generation)
+    return generation
+
+def _make_key(name, scope):
+    return f"counters:{_generation()}:{name}:" + ':'.join(str(part) for part in scope)
+
+def get_cached_counters(name, scope, compute, ttl=None):
+    """Return cached counters for (name, scope), calling compute() on a miss.
+
+    compute() may return None to signal a failure - failures are not cached.
+    """
+    key = _make_key(name, scope)
+    value = _backend.get(key)
+    if value is not None:
+        return value
+
+    value = compute()
+    if value is not None:
+        _backend.set(key, value, ttl or config['default'].COUNTER_CACHE_TTL)
+    return value
+
+def invalidate_counters():
+    """Drop every cached counter - call after any gate pass status/return change.
+
+    Bumping the generation token makes all existing keys unreachable (they age
+    out of the LRU), which works the same for local and shared backends.
+    """
+    _backend.set(GENERATION_KEY, uuid.uuid4().hex)
+    for listener in list(_invalidation_listeners):
+        try:
+            listener()
+        except Exception as e:
+            print(f"Counter invalidation listener error: {e}")
+
+def add_invalidation_listener(callback):
+    """Call callback() after every invalidate_counters() (e.g. to push a refresh to open streams)"""
+    if callback not in _invalidation_listeners:
+        _invalidation_listeners.append(callback)
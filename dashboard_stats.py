@@ -0,0 +1,117 @@
+# dashboard_stats.py - SINGLE-QUERY ROLE-BASED DASHBOARD COUNTERS
+from overdue_severity import OVERDUE_SEVERITY_SQL
+
+# Shared row predicates (used inside SUM(CASE ...) so each counter costs no extra scan)
+OVERDUE_SQL = f"({OVERDUE_SEVERITY_SQL})"
+
+APPROVED_TODAY_SQL = "(created_at >= CURDATE() AND status = 'approved')"
+
+PENDING_STATUSES_SQL = "status IN ('pending_dept', 'pending_store', 'pending_security')"
+
+EMPTY_STATS = {
+    'total_passes': 0,
+    'pending_passes': 0,
+    'overdue_passes': 0,
+    'approved_today': 0,
+    'pending_approvals': 0,
+    'pending_user_approvals': 0,
+    'overdue_count': 0
+}
+
+def _count_if(condition):
+    return f"COALESCE(SUM(CASE WHEN {condition} THEN 1 ELSE 0 END), 0)"
+
+def _build_stats_query(role, user_id, department_id, store_location):
+    """Return (sql, params) computing every dashboard counter for a role in one statement.
+
+    Counter columns: total_passes, pending_passes, overdue_passes, approved_today,
+    overdue_count (sidebar badge) and pending_user_approvals.
+    """
+    params = []
+    where = ''
+    pending_users_sql = '0'
+
+    if role == 'system_admin':
+        total = '1=1'
+        pending = '1=0'
+        overdue = OVERDUE_SQL
+        approved_today = APPROVED_TODAY_SQL
+        badge = OVERDUE_SQL
+
+    elif role == 'store_manager':
+        total = "(store_location = %s OR status = 'pending_store')"
+        pending = "status = 'pending_store'"
+        overdue = f"({OVERDUE_SQL} AND store_location = %s)"
+        approved_today = f"({APPROVED_TODAY_SQL} AND store_location = %s)"
+        badge = f"({OVERDUE_SQL} AND (created_by = %s OR store_location = %s))"
+        params = [store_location, store_location, store_location, user_id, store_location]
+
+    elif role == 'department_head':
+        total = 'department_id = %s'
+        pending = "(department_id = %s AND status = 'pending_dept')"
+        overdue = f"({OVERDUE_SQL} AND department_id = %s)"
+        approved_today = f"({APPROVED_TODAY_SQL} AND department_id = %s)"
+        badge = f"({OVERDUE_SQL} AND (created_by = %s OR department_id = %s))"
+        params = [department_id, department_id, department_id, department_id, user_id, department_id]
+        pending_users_sql = "(SELECT COUNT(*) FROM users WHERE department_id = %s AND status = 'pending')"
+        where = 'WHERE department_id = %s OR created_by = %s'
+
+    elif role == 'security':
+        total = "department_approval = 'approved'"
+        pending = "status = 'pending_security'"
+        overdue = OVERDUE_SQL
+        approved_today = APPROVED_TODAY_SQL
+        badge = OVERDUE_SQL
+
+    else:
+        # Regular user - everything is scoped to their own passes
+        total = '1=1'
+        pending = PENDING_STATUSES_SQL
+        overdue = OVERDUE_SQL
+        approved_today = APPROVED_TODAY_SQL
+        badge = OVERDUE_SQL
+        where = 'WHERE created_by = %s'
+
+    sql = f'''
+        SELECT {_count_if(total)} AS total_passes,
+               {_count_if(pending)} AS pending_passes,
+               {_count_if(overdue)} AS overdue_passes,
+               {_count_if(approved_today)} AS approved_today,
+               {_count_if(badge)} AS overdue_count,
+               {pending_users_sql} AS pending_user_approvals
+        FROM gate_passes
+        {where}
+    '''
+
+    if role == 'department_head':
+        params = params + [department_id, department_id, user_id]
+    elif where:
+        params = params + [user_id]
+
+    return sql, tuple(params)
+
+def get_dashboard_stats(cursor, role, user_id, department_id=None, store_location=None):
+    """Compute the dashboard counters for a role with a single conditional-aggregation query.
+
+    Returns a dict with total_passes, pending_passes, overdue_passes, approved_today,
+    pending_approvals, pending_user_approvals and overdue_count (sidebar badge).
+    """
+    if role == 'department_head' and department_id is None:
+        return dict(EMPTY_STATS)
+
+    sql, params = _build_stats_query(role, user_id, department_id, store_location)
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+
+    columns = [col[0] for col in cursor.description]
+    stats = {column: int(value or 0) for column, value in zip(columns, row)}
+
+    # Pending approvals shown on the dashboard card depend on what the role approves
+    if role == 'store_manager':
+        stats['pending_approvals'] = stats['pending_passes']
+    elif role == 'department_head':
+        stats['pending_approvals'] = stats['pending_user_approvals'] + stats['pending_passes']
+    else:
+        stats['pending_approvals'] = 0
+
+    return stats
@@ -0,0 +1,198 @@
+# db_indexes.py - SECONDARY INDEXES FOR HOT QUERIES + EXPLAIN VERIFICATION
+from models import get_db_connection, dict_fetchall
+
+# Indexes per schema migration version: {version: ([(table, index_name, columns)], [fulltext ...])}.
+# Columns are ordered equality first, then range/sort. A migration applies exactly its own
+# group - never edit an applied group, add a new version in migrations.py instead.
+INDEX_MIGRATIONS = {
+    2: ([
+        # Overdue scan: status/material_type equality, actual_return_date IS NULL, range on expected_return_date
+        ('gate_passes', 'idx_gp_overdue', ('status', 'material_type', 'actual_return_date', 'expected_return_date')),
+        # Role-scoped list views ordered by newest first
+        ('gate_passes', 'idx_gp_dept_created', ('department_id', 'created_at')),
+        ('gate_passes', 'idx_gp_creator_created', ('created_by', 'created_at')),
+        ('gate_passes', 'idx_gp_status_created', ('status', 'created_at')),
+        ('gate_passes', 'idx_gp_store_status', ('store_location', 'status')),
+        ('gate_passes', 'idx_gp_created_at', ('created_at',)),
+        # Security list: department_approval = 'approved' ORDER BY department_approval_date DESC, created_at DESC
+        ('gate_passes', 'idx_gp_dept_approval', ('department_approval', 'department_approval_date', 'created_at')),
+        # Returns list / statistics ordered by return time
+        ('gate_passes', 'idx_gp_returned', ('actual_return_date',)),
+        ('gate_passes', 'idx_gp_dept_returned', ('department_id', 'actual_return_date')),
+        # Notification badge (unread count) and latest-N preview
+        ('notifications', 'idx_notif_user_read_created', ('user_id', 'is_read', 'created_at')),
+        ('notifications', 'idx_notif_user_created', ('user_id', 'created_at')),
+    ], []),
+    3: ([
+        # Paginated security list: department_approval = 'approved' ORDER BY created_at DESC, id DESC
+        ('gate_passes', 'idx_gp_dept_approval_created', ('department_approval', 'created_at')),
+    ], []),
+    4: ([
+        # Admin all-gate-passes filters, each ordered by newest first
+        ('gate_passes', 'idx_gp_division_created', ('division_id', 'created_at')),
+        ('gate_passes', 'idx_gp_store_created', ('store_location', 'created_at')),
+        ('gate_passes', 'idx_gp_urgent_created', ('urgent', 'created_at')),
+    ], [
+        # Admin search over pass number / destination / receiver (MATCH ... AGAINST)
+        ('gate_passes', 'ft_gp_search', ('pass_number', 'destination', 'receiver_name')),
+    ]),
+    5: ([
+        # Per-user returns list ordered by return time
+        ('gate_passes', 'idx_gp_creator_returned', ('created_by', 'actual_return_date')),
+    ], []),
+    7: ([
+        # Long-poll "anything newer than my cursor?" probe
+        ('notifications', 'idx_notif_user_id', ('user_id', 'id')),
+    ], []),
+}
+
+# Every secondary index the head schema should have (verification / repair CLI)
+INDEXES = [index for version in sorted(INDEX_MIGRATIONS) for index in INDEX_MIGRATIONS[version][0]]
+FULLTEXT_INDEXES = [index for version in sorted(INDEX_MIGRATIONS) for index in INDEX_MIGRATIONS[version][1]]
+
+# (name, sql, params, acceptable indexes) - EXPLAIN must pick one of these for the gate_passes/notifications row
+HOT_QUERIES = [
+    # Severity refresh: open passes past their return date that aren't graded yet
+    ('overdue_scan', '''
+        SELECT id FROM gate_passes
+        WHERE material_type = 'returnable' AND expected_return_date < NOW()
+        AND actual_return_date IS NULL AND status = 'approved' AND overdue_severity = 'none'
+    ''', (), ('idx_gp_overdue',)),
+    # Overdue views / alarm / dashboard (idx_gp_overdue_severity is added by migration 10)
+    ('overdue_view', '''
+        SELECT id FROM gate_passes
+        WHERE overdue_severity IN ('reminder', 'warning', 'urgent', 'critical')
+        ORDER BY expected_return_date
+    ''', (), ('idx_gp_overdue_severity',)),
+    ('department_list', '''
+        SELECT id FROM gate_passes WHERE department_id = %s ORDER BY created_at DESC, id DESC LIMIT 50
+    ''', (1,), ('idx_gp_dept_created', 'idx_gp_dept_returned')),
+    ('user_list', '''
+        SELECT id FROM gate_passes WHERE created_by = %s ORDER BY created_at DESC, id DESC LIMIT 50
+    ''', (1,), ('idx_gp_creator_created',)),
+    ('admin_list', '''
+        SELECT id FROM gate_passes ORDER BY created_at DESC, id DESC LIMIT 50
+    ''', (), ('idx_gp_created_at',)),
+    ('pending_store_queue', '''
+        SELECT id FROM gate_passes WHERE status = 'pending_store' ORDER BY created_at DESC LIMIT 50
+    ''', (), ('idx_gp_status_created', 'idx_gp_overdue')),
+    ('store_scope', '''
+        SELECT COUNT(*) FROM gate_passes WHERE store_location = %s AND status = 'approved'
+    ''', ('store_1',), ('idx_gp_store_status',)),
+    ('security_list', '''
+        SELECT id FROM gate_passes WHERE department_approval = 'approved'
+        ORDER BY created_at DESC, id DESC LIMIT 50
+    ''', (), ('idx_gp_dept_approval_created',)),
+    ('returns_list', '''
+        SELECT id FROM gate_passes WHERE actual_return_date IS NOT NULL
+        ORDER BY actual_return_date DESC, id DESC LIMIT 50
+    ''', (), ('idx_gp_returned',)),
+    ('user_returns_list', '''
+        SELECT id FROM gate_passes WHERE created_by = %s AND actual_return_date IS NOT NULL
+        ORDER BY actual_return_date DESC, id DESC LIMIT 50
+    ''', (1,), ('idx_gp_creator_returned',)),
+    ('unread_badge', '''
+        SELECT COUNT(*) FROM notifications WHERE user_id = %s AND is_read = FALSE
+    ''', (1,), ('idx_notif_user_read_created',)),
+    ('admin_division_filter', '''
+        SELECT id FROM gate_passes WHERE division_id = %s ORDER BY created_at DESC, id DESC LIMIT 50
+    ''', (1,), ('idx_gp_division_created',)),
+    ('admin_search', '''
+        SELECT id FROM gate_passes
+        WHERE MATCH(pass_number, destination, receiver_name) AGAINST (%s IN BOOLEAN MODE)
+    ''', ('+GP2024*',), ('ft_gp_search',)),
+    ('latest_notifications', '''
+        SELECT id FROM notifications WHERE user_id = %s ORDER BY created_at DESC LIMIT 5
+    ''', (1,), ('idx_notif_user_created',)),
+    ('notifications_since', '''
+        SELECT id FROM notifications WHERE user_id = %s AND id > %s ORDER BY id LIMIT 1
+    ''', (1, 0), ('idx_notif_user_id',)),
+]
+
+def get_existing_indexes(cursor, table):
+    cursor.execute(f"SHOW INDEX FROM {table}")
+    return {row['Key_name'] for row in dict_fetchall(cursor)}
+
+def ensure_indexes(cursor, indexes=None, fulltext_indexes=None):
+    """Add any missing secondary index (idempotent - safe to run on every start).
+
+    Defaults to every head index; migrations pass their own group.
+    """
+    existing = {}
+    created = []
+    indexes = INDEXES if indexes is None else indexes
+    fulltext_indexes = FULLTEXT_INDEXES if fulltext_indexes is None else fulltext_indexes
+
+    wanted = [(table, name, columns, 'INDEX') for table, name, columns in indexes]
+    wanted += [(table, name, columns, 'FULLTEXT INDEX') for table, name, columns in fulltext_indexes]
+
+    for table, index_name, columns, kind in wanted:
+        if table not in existing:
+            existing[table] = get_existing_indexes(cursor, table)
+
+        if index_name in existing[table]:
+            continue
+
+        try:
+            cursor.execute(f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)})")
+            existing[table].add(index_name)
+            created.append(index_name)
+            print(f"🛠️ Added index {table}.{index_name} ({', '.join(columns)})")
+        except Exception as index_error:
+            print(f"⚠️ Could not add index {index_name}: {index_error}")
+
+    return created
+
+def check_index_usage(cursor):
+    """EXPLAIN every hot query and report whether it uses one of its intended indexes.
+
+    Returns a list of dicts: name, used_key, expected, ok. On near-empty tables
+    the optimizer may prefer a full scan, so run this against realistic data.
+    """
+    results = []
+
+    for name, sql, params, expected in HOT_QUERIES:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        plan = dict_fetchall(cursor)
+        used_keys = [row.get('key') for row in plan if row.get('key')]
+        ok = any(key in expected for key in used_keys)
+        results.append({
+            'name': name,
+            'used_key': ', '.join(used_keys) if used_keys else None,
+            'expected': expected,
+            'ok': ok
+        })
+
+    return results
+
+def verify_indexes():
+    """Apply missing indexes and print the EXPLAIN report (CLI helper)"""
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed!")
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        ensure_indexes(cursor)
+        conn.commit()
+
+        print("\n" + "="*60)
+        print("🔍 HOT QUERY INDEX USAGE (EXPLAIN)")
+        print("="*60)
+
+        results = check_index_usage(cursor)
+        for result in results:
+            status = "✅" if result['ok'] else "❌"
+            print(f"  {status} {result['name']}: uses {result['used_key'] or 'FULL SCAN'} "
+                  f"(expected {' / '.join(result['expected'])})")
+
+        return all(result['ok'] for result in results)
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if verify_indexes() else 1)
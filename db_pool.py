@@ -0,0 +1,168 @@
+# db_pool.py - THREAD-SAFE MYSQL CONNECTION POOL
+import MySQLdb
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout"""
+    pass
+
+
+class PooledConnection:
+    """Wrapper around a MySQLdb connection that goes back to the pool on close()"""
+
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._conn = raw_conn
+        self._closed = False
+
+    def close(self):
+        # Routes call close() in both the try body and finally - must be idempotent
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.checkin(self._conn)
+        self._conn = None
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise MySQLdb.InterfaceError(0, 'Connection already returned to pool')
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded pool of MySQLdb connections.
+
+    - At most ``max_size`` connections are open at once; extra callers wait
+      up to ``checkout_timeout`` seconds for one to be returned.
+    - Idle connections older than ``max_idle_seconds`` are closed instead of reused.
+    - Connections idle longer than ``ping_after_seconds`` are pinged on checkout
+      and replaced if the server dropped them.
+    """
+
+    def __init__(self, connect_kwargs, max_size=10, checkout_timeout=10,
+                 max_idle_seconds=300, ping_after_seconds=30):
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.ping_after_seconds = ping_after_seconds
+
+        self._idle = deque()  # (raw_conn, returned_at)
+        self._open_count = 0
+        self._cond = threading.Condition()
+
+    # ==================== INTERNAL HELPERS ====================
+
+    def _connect(self):
+        return MySQLdb.connect(**self.connect_kwargs)
+
+    def _discard(self, raw_conn):
+        try:
+            raw_conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, raw_conn):
+        try:
+            raw_conn.ping()
+            return True
+        except Exception:
+            return False
+
+    def _evict_stale(self, now):
+        """Close idle connections past max idle time (caller holds the lock)"""
+        kept = deque()
+        while self._idle:
+            raw_conn, returned_at = self._idle.popleft()
+            if now - returned_at > self.max_idle_seconds:
+                self._discard(raw_conn)
+                self._open_count -= 1
+            else:
+                kept.append((raw_conn, returned_at))
+        self._idle = kept
+
+    # ==================== CHECKOUT / RETURN ====================
+
+    def checkout(self):
+        """Get a healthy connection, opening a new one if the pool has room"""
+        deadline = time.monotonic() + self.checkout_timeout
+
+        with self._cond:
+            while True:
+                self._evict_stale(time.time())
+
+                if self._idle:
+                    # Most recently returned first - it is the least likely to be stale
+                    raw_conn, returned_at = self._idle.pop()
+                    break
+
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    raw_conn, returned_at = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection available after {self.checkout_timeout}s "
+                        f"(pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        # Connect / ping outside the lock so slow network calls don't block other threads
+        try:
+            if raw_conn is None:
+                raw_conn = self._connect()
+            elif time.time() - returned_at > self.ping_after_seconds and not self._is_alive(raw_conn):
+                self._discard(raw_conn)
+                raw_conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open_count -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw_conn)
+
+    def checkin(self, raw_conn):
+        """Return a connection; uncommitted work is rolled back so the next user starts clean"""
+        try:
+            raw_conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append((raw_conn, time.time()))
+            else:
+                self._discard(raw_conn)
+                self._open_count -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close when returned)"""
+        with self._cond:
+            while self._idle:
+                raw_conn, _ = self._idle.popleft()
+                self._discard(raw_conn)
+                self._open_count -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'open': self._open_count,
+                'idle': len(self._idle),
+                'in_use': self._open_count - len(self._idle)
+            }
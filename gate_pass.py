@@ -1,27 +1,28 @@
 # gate_pass.py - COMPLETE WITH INSTANT APPROVAL & SECURITY WORKFLOW WITH DEPARTMENT RESTRICTION
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from config import config
 from models import get_db_connection, dict_fetchall, dict_fetchone, get_user_department_id
-from qr_utils import generate_qr_code, generate_gate_pass_qr_data
+from qr_utils import generate_gate_pass_qr_data, qr_image_url
 from notifications import create_notification
+from counter_cache import invalidate_counters
+from notification_outbox import enqueue_notifications, wake_outbox_dispatcher
+from overdue_scheduler import schedule_overdue_check, cancel_overdue_check
+from overdue_severity import SET_OVERDUE_SEVERITY_SQL
+from pagination import keyset_condition, fetch_page, get_page_size
+from photo_uploads import stage_photo_stream, claim_photo_tokens, release_photo_tokens, PhotoUploadError
+from photo_storage import save_photo_bytes
+from image_renditions import queue_renditions, parse_photos
 import MySQLdb
 from datetime import datetime, timedelta
-import os
 import json
 import base64
 import traceback
-from threading import Thread
 
 gate_pass_bp = Blueprint('gate_pass', __name__)
 
 def save_captured_images(images_data):
-    """Save base64 encoded images to filesystem"""
+    """Save base64 encoded images to photo storage"""
     saved_paths = []
-    upload_folder = 'static/uploads'
-    
-    # Create upload folder if not exists
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder, exist_ok=True)
-        print(f"📁 Created upload folder: {upload_folder}")
     
     for i, image_data in enumerate(images_data):
         if image_data and isinstance(image_data, str) and image_data.startswith('data:image'):
@@ -44,17 +45,11 @@ def save_captured_images(images_data):
                     print(f"⚠️ Image {i+1}: Base64 decode error: {decode_error}")
                     continue
                 
-                # Generate unique filename
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                filename = f"material_{timestamp}_{i+1}.jpg"
-                filepath = os.path.join(upload_folder, filename)
-                
-                # Save file
-                with open(filepath, 'wb') as f:
-                    f.write(image_bytes)
+                # Save file (named by content hash, identical photos are stored once)
+                key = save_photo_bytes(image_bytes)
                 
-                saved_paths.append(f"uploads/{filename}")
-                print(f"✅ Image {i+1} saved: {filename} ({len(image_bytes)} bytes)")
+                saved_paths.append(key)
+                print(f"✅ Image {i+1} saved: {key} ({len(image_bytes)} bytes)")
             except Exception as e:
                 print(f"❌ Error saving image {i+1}: {e}")
                 continue
@@ -65,52 +60,6 @@ def save_captured_images(images_data):
     print(f"📁 Total images saved: {len(saved_paths)}")
     return json.dumps(saved_paths)
 
-def async_notify(user_id, message, notif_type, gate_pass_id=None):
-    """Send notification in background thread"""
-    def send_notification():
-        try:
-            conn = get_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO notifications (user_id, gate_pass_id, message, type)
-                    VALUES (%s, %s, %s, %s)
-                ''', (user_id, gate_pass_id, message, notif_type))
-                conn.commit()
-                cursor.close()
-                conn.close()
-        except:
-            pass
-    
-    thread = Thread(target=send_notification)
-    thread.daemon = True
-    thread.start()
-
-def async_notification_bulk(role, message, notif_type, gate_pass_id=None):
-    """Send bulk notifications in background"""
-    def send_bulk():
-        try:
-            conn = get_db_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute(f'SELECT id FROM users WHERE role = "{role}" AND status = "approved"')
-                users = cursor.fetchall()
-                
-                for user in users:
-                    try:
-                        async_notify(user[0], message, notif_type, gate_pass_id)
-                    except:
-                        continue
-                
-                cursor.close()
-                conn.close()
-        except:
-            pass
-    
-    thread = Thread(target=send_bulk)
-    thread.daemon = True
-    thread.start()
-
 # ✅ ULTRA FAST APPROVAL FUNCTION (UNDER 2 SECONDS)
 @gate_pass_bp.route('/instant_approve_gate_pass/<int:gate_pass_id>/<action>', methods=['POST'])
 def instant_approve_gate_pass(gate_pass_id, action):
@@ -171,9 +120,10 @@ def instant_approve_gate_pass(gate_pass_id, action):
                 message = f"❌ Gate Pass {pass_number} rejected."
             
             # 🔥 SINGLE UPDATE QUERY
-            cursor.execute('''
+            cursor.execute(f'''
                 UPDATE gate_passes 
-                SET status = %s, department_approval = %s, department_approval_date = %s
+                SET status = %s, department_approval = %s, department_approval_date = %s,
+                    {SET_OVERDUE_SEVERITY_SQL}
                 WHERE id = %s
             ''', (new_status, approval_status, datetime.now(), gate_pass_id))
             
@@ -206,9 +156,10 @@ def instant_approve_gate_pass(gate_pass_id, action):
                 message = f"❌ Gate Pass {pass_number} rejected by store."
             
             # 🔥 SINGLE UPDATE QUERY
-            cursor.execute('''
+            cursor.execute(f'''
                 UPDATE gate_passes 
-                SET status = %s, store_approval = %s, store_approval_date = %s, store_location = %s
+                SET status = %s, store_approval = %s, store_approval_date = %s, store_location = %s,
+                    {SET_OVERDUE_SEVERITY_SQL}
                 WHERE id = %s
             ''', (new_status, approval_status, datetime.now(), store_location, gate_pass_id))
             
@@ -224,31 +175,35 @@ def instant_approve_gate_pass(gate_pass_id, action):
                     VALUES (%s, %s, 'store', %s)
                 ''', (gate_pass_id, user_id, approval_status))
         
-        # 🔥 COMMIT IMMEDIATELY
-        conn.commit()
-        
-        # 🔥 BACKGROUND NOTIFICATIONS (Don't wait for them)
+        # 🔥 NOTIFICATIONS - one outbox event, committed together with the approval
         if user_role == 'department_head':
+            # Notify creator
+            rows = [(created_by, f"📋 Your Gate Pass {pass_number} has been {action}d", 'status', gate_pass_id)]
+            role_notifications = []
             if action == 'approve':
-                # Notify store managers in background
-                async_notification_bulk('store_manager', f"📋 Gate Pass {pass_number} needs approval", 'approval', gate_pass_id)
-            
-            # Notify creator in background
-            async_notify(created_by, f"📋 Your Gate Pass {pass_number} has been {action}d", 'status', gate_pass_id)
+                # Notify store managers
+                role_notifications.append(('store_manager', f"📋 Gate Pass {pass_number} needs approval", 'approval', gate_pass_id))
         
         elif user_role == 'store_manager':
+            # Notify creator and department head
+            rows = [(created_by, f"🏪 Your Gate Pass {pass_number} has been {action}d", 'status', gate_pass_id)]
+            role_notifications = []
             if action == 'approve':
-                # Notify security in background
-                async_notification_bulk('security', f"🛡️ Gate Pass {pass_number} needs approval", 'approval', gate_pass_id)
-            
-            # Notify creator and department head in background
-            async_notify(created_by, f"🏪 Your Gate Pass {pass_number} has been {action}d", 'status', gate_pass_id)
+                # Notify security
+                role_notifications.append(('security', f"🛡️ Gate Pass {pass_number} needs approval", 'approval', gate_pass_id))
             
             # Notify department head
             cursor.execute('SELECT id FROM users WHERE department_id = %s AND role = "department_head" LIMIT 1', (department_id,))
             dept_head = cursor.fetchone()
             if dept_head:
-                async_notify(dept_head[0], f"🏪 Gate Pass {pass_number} has been {action}d by store", 'status', gate_pass_id)
+                rows.append((dept_head[0], f"🏪 Gate Pass {pass_number} has been {action}d by store", 'status', gate_pass_id))
+        
+        enqueue_notifications(cursor, rows, role_notifications, event_type=f'{user_role}_{action}', gate_pass_id=gate_pass_id)
+        
+        # 🔥 COMMIT IMMEDIATELY
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         
         return jsonify({
             'success': True, 
@@ -310,9 +265,10 @@ def fast_inquiry(gate_pass_id):
             return jsonify({'success': False, 'message': f'Gate pass is already {current_status}!'})
         
         # Fast update
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE gate_passes 
-            SET status = 'inquiry', department_approval = 'inquiry', department_approval_date = %s
+            SET status = 'inquiry', department_approval = 'inquiry', department_approval_date = %s,
+                {SET_OVERDUE_SEVERITY_SQL}
             WHERE id = %s
         ''', (datetime.now(), gate_pass_id))
         
@@ -322,10 +278,13 @@ def fast_inquiry(gate_pass_id):
             VALUES (%s, %s, 'department', 'inquiry', %s)
         ''', (gate_pass_id, session['user_id'], inquiry_purpose))
         
-        conn.commit()
+        # Notify store managers (outbox event, committed with the inquiry)
+        enqueue_notifications(cursor, role_notifications=[('store_manager', f"❓ Gate Pass {pass_number} marked for inquiry", 'alert', gate_pass_id)],
+                              event_type='inquiry', gate_pass_id=gate_pass_id)
         
-        # Background notifications
-        async_notification_bulk('store_manager', f"❓ Gate Pass {pass_number} marked for inquiry", 'inquiry', gate_pass_id)
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         
         return jsonify({
             'success': True, 
@@ -374,6 +333,7 @@ def fast_approve_user(user_id, action):
         cursor.execute('UPDATE users SET status = %s WHERE id = %s', (status, user_id))
         
         conn.commit()
+        invalidate_counters()
         
         return jsonify({
             'success': True, 
@@ -387,6 +347,32 @@ def fast_approve_user(user_id, action):
         cursor.close()
         conn.close()
 
+@gate_pass_bp.route('/photos', methods=['PUT', 'POST'])
+def upload_gate_pass_photo():
+    """Stream one material photo (raw JPEG body) to staging and return its image token.
+
+    The camera sends each capture as a binary PUT right after taking it; the
+    gate pass form then only carries the tokens in image_tokens[].
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Login required'}), 401
+    
+    try:
+        if request.mimetype == 'multipart/form-data':
+            # Multipart fallback (older clients) - Werkzeug has already spooled the part to a temp file
+            photo = request.files.get('photo')
+            if not photo:
+                return jsonify({'success': False, 'message': 'No photo uploaded'}), 400
+            token = stage_photo_stream(photo.stream, session['user_id'])
+        else:
+            token = stage_photo_stream(request.stream, session['user_id'])
+        return jsonify({'success': True, 'token': token})
+    except PhotoUploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Photo upload error: {e}")
+        return jsonify({'success': False, 'message': 'Photo upload failed!'}), 500
+
 @gate_pass_bp.route('/create_gate_pass', methods=['GET', 'POST'])
 def create_gate_pass():
     """Create new gate pass - WITH DEPARTMENT RESTRICTION"""
@@ -525,11 +511,13 @@ def create_gate_pass():
                                      stores=stores)
             form_data[field] = value
         
-        # Check photos
+        # Check photos - image tokens from the streamed upload endpoint, base64 fields from older clients
+        max_photos = config['default'].PHOTO_MAX_PER_PASS
+        image_tokens = list(dict.fromkeys(t for t in request.form.getlist('image_tokens[]') if t))[:max_photos]
         captured_images = request.form.getlist('captured_images[]')
-        valid_images = [img for img in captured_images if img and img.startswith('data:image')]
+        valid_images = [img for img in captured_images if img and img.startswith('data:image')][:max_photos]
         
-        if len(valid_images) < 4:
+        if len(image_tokens) < 4 and len(valid_images) < 4:
             flash('❌ Minimum 4 photos required!', 'error')
             return render_template('create_gate_pass.html', 
                                  divisions=divisions, 
@@ -541,10 +529,22 @@ def create_gate_pass():
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             pass_number = f"GP{timestamp}"
             
-            # Save images (fast version)
+            # Save images (content-addressed storage - same-second passes no longer collide);
+            # staged uploads are copied, and only released once the gate pass is committed
             saved_paths = []
-            upload_folder = 'static/uploads'
-            os.makedirs(upload_folder, exist_ok=True)
+            claimed_tokens = []
+            
+            if len(image_tokens) >= 4:
+                try:
+                    saved_paths = claim_photo_tokens(image_tokens, session['user_id'])
+                    claimed_tokens = image_tokens
+                except PhotoUploadError as e:
+                    flash(f'❌ {e}', 'error')
+                    return render_template('create_gate_pass.html', 
+                                         divisions=divisions, 
+                                         departments=departments,
+                                         stores=stores)
+                valid_images = []
             
             for i, img_data in enumerate(valid_images[:4]):  # Only first 4 images
                 if ',' in img_data:
@@ -553,14 +553,7 @@ def create_gate_pass():
                     encoded = img_data
                 
                 try:
-                    image_bytes = base64.b64decode(encoded)
-                    filename = f"fast_{timestamp}_{i+1}.jpg"
-                    filepath = os.path.join(upload_folder, filename)
-                    
-                    with open(filepath, 'wb') as f:
-                        f.write(image_bytes)
-                    
-                    saved_paths.append(f"uploads/{filename}")
+                    saved_paths.append(save_photo_bytes(base64.b64decode(encoded)))
                 except:
                     continue
             
@@ -617,10 +610,8 @@ def create_gate_pass():
             except:
                 pass  # QR can fail, gate pass still created
             
-            # Commit FIRST, then send notifications
-            conn.commit()
-            
-            # Send notifications (non-blocking)
+            # Notifications ride in the same transaction as the gate pass (outbox event)
+            rows = []
             try:
                 # Notify department head
                 cursor.execute('''
@@ -631,19 +622,16 @@ def create_gate_pass():
                     LIMIT 1
                 ''', (int(form_data['department_id']),))
                 
+                # Notify creator
+                rows = [(session['user_id'],
+                         f"✅ Gate Pass {pass_number} created successfully! Store: {store_name}",
+                         'status', gate_pass_id)]
+                
                 dept_head = cursor.fetchone()
                 if dept_head:
-                    # Use async notification
-                    async_notify(dept_head[0], 
-                                f"📋 New Gate Pass {pass_number} needs approval",
-                                'approval',
-                                gate_pass_id)
-                
-                # Notify creator
-                async_notify(session['user_id'],
-                            f"✅ Gate Pass {pass_number} created successfully! Store: {store_name}",
-                            'status',
-                            gate_pass_id)
+                    rows.append((dept_head[0],
+                                 f"📋 New Gate Pass {pass_number} needs approval",
+                                 'approval', gate_pass_id))
                 
                 # Notify the selected store manager
                 store_manager_username = 'store1' if store_location == 'store_1' else 'store2'
@@ -657,13 +645,20 @@ def create_gate_pass():
                 
                 store_manager = cursor.fetchone()
                 if store_manager:
-                    async_notify(store_manager[0],
-                                f"🏪 New Gate Pass {pass_number} assigned to your store",
-                                'store_alert',
-                                gate_pass_id)
-                
+                    rows.append((store_manager[0],
+                                 f"🏪 New Gate Pass {pass_number} assigned to your store",
+                                 'store_alert', gate_pass_id))
             except:
-                pass  # Notifications are optional
+                pass  # Recipient lookups are optional
+            
+            enqueue_notifications(cursor, rows, event_type='gate_pass_created', gate_pass_id=gate_pass_id)
+            
+            conn.commit()
+            release_photo_tokens(claimed_tokens, session['user_id'])
+            invalidate_counters()
+            wake_outbox_dispatcher()
+            schedule_overdue_check(gate_pass_id, return_datetime)
+            queue_renditions(gate_pass_id, saved_paths)  # Thumbnail / print sizes, rendered off the request
             
             flash(f'✅ Gate Pass {pass_number} created successfully! Store: {store_name}', 'success')
             print(f"🎉 Gate Pass {pass_number} created in under 2 seconds!")
@@ -703,45 +698,108 @@ def create_gate_pass():
                          stores=stores,
                          user_department_id=user_department_id)
 
+GATE_PASS_LIST_SELECT = '''
+    SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
+           gp.department_approval_date, gp.department_approval
+    FROM gate_passes gp 
+    JOIN users u ON gp.created_by = u.id 
+    JOIN departments d ON gp.department_id = d.id 
+    JOIN divisions dv ON gp.division_id = dv.id 
+'''
+
+def get_gate_pass_list_scope(role, user_id, username, department_id):
+    """(where_sql, params) restricting the gate pass list to what a role may see"""
+    # ✅ Store Managers - their store plus everything waiting on / approved by stores
+    if role == 'store_manager':
+        store_location = 'store_1' if 'store1' in username else 'store_2'
+        return "(gp.store_location = %s OR gp.status = 'pending_store' OR gp.status = 'approved')", (store_location,)
+
+    # ✅ Department Head - only their department's gate passes
+    if role == 'department_head':
+        return 'gp.department_id = %s', (department_id,)
+
+    # ✅ Security - ALL department approved gate passes
+    if role == 'security':
+        return "gp.department_approval = 'approved'", ()
+
+    # ✅ System Admin - all gate passes
+    if role == 'system_admin':
+        return '1=1', ()
+
+    # ✅ Regular User - only their own passes from their department
+    return 'gp.created_by = %s AND gp.department_id = %s', (user_id, department_id)
+
+def fetch_gate_pass_page(cursor, role, user_id, username, department_id, page_cursor=None, page_size=None):
+    """One page of the role-scoped gate pass list, newest first.
+
+    Keyset pagination on (created_at, id) so every page costs the same
+    regardless of depth. Returns (gate_passes, next_cursor).
+    """
+    scope_sql, scope_params = get_gate_pass_list_scope(role, user_id, username, department_id)
+    keyset_sql, keyset_params = keyset_condition(page_cursor)
+
+    sql = f'''{GATE_PASS_LIST_SELECT}
+        WHERE {scope_sql} AND {keyset_sql}
+        ORDER BY gp.created_at DESC, gp.id DESC
+    '''
+    return fetch_page(cursor, sql, scope_params + keyset_params, get_page_size(page_size))
+
 @gate_pass_bp.route('/gate_pass_list')
 def gate_pass_list():
+    """Gate pass list - first page as HTML, further pages via ?format=json&cursor=... (infinite scroll)"""
+    wants_json = request.args.get('format') == 'json'
+
     if 'user_id' not in session:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Access denied!'})
         return redirect(url_for('auth.login'))
     
     conn = get_db_connection()
     if conn is None:
+        if wants_json:
+            return jsonify({'success': False, 'message': 'Database connection failed!'})
         flash('Database connection failed!', 'error')
         return render_template('gate_pass_list.html', gate_passes=[], store_requests=[])
     
     cursor = conn.cursor()
+    role = session['role']
+    current_user_department_id = None
+    gate_passes = []
+    store_requests = []
+    next_cursor = None
     
     try:
-        current_user_department_id = None
-        
         # ✅ FIXED: Get current user's department for template
         cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
         user_dept_result = cursor.fetchone()
         if user_dept_result:
             current_user_department_id = user_dept_result[0]
         
-        # ✅ FIXED: For Store Managers - Show ALL gate passes AND their store requests
-        if session['role'] == 'store_manager':
+        if role == 'department_head' and current_user_department_id is None:
+            gate_passes, next_cursor = [], None
+        else:
+            gate_passes, next_cursor = fetch_gate_pass_page(
+                cursor, role, session['user_id'], session['username'], current_user_department_id,
+                page_cursor=request.args.get('cursor'),
+                page_size=request.args.get('per_page')
+            )
+        
+        if wants_json:
+            # Rows are rendered server-side too so infinite scroll reuses the exact row markup
+            rows_html = render_template('gate_pass_rows.html',
+                                        gate_passes=gate_passes,
+                                        current_user_department_id=current_user_department_id)
+            return jsonify({
+                'success': True,
+                'gate_passes': gate_passes,
+                'html': rows_html,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
+        
+        # ✅ FIXED: Store Managers also see their own store requests
+        if role == 'store_manager':
             store_location = 'store_1' if 'store1' in session['username'] else 'store_2'
-            
-            # ✅ FIXED: Get ALL gate passes that are relevant to store manager
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
-                       gp.department_approval_date, gp.department_approval
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
-                WHERE (gp.store_location = %s OR gp.status = 'pending_store' OR gp.status = 'approved')
-                ORDER BY gp.created_at DESC
-            ''', (store_location,))
-            gate_passes = dict_fetchall(cursor)
-            
-            # Get store manager's own requests
             cursor.execute('''
                 SELECT sr.*, u.name as admin_name
                 FROM store_manager_requests sr
@@ -750,110 +808,25 @@ def gate_pass_list():
                 ORDER BY sr.created_at DESC
             ''', (session['user_id'], store_location))
             store_requests = dict_fetchall(cursor)
-            
-            return render_template('gate_pass_list.html', 
-                                 gate_passes=gate_passes, 
-                                 store_requests=store_requests,
-                                 user_role='store_manager')
-        
-        # ✅ FIXED: For Department Head - Only their department's gate passes
-        elif session['role'] == 'department_head':
-            # Get department head's department
-            cursor.execute('SELECT department_id FROM users WHERE id = %s', (session['user_id'],))
-            user_dept = cursor.fetchone()
-            
-            if user_dept:
-                department_id = user_dept[0]
-                # Department Head এর জন্য Department Approval তথ্য সহ
-                cursor.execute('''
-                    SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
-                           gp.department_approval_date, gp.department_approval
-                    FROM gate_passes gp 
-                    JOIN users u ON gp.created_by = u.id 
-                    JOIN departments d ON gp.department_id = d.id 
-                    JOIN divisions dv ON gp.division_id = dv.id 
-                    WHERE gp.department_id = %s 
-                    ORDER BY gp.created_at DESC
-                ''', (department_id,))
-                gate_passes = dict_fetchall(cursor)
-            else:
-                gate_passes = []
-            
-            return render_template('gate_pass_list.html', 
-                                 gate_passes=gate_passes, 
-                                 store_requests=[],
-                                 current_user_department_id=current_user_department_id)
-        
-        # ✅ FIXED: For Security - ALL department approved gate passes
-        elif session['role'] == 'security':
-            # ✅ FIXED: Security can see ALL department approved gate passes
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
-                       gp.department_approval_date, gp.department_approval
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
-                WHERE gp.department_approval = 'approved' 
-                ORDER BY gp.department_approval_date DESC, gp.created_at DESC
-            ''')
-            gate_passes = dict_fetchall(cursor)
-            
-            return render_template('gate_pass_list.html', 
-                                 gate_passes=gate_passes, 
-                                 store_requests=[],
-                                 user_role='security')
-        
-        # ✅ FIXED: For System Admin - All gate passes
-        elif session['role'] == 'system_admin':
-            # System Admin এর জন্য Department Approval তথ্য সহ
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
-                       gp.department_approval_date, gp.department_approval
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
-                ORDER BY gp.created_at DESC
-            ''')
-            gate_passes = dict_fetchall(cursor)
-            
-            return render_template('gate_pass_list.html', 
-                                 gate_passes=gate_passes, 
-                                 store_requests=[])
-        
-        # ✅ FIXED: For Regular User - Only their own passes from their department
-        else:
-            # Regular User এর জন্য Department Approval তথ্য সহ
-            cursor.execute('''
-                SELECT gp.*, u.name as creator_name, d.name as department_name, dv.name as division_name,
-                       gp.department_approval_date, gp.department_approval
-                FROM gate_passes gp 
-                JOIN users u ON gp.created_by = u.id 
-                JOIN departments d ON gp.department_id = d.id 
-                JOIN divisions dv ON gp.division_id = dv.id 
-                WHERE gp.created_by = %s 
-                AND gp.department_id = %s  -- ✅ Department restriction
-                ORDER BY gp.created_at DESC
-            ''', (session['user_id'], current_user_department_id))
-            gate_passes = dict_fetchall(cursor)
-            
-            return render_template('gate_pass_list.html', 
-                                 gate_passes=gate_passes, 
-                                 store_requests=[])
         
     except Exception as e:
         print(f"Gate pass list error: {e}")
+        if wants_json:
+            return jsonify({'success': False, 'message': f'Error: {str(e)}'})
         gate_passes = []
         store_requests = []
+        next_cursor = None
     finally:
         cursor.close()
         conn.close()
     
     return render_template('gate_pass_list.html', 
                          gate_passes=gate_passes, 
-                         store_requests=[],
-                         current_user_department_id=current_user_department_id)
+                         store_requests=store_requests,
+                         user_role=role if role in ('store_manager', 'security') else None,
+                         current_user_department_id=current_user_department_id,
+                         next_cursor=next_cursor,
+                         page_size=get_page_size(request.args.get('per_page')))
 
 @gate_pass_bp.route('/gate_pass_detail/<int:gate_pass_id>')
 def gate_pass_detail(gate_pass_id):
@@ -895,12 +868,13 @@ def gate_pass_detail(gate_pass_id):
             gate_pass['images_list'] = json.loads(gate_pass['images']) if gate_pass['images'] else []
         except:
             gate_pass['images_list'] = []
+        gate_pass['photos'] = parse_photos(gate_pass)
         
-        # Generate QR code images for display
+        # QR code images for display (cached PNG URLs - rendered once per payload)
         if gate_pass['qr_code_form']:
-            gate_pass['qr_form_img'] = generate_qr_code(gate_pass['qr_code_form'])
+            gate_pass['qr_form_img'] = qr_image_url(gate_pass['qr_code_form'])
         if gate_pass['qr_code_sticker']:
-            gate_pass['qr_sticker_img'] = generate_qr_code(gate_pass['qr_code_sticker'])
+            gate_pass['qr_sticker_img'] = qr_image_url(gate_pass['qr_code_sticker'])
         
         # Get approval history (FIXED - Check if table exists)
         approvals = []
@@ -1028,22 +1002,18 @@ def security_approve_gate_pass(gate_pass_id, action):
             message = f"❌ Gate Pass {gate_pass['pass_number']} rejected by Security."
         
         # Update gate pass
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE gate_passes 
             SET status = %s, security_approval = %s, security_approval_date = %s,
-                approved_by_security = %s
+                approved_by_security = %s,
+                {SET_OVERDUE_SEVERITY_SQL}
             WHERE id = %s
         ''', (new_status, security_approval_status, datetime.now(), session['name'], gate_pass_id))
         
-        conn.commit()
-        
-        # Background notifications
-        async_notify(
-            gate_pass['created_by'],
-            f"🛡️ Your Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
-            'status',
-            gate_pass_id
-        )
+        # Notifications for every party - one outbox event, committed with the update
+        rows = [(gate_pass['created_by'],
+                 f"🛡️ Your Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
+                 'status', gate_pass_id)]
         
         # Notify department head
         cursor.execute('''
@@ -1056,12 +1026,9 @@ def security_approve_gate_pass(gate_pass_id, action):
         
         dept_head = cursor.fetchone()
         if dept_head:
-            async_notify(
-                dept_head[0],
-                f"🛡️ Gate Pass {gate_pass['pass_number']} from your department has been {action}d by Security",
-                'status',
-                gate_pass_id
-            )
+            rows.append((dept_head[0],
+                         f"🛡️ Gate Pass {gate_pass['pass_number']} from your department has been {action}d by Security",
+                         'status', gate_pass_id))
         
         # Notify store manager (if store was involved)
         if gate_pass['store_location']:
@@ -1072,15 +1039,18 @@ def security_approve_gate_pass(gate_pass_id, action):
             ''')
             store_manager = cursor.fetchone()
             if store_manager:
-                async_notify(
-                    store_manager[0],
-                    f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
-                    'status',
-                    gate_pass_id
-                )
+                rows.append((store_manager[0],
+                             f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security",
+                             'status', gate_pass_id))
         
         # Notify all system admins
-        async_notification_bulk('system_admin', f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security ({session['name']})", 'status', gate_pass_id)
+        enqueue_notifications(cursor, rows,
+                              [('system_admin', f"🛡️ Gate Pass {gate_pass['pass_number']} has been {action}d by Security ({session['name']})", 'status', gate_pass_id)],
+                              event_type=f'security_{action}', gate_pass_id=gate_pass_id)
+        
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         
         return jsonify({'success': True, 'message': message})
         
@@ -1145,19 +1115,19 @@ def edit_gate_pass(gate_pass_id):
             WHERE id = %s
         ''', (material_description, destination, purpose, receiver_name, receiver_contact, datetime.now(), gate_pass_id))
         
-        conn.commit()
-        
-        # ✅ Notify Super Admin
-        async_notification_bulk('system_admin', f"✏️ Gate Pass {gate_pass['pass_number']} edited by Department Head {session['name']}", 'alert', gate_pass_id)
-        
-        # Notify creator
-        async_notify(
-            gate_pass['created_by'],
-            f"✏️ Your Gate Pass {gate_pass['pass_number']} has been edited by department head",
-            'status',
-            gate_pass_id
+        # ✅ Notify creator and Super Admin (one outbox event, committed with the edit)
+        enqueue_notifications(
+            cursor,
+            [(gate_pass['created_by'],
+              f"✏️ Your Gate Pass {gate_pass['pass_number']} has been edited by department head",
+              'status', gate_pass_id)],
+            [('system_admin', f"✏️ Gate Pass {gate_pass['pass_number']} edited by Department Head {session['name']}", 'alert', gate_pass_id)],
+            event_type='gate_pass_edited', gate_pass_id=gate_pass_id
         )
         
+        conn.commit()
+        wake_outbox_dispatcher()
+        
         return jsonify({'success': True, 'message': 'Gate pass updated successfully!'})
         
     except Exception as e:
@@ -1207,19 +1177,20 @@ def delete_gate_pass_by_dept_head(gate_pass_id):
         # Delete gate pass
         cursor.execute('DELETE FROM gate_passes WHERE id = %s', (gate_pass_id,))
         
-        conn.commit()
-        
-        # ✅ Notify Super Admin
-        async_notification_bulk('system_admin', f"🗑️ Gate Pass {gate_pass['pass_number']} deleted by Department Head {session['name']}", 'alert', None)
-        
-        # Notify creator
-        async_notify(
-            gate_pass['created_by'],
-            f"🗑️ Your Gate Pass {gate_pass['pass_number']} has been deleted by department head",
-            'status',
-            None
+        # ✅ Notify creator and Super Admin (one outbox event, committed with the delete)
+        enqueue_notifications(
+            cursor,
+            [(gate_pass['created_by'],
+              f"🗑️ Your Gate Pass {gate_pass['pass_number']} has been deleted by department head",
+              'status', None)],
+            [('system_admin', f"🗑️ Gate Pass {gate_pass['pass_number']} deleted by Department Head {session['name']}", 'alert', None)],
+            event_type='gate_pass_deleted'
         )
         
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
+        
         return jsonify({'success': True, 'message': 'Gate pass deleted successfully!'})
         
     except Exception as e:
@@ -1265,12 +1236,12 @@ def create_store_request():
                 receiver_name, receiver_contact, quantity, urgency
             ))
             
-            request_id = cursor.lastrowid
-            
             # Notify ALL System Administrators and HR/Admin users
-            async_notification_bulk('system_admin', f"🏪 Store Request from {session['name']} ({store_location}): {material_description}", 'approval', request_id)
+            enqueue_notifications(cursor, role_notifications=[('system_admin', f"🏪 Store Request from {session['name']} ({store_location}): {material_description}", 'approval', None)],
+                                  event_type='store_request')
             
             conn.commit()
+            wake_outbox_dispatcher()
             flash('✅ Store request submitted successfully! HR/Admin will review and create gate pass.', 'success')
             
         except Exception as e:
@@ -1348,9 +1319,10 @@ def mark_material_dispatched(gate_pass_id):
             return jsonify({'success': False, 'message': 'Gate pass is not approved yet!'})
         
         # Update gate pass status
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE gate_passes 
-            SET status = 'in_transit', store_location = %s
+            SET status = 'in_transit', store_location = %s,
+                {SET_OVERDUE_SEVERITY_SQL}
             WHERE id = %s
         ''', (store_location, gate_pass_id))
         
@@ -1366,14 +1338,17 @@ def mark_material_dispatched(gate_pass_id):
         ))
         
         # Notify creator
-        async_notify(
-            gate_pass['created_by'],
-            f"🚚 Your material with Gate Pass {gate_pass['pass_number']} has been dispatched from {store_location}",
-            'status',
-            gate_pass_id
+        enqueue_notifications(
+            cursor,
+            [(gate_pass['created_by'],
+              f"🚚 Your material with Gate Pass {gate_pass['pass_number']} has been dispatched from {store_location}",
+              'status', gate_pass_id)],
+            event_type='material_dispatched', gate_pass_id=gate_pass_id
         )
         
         conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
         return jsonify({'success': True, 'message': f'Material marked as dispatched from {store_location}!'})
         
     except Exception as e:
@@ -1424,6 +1399,7 @@ def fast_create_gate_pass():
         
         gate_pass_id = cursor.lastrowid
         conn.commit()
+        invalidate_counters()
         cursor.close()
         conn.close()
         
@@ -1486,6 +1462,7 @@ def quick_manual_return():
             UPDATE gate_passes 
             SET actual_return_date = %s, 
                 status = 'returned',
+                overdue_severity = 'none',
                 security_approval_date = %s,
                 returned_by_security = %s
             WHERE id = %s
@@ -1498,16 +1475,20 @@ def quick_manual_return():
         ''', (gate_pass['id'], session['user_id'], 
               f'Manual return. Gate Pass: {pass_number}. Handled by: {session["name"]}'))
         
-        conn.commit()
-        
-        # Send notification
-        async_notify(
-            gate_pass['created_by'],
-            f"✅ আপনার Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে। Security: {session['name']}",
-            'status',
-            gate_pass['id']
+        # Send notification (outbox event, committed with the return)
+        enqueue_notifications(
+            cursor,
+            [(gate_pass['created_by'],
+              f"✅ আপনার Gate Pass {pass_number} এর মালামাল ম্যানুয়ালি রিটার্ন হয়েছে। Security: {session['name']}",
+              'status', gate_pass['id'])],
+            event_type='material_returned', gate_pass_id=gate_pass['id']
         )
         
+        conn.commit()
+        invalidate_counters()
+        wake_outbox_dispatcher()
+        cancel_overdue_check(gate_pass['id'])
+        
         return jsonify({
             'success': True,
             'message': f'✅ Gate Pass {pass_number} সফলভাবে রিটার্ন করা হয়েছে!',
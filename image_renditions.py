@@ -0,0 +1,220 @@
+# image_renditions.py - BACKGROUND THUMBNAIL / RESIZE PIPELINE FOR MATERIAL PHOTOS
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from config import config
+
+# (name, max width px, JPEG quality), smallest first - templates ask for a name and get
+# that rendition or the next larger one, falling back to the original upload
+RENDITIONS = (
+    ('thumb', 240, 70),     # Previews / lists
+    ('print', 640, 80),     # Printed gate pass (photos are ~40mm wide)
+    ('medium', 1024, 82),   # Full-width on screen
+)
+RENDITION_NAMES = tuple(name for name, _, _ in RENDITIONS)
+
+def rendition_path(original_path, name):
+    """uploads/.../<hash>.jpg -> uploads/.../<hash>_thumb.jpg (photo storage keys)"""
+    base, _ = os.path.splitext(original_path)
+    return f"{base}_{name}.jpg"
+
+def render_photo(original_path):
+    """Write every rendition of one photo; returns {name: path}. Runs in a worker process.
+
+    Reads and writes go through the photo storage backend, so workers need no
+    shared disk. Sizes at or above the original width reuse the original
+    instead of upscaling.
+    """
+    from io import BytesIO
+    from PIL import Image, ImageOps
+    from photo_storage import get_photo_storage
+
+    storage = get_photo_storage()
+    produced = {}
+    with Image.open(BytesIO(storage.read(original_path))) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        for name, width, quality in RENDITIONS:
+            if img.width <= width:
+                produced[name] = original_path
+                continue
+            resized = img.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+            buffered = BytesIO()
+            resized.save(buffered, 'JPEG', quality=quality, optimize=True, progressive=True)
+            path = rendition_path(original_path, name)
+            storage.put_bytes(buffered.getvalue(), path)
+            produced[name] = path
+
+    return produced
+
+def render_photos(original_paths):
+    """{original: {name: path}} for a gate pass's photos - one job per pass keeps IPC small"""
+    renditions = {}
+    for original_path in original_paths:
+        try:
+            renditions[original_path] = render_photo(original_path)
+        except Exception as e:
+            print(f"⚠️ Could not render {original_path}: {e}")
+    return renditions
+
+def _all_rendered(renditions, original_paths):
+    """Only complete results are stored - a NULL column is what makes backfill_renditions retry"""
+    return bool(renditions) and set(renditions) >= set(original_paths)
+
+# ==================== PROCESS POOL ====================
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def get_rendition_executor():
+    """Process pool (spawned, so workers don't inherit DB connections or threads).
+
+    Spawned workers re-import the launching script as __mp_main__ - app.py keeps
+    its startup behind that check, and render_photos only needs config,
+    photo_storage and Pillow.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(
+                    max_workers=config['default'].IMAGE_RENDITION_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+def save_renditions(gate_pass_id, renditions):
+    """Store {original: {name: path}} in gate_passes.image_renditions"""
+    from models import get_db_connection
+
+    conn = get_db_connection()
+    if conn is None:
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('UPDATE gate_passes SET image_renditions = %s WHERE id = %s',
+                       (json.dumps(renditions), gate_pass_id))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving renditions for gate pass {gate_pass_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+def queue_renditions(gate_pass_id, original_paths):
+    """Render a new gate pass's photos in the background; pages use the originals until it's done"""
+    if not original_paths:
+        return
+
+    def on_done(future):
+        try:
+            renditions = future.result()
+        except Exception as e:
+            print(f"❌ Rendition job for gate pass {gate_pass_id} failed: {e}")
+            return
+        if not _all_rendered(renditions, original_paths):
+            print(f"⚠️ Some photos of gate pass {gate_pass_id} failed to render - left for the backfill")
+            return
+        if save_renditions(gate_pass_id, renditions):
+            print(f"🖼️ Renditions ready for gate pass {gate_pass_id} ({len(renditions)} photo(s))")
+
+    try:
+        future = get_rendition_executor().submit(render_photos, list(original_paths))
+        future.add_done_callback(on_done)
+    except Exception as e:
+        # Pool unavailable (e.g. shutting down) - the backfill CLI picks the pass up later
+        print(f"⚠️ Could not queue renditions for gate pass {gate_pass_id}: {e}")
+
+# ==================== TEMPLATE HELPERS ====================
+
+def parse_photos(gate_pass):
+    """[{'original': path, 'thumb': path, ...}] from gate_passes.images + image_renditions"""
+    try:
+        originals = json.loads(gate_pass.get('images') or '[]')
+    except (TypeError, ValueError):
+        originals = []
+    try:
+        renditions = json.loads(gate_pass.get('image_renditions') or '{}')
+    except (TypeError, ValueError):
+        renditions = {}
+
+    photos = []
+    for original in originals:
+        photo = {'original': original}
+        photo.update(renditions.get(original, {}))
+        photos.append(photo)
+    return photos
+
+def photo_src(photo, size='thumb'):
+    """Storage key of the smallest rendition at least as large as size"""
+    if isinstance(photo, str):
+        return photo
+    for name in RENDITION_NAMES[RENDITION_NAMES.index(size):]:
+        if photo.get(name):
+            return photo[name]
+    return photo['original']
+
+# ==================== MIGRATION / BACKFILL ====================
+
+def add_image_renditions_column(cursor):
+    cursor.execute('''
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'gate_passes' AND COLUMN_NAME = 'image_renditions'
+    ''')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('ALTER TABLE gate_passes ADD COLUMN image_renditions TEXT NULL AFTER images')
+        print("🛠️ Added gate_passes.image_renditions")
+
+def backfill_renditions(limit=None):
+    """Render photos of passes that have none yet (older passes, or jobs lost to a restart)"""
+    from models import get_db_connection, dict_fetchall
+
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed!")
+        return 0
+
+    cursor = conn.cursor()
+
+    try:
+        sql = '''
+            SELECT id, images FROM gate_passes
+            WHERE image_renditions IS NULL AND images IS NOT NULL AND images <> '[]'
+            ORDER BY id
+        '''
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        cursor.execute(sql)
+        pending = dict_fetchall(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    done = 0
+    for gate_pass in pending:
+        try:
+            original_paths = json.loads(gate_pass['images'])
+        except ValueError:
+            continue
+        renditions = render_photos(original_paths)
+        if _all_rendered(renditions, original_paths) and save_renditions(gate_pass['id'], renditions):
+            done += 1
+    print(f"🖼️ Backfilled renditions for {done} gate pass(es)")
+    return done
+
+if __name__ == '__main__':
+    # python image_renditions.py [limit]  -> render photos for passes without renditions
+    backfill_renditions(int(sys.argv[1]) if len(sys.argv) > 1 else None)
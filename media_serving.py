@@ -0,0 +1,104 @@
+# media_serving.py - FILE / BYTES RESPONSES WITH STRONG ETAGS, RANGE, IMMUTABLE CACHING AND PROXY OFFLOAD
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import Response, request, send_file
+from config import config
+
+# Content-addressed names: <sha256>.<ext> or a rendition <sha256>_<name>.jpg
+HASHED_NAME_PATTERN = re.compile(r'(^|/)[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$')
+
+IMMUTABLE_MAX_AGE = 31536000  # One year - the longest caches honour
+
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+def is_content_hashed(path):
+    return bool(HASHED_NAME_PATTERN.search(path.replace(os.sep, '/')))
+
+def name_etag(path):
+    """<sha256>[_rendition] from a content-addressed name, else None"""
+    name = os.path.basename(path)
+    return name.rsplit('.', 1)[0] if is_content_hashed(name) else None
+
+def file_etag(path, stat_result=None):
+    """Strong ETag: the hash in a content-addressed name, else sha256 of the file (cached per mtime/size)"""
+    etag = name_etag(path)
+    if etag:
+        return etag
+
+    stat_result = stat_result or os.stat(path)
+    signature = (stat_result.st_mtime_ns, stat_result.st_size)
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+
+    with _etag_lock:
+        _etag_cache[path] = (signature, etag)
+    return etag
+
+def cache_control(immutable=False, max_age=None, private=False, revalidate=False):
+    """Cache-Control value - immutable files are never revalidated, the rest get a 304 once stale"""
+    scope = 'private' if private else 'public'
+    if immutable:
+        return f"{scope}, max-age={max_age or IMMUTABLE_MAX_AGE}, immutable"
+    if revalidate or not max_age:
+        return f"{scope}, no-cache"
+    return f"{scope}, max-age={max_age}"
+
+def _accel_redirect_response(path, mimetype, etag, cache_header):
+    """Empty response telling nginx to send the file itself (it also handles Range)"""
+    cfg = config['default']
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(cfg.MEDIA_OFFLOAD_ROOT))
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = Response(status=200, mimetype=mimetype)
+    response.headers['X-Accel-Redirect'] = f"{cfg.MEDIA_ACCEL_PREFIX.rstrip('/')}/{relative.replace(os.sep, '/')}"
+    response.headers['Cache-Control'] = cache_header
+    response.set_etag(etag)
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        # Answer the 304 ourselves - nginx would otherwise follow the redirect and send the file
+        del response.headers['X-Accel-Redirect']
+    return response
+
+def serve_file(path, mimetype=None, immutable=None, max_age=None, private=False, revalidate=False):
+    """Send a file with a strong ETag, 304 / 206 handling and the right Cache-Control.
+
+    immutable defaults to "the name is a content hash". With MEDIA_OFFLOAD set,
+    the body is handed to the front proxy (X-Sendfile / X-Accel-Redirect).
+    Returns a 404 response when the file doesn't exist.
+    """
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return Response('Not found', status=404)
+
+    if immutable is None:
+        immutable = is_content_hashed(path)
+    etag = file_etag(path, stat_result)
+    cache_header = cache_control(immutable, max_age, private, revalidate)
+
+    if config['default'].MEDIA_OFFLOAD == 'x-accel-redirect':
+        return _accel_redirect_response(path, mimetype, etag, cache_header)
+
+    # conditional=True gives If-None-Match -> 304 and Range / If-Range -> 206;
+    # app.use_x_sendfile (MEDIA_OFFLOAD = 'x-sendfile') makes this emit X-Sendfile instead of the body
+    response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True, etag=etag)
+    response.headers['Cache-Control'] = cache_header
+    return response
+
+def serve_bytes(data, mimetype, etag=None, immutable=False, max_age=None, private=False):
+    """Same caching / conditional / Range behaviour for in-memory bodies (QR codes, proxied photos)"""
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag or hashlib.sha256(data).hexdigest()[:32])
+    response.headers['Cache-Control'] = cache_control(immutable, max_age, private)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
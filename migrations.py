@@ -0,0 +1,212 @@
+# migrations.py - VERSIONED SCHEMA MIGRATIONS (schema_version TABLE + CLI)
+import MySQLdb
+import sys
+from models import get_db_connection, create_schema, seed_default_data
+
+MIGRATION_LOCK_NAME = 'gate_pass_schema_migration'
+MIGRATION_LOCK_TIMEOUT = 60  # seconds another process may hold the lock
+
+def _initial_schema(cursor):
+    create_schema(cursor)
+    seed_default_data(cursor)
+
+def _index_migration(version):
+    """Apply exactly the index group pinned to this migration version in db_indexes.INDEX_MIGRATIONS"""
+    def apply(cursor):
+        from db_indexes import ensure_indexes, INDEX_MIGRATIONS
+        indexes, fulltext_indexes = INDEX_MIGRATIONS[version]
+        ensure_indexes(cursor, indexes, fulltext_indexes)
+    return apply
+
+def _notification_outbox(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            event_type VARCHAR(50) NOT NULL,
+            gate_pass_id INT NULL,
+            payload TEXT NOT NULL,
+            status ENUM('pending', 'processing', 'done', 'failed') DEFAULT 'pending',
+            attempts INT DEFAULT 0,
+            claim_token CHAR(32) NULL,
+            claimed_at DATETIME NULL,
+            processed_at DATETIME NULL,
+            last_error VARCHAR(500) NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_outbox_status_id (status, id),
+            INDEX idx_outbox_claim (claim_token)
+        )
+    ''')
+
+def _notification_counters(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notification_counters (
+            user_id INT PRIMARY KEY,
+            unread_count INT NOT NULL DEFAULT 0,
+            total_count INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    from notifications import rebuild_notification_counters
+    rebuild_notification_counters(cursor)
+
+def _retention_archives(cursor):
+    from retention import create_archive_tables
+    create_archive_tables(cursor)
+
+def _overdue_severity(cursor):
+    from overdue_severity import add_overdue_severity_column
+    add_overdue_severity_column(cursor)
+
+def _image_renditions(cursor):
+    from image_renditions import add_image_renditions_column
+    add_image_renditions_column(cursor)
+
+def _live_update_state(cursor):
+    from notification_pubsub import create_live_update_state_table
+    create_live_update_state_table(cursor)
+
+# Ordered (version, description, apply) - never edit an applied migration, append a new one.
+# Migration 1 is idempotent so existing databases without schema_version adopt it safely.
+MIGRATIONS = [
+    (1, 'Base tables, legacy column fixes and default data', _initial_schema),
+    (2, 'Secondary indexes for hot gate pass / notification queries', _index_migration(2)),
+    (3, 'Keyset pagination index for the security gate pass list', _index_migration(3)),
+    (4, 'Admin gate pass filter indexes and FULLTEXT search index', _index_migration(4)),
+    (5, 'Returns list index for per-user keyset paging', _index_migration(5)),
+    (6, 'Transactional notification outbox', _notification_outbox),
+    (7, 'Notification id cursor index for long-poll', _index_migration(7)),
+    (8, 'Per-user notification counters', _notification_counters),
+    (9, 'Partitioned archive tables for notifications and security logs', _retention_archives),
+    (10, 'Materialized overdue_severity column on gate_passes', _overdue_severity),
+    (11, 'Photo rendition paths on gate_passes', _image_renditions),
+    (12, 'Shared counters version for cross-process live updates', _live_update_state),
+]
+
+HEAD_VERSION = MIGRATIONS[-1][0]
+
+def get_current_version(cursor):
+    """Highest applied version, or 0 if schema_version doesn't exist yet"""
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+        row = cursor.fetchone()
+        return row[0] or 0
+    except MySQLdb.ProgrammingError:
+        return 0
+
+def migrate(target=None):
+    """Apply every pending migration up to target (default: head) in order"""
+    target = target or HEAD_VERSION
+
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed! Please check MySQL setup.")
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        # Only one process migrates; the others wait here and then see head
+        cursor.execute('SELECT GET_LOCK(%s, %s)', (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            print("❌ Could not acquire schema migration lock!")
+            return False
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        current = get_current_version(cursor)
+
+        for version, description, apply in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+
+            print(f"🛠️ Applying migration {version}: {description}")
+            apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                (version, description)
+            )
+            conn.commit()
+            print(f"✅ Migration {version} applied")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration error: {e}")
+        import traceback
+        traceback.print_exc()
+        conn.rollback()
+        return False
+    finally:
+        try:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+        except Exception:
+            pass
+        cursor.close()
+        conn.close()
+
+def ensure_schema_current():
+    """Startup check - a single query when the database is already at head"""
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed! Please check MySQL setup.")
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        current = get_current_version(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if current >= HEAD_VERSION:
+        return True
+
+    print(f"📦 Database schema at version {current}, head is {HEAD_VERSION} - migrating...")
+    return migrate()
+
+def print_status():
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed! Please check MySQL setup.")
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        current = get_current_version(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"📊 Schema version: {current} (head: {HEAD_VERSION})")
+    for version, description, _ in MIGRATIONS:
+        state = "✅ applied" if version <= current else "⏳ pending"
+        print(f"   {version}: {description} - {state}")
+    return True
+
+if __name__ == "__main__":
+    # Usage: python migrations.py [migrate [version] | status | init]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+
+    if command == 'status':
+        ok = print_status()
+    elif command == 'init':
+        # Migrate and print the full table / default user report
+        from models import init_db
+        ok = init_db()
+    elif command == 'migrate':
+        ok = migrate(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        print("Usage: python migrations.py [migrate [version] | status | init]")
+        ok = False
+
+    sys.exit(0 if ok else 1)
@@ -1,18 +1,41 @@
 # models.py - COMPLETELY FIXED WITH PROPER INITIALIZATION INCLUDING SECURITY AND OVERDUE TRACKING
-import MySQLdb
 from config import config
+from db_pool import ConnectionPool
 import hashlib
+import os
+import threading
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Get the process-wide connection pool (re-created after fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                cfg = config['default']
+                _pool = ConnectionPool(
+                    connect_kwargs={
+                        'host': cfg.MYSQL_HOST,
+                        'user': cfg.MYSQL_USER,
+                        'passwd': cfg.MYSQL_PASSWORD,
+                        'db': cfg.MYSQL_DB
+                    },
+                    max_size=cfg.DB_POOL_SIZE,
+                    checkout_timeout=cfg.DB_POOL_CHECKOUT_TIMEOUT,
+                    max_idle_seconds=cfg.DB_POOL_MAX_IDLE_SECONDS,
+                    ping_after_seconds=cfg.DB_POOL_PING_AFTER_SECONDS
+                )
+                _pool_pid = os.getpid()
+    return _pool
 
 def get_db_connection():
+    """Check out a pooled connection - conn.close() returns it to the pool"""
     try:
-        conn = MySQLdb.connect(
-            host=config['default'].MYSQL_HOST,
-            user=config['default'].MYSQL_USER,
-            passwd=config['default'].MYSQL_PASSWORD,
-            db=config['default'].MYSQL_DB
-        )
-        return conn
-    except MySQLdb.Error as e:
+        return get_db_pool().checkout()
+    except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
@@ -86,537 +109,550 @@ def get_user_department_info(user_id):
 
 # ==================== END DEPARTMENT VALIDATION FUNCTIONS ====================
 
-def init_db():
-    conn = get_db_connection()
-    if conn is None:
-        print("❌ Database connection failed! Please check MySQL setup.")
-        return False
+def create_schema(cursor):
+    """Create all tables and add columns missing from older installs"""
+    # Divisions table (NEW)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS divisions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) UNIQUE NOT NULL,
+            description TEXT,
+            status ENUM('active', 'inactive') DEFAULT 'active',
+            created_by INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    ''')
     
-    cursor = conn.cursor()
+    # Departments table (NEW - Now linked to divisions)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            division_id INT NOT NULL,
+            description TEXT,
+            status ENUM('active', 'inactive') DEFAULT 'active',
+            created_by INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (division_id) REFERENCES divisions(id),
+            UNIQUE KEY unique_dept_in_division (division_id, name)
+        )
+    ''')
     
-    try:
-        # Divisions table (NEW)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS divisions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) UNIQUE NOT NULL,
-                description TEXT,
-                status ENUM('active', 'inactive') DEFAULT 'active',
-                created_by INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Departments table (NEW - Now linked to divisions)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS departments (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                division_id INT NOT NULL,
-                description TEXT,
-                status ENUM('active', 'inactive') DEFAULT 'active',
-                created_by INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (division_id) REFERENCES divisions(id),
-                UNIQUE KEY unique_dept_in_division (division_id, name)
-            )
-        ''')
-        
-        # Users table - UPDATED with division_id
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(80) UNIQUE NOT NULL,
-                password VARCHAR(120) NOT NULL,
-                name VARCHAR(100) NOT NULL,
-                designation VARCHAR(100) NOT NULL,
-                division_id INT,
-                department_id INT NOT NULL,
-                phone VARCHAR(15),
-                email VARCHAR(120),
-                role ENUM('system_admin', 'security', 'department_head', 'store_manager', 'user') DEFAULT 'user',
-                status ENUM('pending', 'approved', 'rejected', 'inactive') DEFAULT 'pending',
-                created_by INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (division_id) REFERENCES divisions(id),
-                FOREIGN KEY (department_id) REFERENCES departments(id)
-            )
-        ''')
-        
-        # Gate passes table - UPDATED with new status values and security approval columns
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gate_passes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                pass_number VARCHAR(50) UNIQUE NOT NULL,
-                created_by INT NOT NULL,
-                division_id INT NOT NULL,
-                department_id INT NOT NULL,
-                material_description TEXT NOT NULL,
-                destination VARCHAR(200) NOT NULL,
-                purpose TEXT NOT NULL,
-                material_type ENUM('returnable', 'non_returnable') NOT NULL,
-                material_status ENUM('damaged', 'repair', 'new', 'other') NOT NULL,
-                expected_return_date DATETIME NULL,
-                receiver_name VARCHAR(100) NOT NULL,
-                receiver_contact VARCHAR(15),
-                send_date DATETIME NOT NULL,
-                images TEXT NOT NULL,  -- REQUIRED: No gate pass without images
-                qr_code_form VARCHAR(500),
-                qr_code_sticker VARCHAR(500),
-                status ENUM('draft', 'pending_dept', 'pending_store', 'pending_security', 'ready_for_dispatch', 
-                           'approved', 'rejected', 'inquiry', 'in_transit', 'returned', 'overdue', 'gone_from_gate', 'force_returned') DEFAULT 'draft',
-                department_approval ENUM('pending', 'approved', 'rejected', 'inquiry') DEFAULT 'pending',
-                store_approval ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
-                security_approval ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
-                store_location ENUM('store_1', 'store_2') NULL,
-                department_approval_date DATETIME NULL,
-                store_approval_date DATETIME NULL,
-                security_approval_date DATETIME NULL,
-                actual_return_date DATETIME NULL,
-                urgent BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                session_token VARCHAR(32),
-                approved_by_security VARCHAR(255),
-                approval_timestamp DATETIME,
-                gate_exit_time DATETIME,
-                last_overdue_notification DATETIME,
-                last_store_notification DATETIME,
-                force_return_remarks TEXT,
-                force_returned_by INT,
-                FOREIGN KEY (created_by) REFERENCES users(id),
-                FOREIGN KEY (division_id) REFERENCES divisions(id),
-                FOREIGN KEY (department_id) REFERENCES departments(id),
-                FOREIGN KEY (force_returned_by) REFERENCES users(id)
-            )
-        ''')
-        
-        # Gate pass approvals table (NEW) - Important for approval history
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gate_pass_approvals (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                gate_pass_id INT NOT NULL,
-                user_id INT NOT NULL,
-                approval_type ENUM('department', 'store', 'security', 'system_admin') NOT NULL,
-                status ENUM('approved', 'rejected', 'inquiry') NOT NULL,
-                comments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Notifications table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notifications (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                gate_pass_id INT,
-                message TEXT NOT NULL,
-                type ENUM('approval', 'reminder', 'status', 'alert', 'return_overdue', 'store_alert', 'critical', 'warning') NOT NULL,
-                is_read BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id)
-            )
-        ''')
-        
-        # Security logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS security_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                gate_pass_id INT,
-                user_id INT,
-                alert_type VARCHAR(50) NOT NULL,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Store requests table (NEW) - Security to Admin requests
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS store_requests (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                security_user_id INT NOT NULL,
-                material_description TEXT NOT NULL,
-                destination VARCHAR(200) NOT NULL,
-                purpose TEXT NOT NULL,
-                receiver_name VARCHAR(100) NOT NULL,
-                receiver_contact VARCHAR(15),
-                urgent BOOLEAN DEFAULT FALSE,
-                status ENUM('pending', 'approved', 'rejected', 'processed') DEFAULT 'pending',
-                admin_id INT,
-                gate_pass_id INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (security_user_id) REFERENCES users(id),
-                FOREIGN KEY (admin_id) REFERENCES users(id),
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id)
-            )
-        ''')
+    # Users table - UPDATED with division_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(80) UNIQUE NOT NULL,
+            password VARCHAR(120) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            designation VARCHAR(100) NOT NULL,
+            division_id INT,
+            department_id INT NOT NULL,
+            phone VARCHAR(15),
+            email VARCHAR(120),
+            role ENUM('system_admin', 'security', 'department_head', 'store_manager', 'user') DEFAULT 'user',
+            status ENUM('pending', 'approved', 'rejected', 'inactive') DEFAULT 'pending',
+            created_by INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (division_id) REFERENCES divisions(id),
+            FOREIGN KEY (department_id) REFERENCES departments(id)
+        )
+    ''')
+    
+    # Gate passes table - UPDATED with new status values and security approval columns
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gate_passes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            pass_number VARCHAR(50) UNIQUE NOT NULL,
+            created_by INT NOT NULL,
+            division_id INT NOT NULL,
+            department_id INT NOT NULL,
+            material_description TEXT NOT NULL,
+            destination VARCHAR(200) NOT NULL,
+            purpose TEXT NOT NULL,
+            material_type ENUM('returnable', 'non_returnable') NOT NULL,
+            material_status ENUM('damaged', 'repair', 'new', 'other') NOT NULL,
+            expected_return_date DATETIME NULL,
+            receiver_name VARCHAR(100) NOT NULL,
+            receiver_contact VARCHAR(15),
+            send_date DATETIME NOT NULL,
+            images TEXT NOT NULL,  -- REQUIRED: No gate pass without images
+            qr_code_form VARCHAR(500),
+            qr_code_sticker VARCHAR(500),
+            status ENUM('draft', 'pending_dept', 'pending_store', 'pending_security', 'ready_for_dispatch', 
+                       'approved', 'rejected', 'inquiry', 'in_transit', 'returned', 'overdue', 'gone_from_gate', 'force_returned') DEFAULT 'draft',
+            department_approval ENUM('pending', 'approved', 'rejected', 'inquiry') DEFAULT 'pending',
+            store_approval ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+            security_approval ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+            store_location ENUM('store_1', 'store_2') NULL,
+            department_approval_date DATETIME NULL,
+            store_approval_date DATETIME NULL,
+            security_approval_date DATETIME NULL,
+            actual_return_date DATETIME NULL,
+            urgent BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            session_token VARCHAR(32),
+            approved_by_security VARCHAR(255),
+            approval_timestamp DATETIME,
+            gate_exit_time DATETIME,
+            last_overdue_notification DATETIME,
+            last_store_notification DATETIME,
+            force_return_remarks TEXT,
+            force_returned_by INT,
+            FOREIGN KEY (created_by) REFERENCES users(id),
+            FOREIGN KEY (division_id) REFERENCES divisions(id),
+            FOREIGN KEY (department_id) REFERENCES departments(id),
+            FOREIGN KEY (force_returned_by) REFERENCES users(id)
+        )
+    ''')
+    
+    # Gate pass approvals table (NEW) - Important for approval history
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gate_pass_approvals (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            gate_pass_id INT NOT NULL,
+            user_id INT NOT NULL,
+            approval_type ENUM('department', 'store', 'security', 'system_admin') NOT NULL,
+            status ENUM('approved', 'rejected', 'inquiry') NOT NULL,
+            comments TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # Notifications table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            gate_pass_id INT,
+            message TEXT NOT NULL,
+            type ENUM('approval', 'reminder', 'status', 'alert', 'return_overdue', 'store_alert', 'critical', 'warning') NOT NULL,
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id)
+        )
+    ''')
+    
+    # Security logs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS security_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            gate_pass_id INT,
+            user_id INT,
+            alert_type VARCHAR(50) NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # Store requests table (NEW) - Security to Admin requests
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_requests (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            security_user_id INT NOT NULL,
+            material_description TEXT NOT NULL,
+            destination VARCHAR(200) NOT NULL,
+            purpose TEXT NOT NULL,
+            receiver_name VARCHAR(100) NOT NULL,
+            receiver_contact VARCHAR(15),
+            urgent BOOLEAN DEFAULT FALSE,
+            status ENUM('pending', 'approved', 'rejected', 'processed') DEFAULT 'pending',
+            admin_id INT,
+            gate_pass_id INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (security_user_id) REFERENCES users(id),
+            FOREIGN KEY (admin_id) REFERENCES users(id),
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id)
+        )
+    ''')
 
-        # Store Requests Table (For store managers to request gate passes)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS store_manager_requests (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                store_manager_id INT NOT NULL,
-                store_location ENUM('store_1', 'store_2') NOT NULL,
-                material_description TEXT NOT NULL,
-                destination VARCHAR(200) NOT NULL,
-                purpose TEXT NOT NULL,
-                receiver_name VARCHAR(100) NOT NULL,
-                receiver_contact VARCHAR(15),
-                quantity INT DEFAULT 1,
-                urgency ENUM('normal', 'urgent', 'emergency') DEFAULT 'normal',
-                status ENUM('pending', 'approved', 'rejected', 'processing') DEFAULT 'pending',
-                admin_response TEXT,
-                admin_response_by INT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (store_manager_id) REFERENCES users(id),
-                FOREIGN KEY (admin_response_by) REFERENCES users(id)
-            )
-        ''')
+    # Store Requests Table (For store managers to request gate passes)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_manager_requests (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            store_manager_id INT NOT NULL,
+            store_location ENUM('store_1', 'store_2') NOT NULL,
+            material_description TEXT NOT NULL,
+            destination VARCHAR(200) NOT NULL,
+            purpose TEXT NOT NULL,
+            receiver_name VARCHAR(100) NOT NULL,
+            receiver_contact VARCHAR(15),
+            quantity INT DEFAULT 1,
+            urgency ENUM('normal', 'urgent', 'emergency') DEFAULT 'normal',
+            status ENUM('pending', 'approved', 'rejected', 'processing') DEFAULT 'pending',
+            admin_response TEXT,
+            admin_response_by INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (store_manager_id) REFERENCES users(id),
+            FOREIGN KEY (admin_response_by) REFERENCES users(id)
+        )
+    ''')
 
-        # Store Material Movement Log Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS store_material_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                store_location ENUM('store_1', 'store_2') NOT NULL,
-                gate_pass_id INT,
-                material_description TEXT NOT NULL,
-                movement_type ENUM('incoming', 'outgoing', 'transfer') NOT NULL,
-                quantity INT DEFAULT 1,
-                from_location VARCHAR(100),
-                to_location VARCHAR(100),
-                handled_by INT NOT NULL,
-                remarks TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
-                FOREIGN KEY (handled_by) REFERENCES users(id)
-            )
-        ''')
+    # Store Material Movement Log Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_material_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            store_location ENUM('store_1', 'store_2') NOT NULL,
+            gate_pass_id INT,
+            material_description TEXT NOT NULL,
+            movement_type ENUM('incoming', 'outgoing', 'transfer') NOT NULL,
+            quantity INT DEFAULT 1,
+            from_location VARCHAR(100),
+            to_location VARCHAR(100),
+            handled_by INT NOT NULL,
+            remarks TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id),
+            FOREIGN KEY (handled_by) REFERENCES users(id)
+        )
+    ''')
+    
+    # ============== OVERDUE TRACKING TABLES ==============
+    
+    # Overdue reminders table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS overdue_reminders (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            gate_pass_id INT NOT NULL,
+            reminded_by INT NOT NULL,
+            reminder_date DATETIME NOT NULL,
+            remarks TEXT,
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id) ON DELETE CASCADE,
+            FOREIGN KEY (reminded_by) REFERENCES users(id) ON DELETE CASCADE,
+            INDEX idx_reminder_date (reminder_date)
+        )
+    ''')
+    
+    # Force return logs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS force_return_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            gate_pass_id INT NOT NULL,
+            returned_by INT NOT NULL,
+            return_date DATETIME NOT NULL,
+            remarks TEXT,
+            FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id) ON DELETE CASCADE,
+            FOREIGN KEY (returned_by) REFERENCES users(id) ON DELETE CASCADE,
+            INDEX idx_return_date (return_date)
+        )
+    ''')
+    
+    # ============== END OVERDUE TRACKING TABLES ==============
+    
+    # ✅ ADDED: Verify all table structures
+    print("\n" + "="*60)
+    print("🔍 VERIFYING ALL TABLE STRUCTURES")
+    print("="*60)
+    
+    # Check for missing columns in all tables
+    tables_to_check = {
+        'gate_passes': [
+            ('approved_by_security', 'VARCHAR(255)'),
+            ('approval_timestamp', 'DATETIME'),
+            ('gate_exit_time', 'DATETIME'),
+            ('last_overdue_notification', 'DATETIME'),
+            ('last_store_notification', 'DATETIME'),
+            ('force_return_remarks', 'TEXT'),
+            ('force_returned_by', 'INT')
+        ],
+        'store_manager_requests': [
+            ('admin_response_by', 'INT')
+        ]
+    }
+    
+    for table_name, columns_to_add in tables_to_check.items():
+        try:
+            cursor.execute(f"SHOW COLUMNS FROM {table_name}")
+            existing_columns = [col[0] for col in cursor.fetchall()]
+            
+            for column_name, column_type in columns_to_add:
+                if column_name not in existing_columns:
+                    print(f"🛠️ Adding missing column: {table_name}.{column_name}")
+                    try:
+                        cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
+                        # Add foreign key constraint if needed
+                        if column_name == 'force_returned_by':
+                            cursor.execute(f'''
+                                ALTER TABLE {table_name} 
+                                ADD FOREIGN KEY (force_returned_by) REFERENCES users(id)
+                            ''')
+                        elif column_name == 'admin_response_by':
+                            cursor.execute(f'''
+                                ALTER TABLE {table_name} 
+                                ADD FOREIGN KEY (admin_response_by) REFERENCES users(id)
+                            ''')
+                        print(f"✅ Added {column_name} to {table_name}")
+                    except Exception as col_error:
+                        print(f"⚠️ Could not add column {column_name}: {col_error}")
+        except Exception as table_error:
+            print(f"⚠️ Error checking table {table_name}: {table_error}")
+    
+    # Also check for the correct ENUM values in gate_passes status
+    try:
+        cursor.execute("SHOW COLUMNS FROM gate_passes LIKE 'status'")
+        status_col = cursor.fetchone()
+        if status_col:
+            print(f"📊 Status column type: {status_col[1]}")
+            
+            # Check for required status values
+            required_statuses = ['gone_from_gate', 'force_returned']
+            if any(status not in status_col[1] for status in required_statuses):
+                print("⚠️ Some required status values missing. Please check manually.")
+    except:
+        pass
+
+def seed_default_data(cursor):
+    """Insert default divisions, departments and users if they don't exist yet"""
+    # ✅ ADDED: Create default divisions including Security Division
+    cursor.execute("SELECT COUNT(*) FROM divisions")
+    if cursor.fetchone()[0] == 0:
+        print("Creating default divisions...")
+        divisions = [
+            ('Administration', 'Administration Division'),
+            ('Yarn Dyeing', 'Yarn Dyeing Division'),
+            ('Fabric Dyeing', 'Fabric Dyeing Division'),
+            ('Spinning', 'Spinning Division'),
+            ('Store', 'Store Division'),
+            ('Security', 'Security Division')  # ✅ ADDED SECURITY DIVISION
+        ]
         
-        # ============== OVERDUE TRACKING TABLES ==============
+        for div_name, div_desc in divisions:
+            try:
+                cursor.execute('INSERT INTO divisions (name, description, created_by) VALUES (%s, %s, 0)', (div_name, div_desc))
+            except:
+                pass
         
-        # Overdue reminders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS overdue_reminders (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                gate_pass_id INT NOT NULL,
-                reminded_by INT NOT NULL,
-                reminder_date DATETIME NOT NULL,
-                remarks TEXT,
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id) ON DELETE CASCADE,
-                FOREIGN KEY (reminded_by) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_reminder_date (reminder_date)
-            )
-        ''')
+        print("✅ Created default divisions including Security")
+    
+    # ✅ ADDED: Create default departments including Security Departments
+    cursor.execute("SELECT COUNT(*) FROM departments")
+    if cursor.fetchone()[0] == 0:
+        print("Creating default departments...")
+        # Get division IDs
+        cursor.execute("SELECT id, name FROM divisions")
+        divisions_data = []
+        for row in cursor.fetchall():
+            divisions_data.append({'id': row[0], 'name': row[1]})
         
-        # Force return logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS force_return_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                gate_pass_id INT NOT NULL,
-                returned_by INT NOT NULL,
-                return_date DATETIME NOT NULL,
-                remarks TEXT,
-                FOREIGN KEY (gate_pass_id) REFERENCES gate_passes(id) ON DELETE CASCADE,
-                FOREIGN KEY (returned_by) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_return_date (return_date)
-            )
-        ''')
+        division_map = {div['name']: div['id'] for div in divisions_data}
         
-        # ============== END OVERDUE TRACKING TABLES ==============
+        # Create departments with proper division mapping
+        departments = [
+            ('Admin', 'Administration', 'Administration Office'),
+            ('Accounts', 'Administration', 'Accounts Department'),
+            ('HR', 'Administration', 'Human Resources'),
+            ('IT', 'Administration', 'Information Technology'),
+            ('Production', 'Yarn Dyeing', 'Production Department'),
+            ('Maintenance', 'Yarn Dyeing', 'Maintenance Department'),
+            ('Production', 'Fabric Dyeing', 'Production Department'),
+            ('Maintenance', 'Fabric Dyeing', 'Maintenance Department'),
+            ('Production', 'Spinning', 'Production Department'),
+            ('Maintenance', 'Spinning', 'Maintenance Department'),
+            ('Store 1', 'Store', 'Main Store'),
+            ('Store 2', 'Store', 'Secondary Store'),
+            ('Main Gate Security', 'Security', 'Main Gate Security Team'),  # ✅ ADDED SECURITY DEPARTMENTS
+            ('Factory Security', 'Security', 'Factory Security Team')
+        ]
         
-        # ✅ ADDED: Create default divisions including Security Division
-        cursor.execute("SELECT COUNT(*) FROM divisions")
-        if cursor.fetchone()[0] == 0:
-            print("Creating default divisions...")
-            divisions = [
-                ('Administration', 'Administration Division'),
-                ('Yarn Dyeing', 'Yarn Dyeing Division'),
-                ('Fabric Dyeing', 'Fabric Dyeing Division'),
-                ('Spinning', 'Spinning Division'),
-                ('Store', 'Store Division'),
-                ('Security', 'Security Division')  # ✅ ADDED SECURITY DIVISION
-            ]
-            
-            for div_name, div_desc in divisions:
+        for dept_name, div_name, dept_desc in departments:
+            if div_name in division_map:
                 try:
-                    cursor.execute('INSERT INTO divisions (name, description, created_by) VALUES (%s, %s, 0)', (div_name, div_desc))
+                    cursor.execute('''
+                        INSERT INTO departments (name, division_id, description, created_by) 
+                        VALUES (%s, %s, %s, 0)
+                    ''', (dept_name, division_map[div_name], dept_desc))
                 except:
                     pass
-            
-            print("✅ Created default divisions including Security")
         
-        # ✅ ADDED: Create default departments including Security Departments
-        cursor.execute("SELECT COUNT(*) FROM departments")
-        if cursor.fetchone()[0] == 0:
-            print("Creating default departments...")
-            # Get division IDs
-            cursor.execute("SELECT id, name FROM divisions")
-            divisions_data = []
-            for row in cursor.fetchall():
-                divisions_data.append({'id': row[0], 'name': row[1]})
-            
-            division_map = {div['name']: div['id'] for div in divisions_data}
+        print("✅ Created default departments including Security")
+    
+    # ✅ ADDED: Create default System Administrator with proper department mapping
+    cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'sysadmin'")
+    if cursor.fetchone()[0] == 0:
+        print("Creating System Administrator...")
+        # Get first department ID for Admin division
+        cursor.execute('''
+            SELECT d.id FROM departments d 
+            JOIN divisions dv ON d.division_id = dv.id 
+            WHERE dv.name = 'Administration' 
+            LIMIT 1
+        ''')
+        admin_dept = cursor.fetchone()
+        
+        if admin_dept:
+            admin_dept_id = admin_dept[0]
+            # Get division ID for the department
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (admin_dept_id,))
+            division_result = cursor.fetchone()
             
-            # Create departments with proper division mapping
-            departments = [
-                ('Admin', 'Administration', 'Administration Office'),
-                ('Accounts', 'Administration', 'Accounts Department'),
-                ('HR', 'Administration', 'Human Resources'),
-                ('IT', 'Administration', 'Information Technology'),
-                ('Production', 'Yarn Dyeing', 'Production Department'),
-                ('Maintenance', 'Yarn Dyeing', 'Maintenance Department'),
-                ('Production', 'Fabric Dyeing', 'Production Department'),
-                ('Maintenance', 'Fabric Dyeing', 'Maintenance Department'),
-                ('Production', 'Spinning', 'Production Department'),
-                ('Maintenance', 'Spinning', 'Maintenance Department'),
-                ('Store 1', 'Store', 'Main Store'),
-                ('Store 2', 'Store', 'Secondary Store'),
-                ('Main Gate Security', 'Security', 'Main Gate Security Team'),  # ✅ ADDED SECURITY DEPARTMENTS
-                ('Factory Security', 'Security', 'Factory Security Team')
-            ]
+            if division_result:
+                admin_password = hash_password('admin123')
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('sysadmin', %s, 'System Administrator', 'Super Admin', %s, %s, 'system_admin', 'approved')
+                ''', (admin_password, division_result[0], admin_dept_id))
+                print("✅ Created System Administrator: sysadmin / admin123")
+    
+    # ✅ ADDED: Create default Store Managers
+    cursor.execute("SELECT COUNT(*) FROM users WHERE username IN ('store1', 'store2')")
+    if cursor.fetchone()[0] == 0:
+        print("Creating Store Managers...")
+        # Get store departments
+        cursor.execute("SELECT id FROM departments WHERE name LIKE '%Store%' ORDER BY name")
+        store_depts = cursor.fetchall()
+        
+        if len(store_depts) >= 2:
+            store_password = hash_password('store123')
+            # Store Manager 1
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (store_depts[0][0],))
+            div1 = cursor.fetchone()
+            if div1:
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('store1', %s, 'Store Manager 1', 'Store Manager', %s, %s, 'store_manager', 'approved')
+                ''', (store_password, div1[0], store_depts[0][0]))
             
-            for dept_name, div_name, dept_desc in departments:
-                if div_name in division_map:
-                    try:
-                        cursor.execute('''
-                            INSERT INTO departments (name, division_id, description, created_by) 
-                            VALUES (%s, %s, %s, 0)
-                        ''', (dept_name, division_map[div_name], dept_desc))
-                    except:
-                        pass
+            # Store Manager 2
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (store_depts[1][0],))
+            div2 = cursor.fetchone()
+            if div2:
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('store2', %s, 'Store Manager 2', 'Store Manager', %s, %s, 'store_manager', 'approved')
+                ''', (store_password, div2[0], store_depts[1][0]))
             
-            print("✅ Created default departments including Security")
+            print("✅ Created Store Managers: store1/store2 / store123")
+    
+    # ✅ ADDED: Create default Department Head
+    cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'depthead'")
+    if cursor.fetchone()[0] == 0:
+        print("Creating Department Head...")
+        # Get first non-store department
+        cursor.execute("SELECT id FROM departments WHERE name NOT LIKE '%Store%' LIMIT 1")
+        dept = cursor.fetchone()
         
-        # ✅ ADDED: Create default System Administrator with proper department mapping
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'sysadmin'")
-        if cursor.fetchone()[0] == 0:
-            print("Creating System Administrator...")
-            # Get first department ID for Admin division
-            cursor.execute('''
-                SELECT d.id FROM departments d 
-                JOIN divisions dv ON d.division_id = dv.id 
-                WHERE dv.name = 'Administration' 
-                LIMIT 1
-            ''')
-            admin_dept = cursor.fetchone()
+        if dept:
+            dept_id = dept[0]
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (dept_id,))
+            div = cursor.fetchone()
             
-            if admin_dept:
-                admin_dept_id = admin_dept[0]
-                # Get division ID for the department
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (admin_dept_id,))
-                division_result = cursor.fetchone()
-                
-                if division_result:
-                    admin_password = hash_password('admin123')
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('sysadmin', %s, 'System Administrator', 'Super Admin', %s, %s, 'system_admin', 'approved')
-                    ''', (admin_password, division_result[0], admin_dept_id))
-                    print("✅ Created System Administrator: sysadmin / admin123")
+            if div:
+                dept_password = hash_password('dept123')
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('depthead', %s, 'Department Head', 'Department Manager', %s, %s, 'department_head', 'approved')
+                ''', (dept_password, div[0], dept_id))
+                print("✅ Created Department Head: depthead / dept123")
+    
+    # ✅ ADDED: Create default Security Users
+    cursor.execute("SELECT COUNT(*) FROM users WHERE username IN ('security1', 'security2')")
+    if cursor.fetchone()[0] == 0:
+        print("Creating Security Users...")
+        # Get security departments
+        cursor.execute("SELECT id FROM departments WHERE name LIKE '%Security%' ORDER BY name")
+        security_depts = cursor.fetchall()
         
-        # ✅ ADDED: Create default Store Managers
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username IN ('store1', 'store2')")
-        if cursor.fetchone()[0] == 0:
-            print("Creating Store Managers...")
-            # Get store departments
-            cursor.execute("SELECT id FROM departments WHERE name LIKE '%Store%' ORDER BY name")
-            store_depts = cursor.fetchall()
+        if len(security_depts) >= 2:
+            security_password = hash_password('security123')
             
-            if len(store_depts) >= 2:
-                store_password = hash_password('store123')
-                # Store Manager 1
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (store_depts[0][0],))
-                div1 = cursor.fetchone()
-                if div1:
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('store1', %s, 'Store Manager 1', 'Store Manager', %s, %s, 'store_manager', 'approved')
-                    ''', (store_password, div1[0], store_depts[0][0]))
-                
-                # Store Manager 2
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (store_depts[1][0],))
-                div2 = cursor.fetchone()
-                if div2:
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('store2', %s, 'Store Manager 2', 'Store Manager', %s, %s, 'store_manager', 'approved')
-                    ''', (store_password, div2[0], store_depts[1][0]))
-                
-                print("✅ Created Store Managers: store1/store2 / store123")
-        
-        # ✅ ADDED: Create default Department Head
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'depthead'")
-        if cursor.fetchone()[0] == 0:
-            print("Creating Department Head...")
-            # Get first non-store department
-            cursor.execute("SELECT id FROM departments WHERE name NOT LIKE '%Store%' LIMIT 1")
-            dept = cursor.fetchone()
+            # Security User 1 (Main Gate)
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (security_depts[0][0],))
+            div1 = cursor.fetchone()
+            if div1:
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('security1', %s, 'Security Officer 1', 'Security', %s, %s, 'security', 'approved')
+                ''', (security_password, div1[0], security_depts[0][0]))
             
-            if dept:
-                dept_id = dept[0]
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (dept_id,))
-                div = cursor.fetchone()
-                
-                if div:
-                    dept_password = hash_password('dept123')
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('depthead', %s, 'Department Head', 'Department Manager', %s, %s, 'department_head', 'approved')
-                    ''', (dept_password, div[0], dept_id))
-                    print("✅ Created Department Head: depthead / dept123")
-        
-        # ✅ ADDED: Create default Security Users
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username IN ('security1', 'security2')")
-        if cursor.fetchone()[0] == 0:
-            print("Creating Security Users...")
-            # Get security departments
-            cursor.execute("SELECT id FROM departments WHERE name LIKE '%Security%' ORDER BY name")
-            security_depts = cursor.fetchall()
+            # Security User 2 (Factory Security)
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (security_depts[1][0],))
+            div2 = cursor.fetchone()
+            if div2:
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('security2', %s, 'Security Officer 2', 'Security', %s, %s, 'security', 'approved')
+                ''', (security_password, div2[0], security_depts[1][0]))
             
-            if len(security_depts) >= 2:
-                security_password = hash_password('security123')
-                
-                # Security User 1 (Main Gate)
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (security_depts[0][0],))
-                div1 = cursor.fetchone()
-                if div1:
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('security1', %s, 'Security Officer 1', 'Security', %s, %s, 'security', 'approved')
-                    ''', (security_password, div1[0], security_depts[0][0]))
-                
-                # Security User 2 (Factory Security)
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (security_depts[1][0],))
-                div2 = cursor.fetchone()
-                if div2:
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('security2', %s, 'Security Officer 2', 'Security', %s, %s, 'security', 'approved')
-                    ''', (security_password, div2[0], security_depts[1][0]))
-                
-                print("✅ Created Security Users: security1/security2 / security123")
+            print("✅ Created Security Users: security1/security2 / security123")
+    
+    # ✅ ADDED: Create test regular user
+    cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'akib'")
+    if cursor.fetchone()[0] == 0:
+        print("Creating test user...")
+        # Get any department for test user
+        cursor.execute("SELECT id FROM departments LIMIT 1")
+        test_dept = cursor.fetchone()
         
-        # ✅ ADDED: Create test regular user
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username = 'akib'")
-        if cursor.fetchone()[0] == 0:
-            print("Creating test user...")
-            # Get any department for test user
-            cursor.execute("SELECT id FROM departments LIMIT 1")
-            test_dept = cursor.fetchone()
+        if test_dept:
+            cursor.execute('SELECT division_id FROM departments WHERE id = %s', (test_dept[0],))
+            test_div = cursor.fetchone()
             
-            if test_dept:
-                cursor.execute('SELECT division_id FROM departments WHERE id = %s', (test_dept[0],))
-                test_div = cursor.fetchone()
-                
-                if test_div:
-                    test_password = hash_password('akib123')
-                    cursor.execute('''
-                        INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
-                        VALUES ('akib', %s, 'Akib Rahman', 'Executive', %s, %s, 'user', 'approved')
-                    ''', (test_password, test_div[0], test_dept[0]))
-                    print("✅ Created test user: akib / akib123")
-        
-        # ✅ ADDED: Verify all table structures
-        print("\n" + "="*60)
-        print("🔍 VERIFYING ALL TABLE STRUCTURES")
-        print("="*60)
-        
-        # Check for missing columns in all tables
-        tables_to_check = {
-            'gate_passes': [
-                ('approved_by_security', 'VARCHAR(255)'),
-                ('approval_timestamp', 'DATETIME'),
-                ('gate_exit_time', 'DATETIME'),
-                ('last_overdue_notification', 'DATETIME'),
-                ('last_store_notification', 'DATETIME'),
-                ('force_return_remarks', 'TEXT'),
-                ('force_returned_by', 'INT')
-            ],
-            'store_manager_requests': [
-                ('admin_response_by', 'INT')
-            ]
-        }
-        
-        for table_name, columns_to_add in tables_to_check.items():
-            try:
-                cursor.execute(f"SHOW COLUMNS FROM {table_name}")
-                existing_columns = [col[0] for col in cursor.fetchall()]
-                
-                for column_name, column_type in columns_to_add:
-                    if column_name not in existing_columns:
-                        print(f"🛠️ Adding missing column: {table_name}.{column_name}")
-                        try:
-                            cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
-                            # Add foreign key constraint if needed
-                            if column_name == 'force_returned_by':
-                                cursor.execute(f'''
-                                    ALTER TABLE {table_name} 
-                                    ADD FOREIGN KEY (force_returned_by) REFERENCES users(id)
-                                ''')
-                            elif column_name == 'admin_response_by':
-                                cursor.execute(f'''
-                                    ALTER TABLE {table_name} 
-                                    ADD FOREIGN KEY (admin_response_by) REFERENCES users(id)
-                                ''')
-                            print(f"✅ Added {column_name} to {table_name}")
-                        except Exception as col_error:
-                            print(f"⚠️ Could not add column {column_name}: {col_error}")
-            except Exception as table_error:
-                print(f"⚠️ Error checking table {table_name}: {table_error}")
-        
-        # Also check for the correct ENUM values in gate_passes status
+            if test_div:
+                test_password = hash_password('akib123')
+                cursor.execute('''
+                    INSERT INTO users (username, password, name, designation, division_id, department_id, role, status) 
+                    VALUES ('akib', %s, 'Akib Rahman', 'Executive', %s, %s, 'user', 'approved')
+                ''', (test_password, test_div[0], test_dept[0]))
+                print("✅ Created test user: akib / akib123")
+
+def print_schema_report(cursor):
+    """Print every table's row count and the user list (slow - setup/CLI only)"""
+    # ✅ ADDED: Final verification of all tables
+    print("\n" + "="*60)
+    print("📋 FINAL TABLE VERIFICATION")
+    print("="*60)
+    
+    cursor.execute("SHOW TABLES")
+    tables = cursor.fetchall()
+    print(f"📊 Total tables in database: {len(tables)}")
+    
+    for table in tables:
+        table_name = table[0]
         try:
-            cursor.execute("SHOW COLUMNS FROM gate_passes LIKE 'status'")
-            status_col = cursor.fetchone()
-            if status_col:
-                print(f"📊 Status column type: {status_col[1]}")
-                
-                # Check for required status values
-                required_statuses = ['gone_from_gate', 'force_returned']
-                if any(status not in status_col[1] for status in required_statuses):
-                    print("⚠️ Some required status values missing. Please check manually.")
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            count = cursor.fetchone()[0]
+            print(f"  📈 {table_name}: {count} rows")
         except:
-            pass
-        
-        # ✅ ADDED: Final verification of all tables
-        print("\n" + "="*60)
-        print("📋 FINAL TABLE VERIFICATION")
-        print("="*60)
-        
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
-        print(f"📊 Total tables in database: {len(tables)}")
-        
-        for table in tables:
-            table_name = table[0]
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                count = cursor.fetchone()[0]
-                print(f"  📈 {table_name}: {count} rows")
-            except:
-                print(f"  ❌ {table_name}: Error counting rows")
-        
-        # ✅ ADDED: Print all default users for verification
-        print("\n" + "="*60)
-        print("👥 DEFAULT USERS VERIFICATION")
-        print("="*60)
-        
-        cursor.execute("SELECT username, name, role, status FROM users ORDER BY role, username")
-        users = cursor.fetchall()
-        for user in users:
-            print(f"  👤 {user[0]} - {user[1]} ({user[2]}) - {user[3]}")
-        
-        conn.commit()
+            print(f"  ❌ {table_name}: Error counting rows")
+    
+    # ✅ ADDED: Print all default users for verification
+    print("\n" + "="*60)
+    print("👥 DEFAULT USERS VERIFICATION")
+    print("="*60)
+    
+    cursor.execute("SELECT username, name, role, status FROM users ORDER BY role, username")
+    users = cursor.fetchall()
+    for user in users:
+        print(f"  👤 {user[0]} - {user[1]} ({user[2]}) - {user[3]}")
+
+def init_db():
+    """Bring the database to the latest schema version and print a full report"""
+    from migrations import migrate
+    
+    if not migrate():
+        print("❌ Database initialization failed! Please check MySQL setup.")
+        return False
+    
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Database connection failed! Please check MySQL setup.")
+        return False
+    
+    cursor = conn.cursor()
+    
+    try:
+        print_schema_report(cursor)
         print("\n" + "="*60)
         print("✅ Database initialized successfully with ALL tables and default users!")
         print("✅ Includes overdue tracking tables: overdue_reminders, force_return_logs")
@@ -644,11 +680,8 @@ def init_db():
         return True
         
     except Exception as e:
-        print(f"❌ Database initialization error: {e}")
-        import traceback
-        traceback.print_exc()
-        conn.rollback()
+        print(f"❌ Database report error: {e}")
         return False
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
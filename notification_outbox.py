@@ -0,0 +1,205 @@
+# notification_outbox.py - TRANSACTIONAL NOTIFICATION OUTBOX + BACKGROUND DISPATCHER
+import json
+import threading
+import time
+import uuid
+from config import config
+from models import get_db_connection, dict_fetchall
+from notifications import insert_notifications, get_role_user_ids
+from notification_pubsub import publish_notifications
+
+_wake = threading.Event()
+
+def enqueue_notifications(cursor, rows=(), role_notifications=(), event_type='notify', gate_pass_id=None):
+    """Append one outbox event on the caller's cursor - commits with the caller's own UPDATE.
+
+    rows: (user_id, message, type, gate_pass_id) for known recipients.
+    role_notifications: (role, message, type, gate_pass_id) - expanded to every
+    approved user of the role when the event is dispatched.
+    """
+    rows = [list(row) for row in rows if row[0]]
+    role_notifications = [list(role) for role in role_notifications]
+    if not rows and not role_notifications:
+        return None
+
+    payload = json.dumps({'rows': rows, 'roles': role_notifications})
+    cursor.execute('''
+        INSERT INTO notification_outbox (event_type, gate_pass_id, payload)
+        VALUES (%s, %s, %s)
+    ''', (event_type, gate_pass_id, payload))
+    return cursor.lastrowid
+
+def wake_outbox_dispatcher():
+    """Call after commit so the dispatcher picks the event up now instead of at the next poll"""
+    _wake.set()
+
+def _claim_events(cursor, batch_size, stale_after):
+    """Mark up to batch_size pending events as ours and return them (safe with several dispatchers)"""
+    claim_token = uuid.uuid4().hex
+
+    # Events left in 'processing' by a dispatcher that died go back into the queue
+    cursor.execute('''
+        UPDATE notification_outbox
+        SET status = 'pending', claim_token = NULL
+        WHERE status = 'processing' AND claimed_at < DATE_SUB(NOW(), INTERVAL %s SECOND)
+    ''', (stale_after,))
+
+    cursor.execute('''
+        UPDATE notification_outbox
+        SET status = 'processing', claim_token = %s, claimed_at = NOW(), attempts = attempts + 1
+        WHERE status = 'pending'
+        ORDER BY id
+        LIMIT %s
+    ''', (claim_token, batch_size))
+
+    if cursor.rowcount == 0:
+        return []
+
+    cursor.execute('''
+        SELECT id, event_type, payload, attempts FROM notification_outbox
+        WHERE claim_token = %s ORDER BY id
+    ''', (claim_token,))
+    return dict_fetchall(cursor)
+
+def _expand_events(cursor, events):
+    """Turn outbox events into notification rows, resolving each role once per batch"""
+    role_ids = {}
+    rows = []
+
+    for event in events:
+        payload = json.loads(event['payload'])
+        for user_id, message, notif_type, gate_pass_id in payload.get('rows', []):
+            rows.append((user_id, message, notif_type, gate_pass_id))
+        for role, message, notif_type, gate_pass_id in payload.get('roles', []):
+            if role not in role_ids:
+                role_ids[role] = get_role_user_ids(cursor, role)
+            for user_id in role_ids[role]:
+                rows.append((user_id, message, notif_type, gate_pass_id))
+
+    return rows
+
+def _deliver_events(cursor, conn, events):
+    """Write the events' notifications and mark them done in one commit; returns the rows written"""
+    event_ids = [event['id'] for event in events]
+    placeholders = ', '.join(['%s'] * len(event_ids))
+
+    # Notifications and the 'done' mark land together - an event is never delivered twice
+    rows = _expand_events(cursor, events)
+    insert_notifications(cursor, rows)
+    cursor.execute(f'''
+        UPDATE notification_outbox
+        SET status = 'done', processed_at = NOW(), last_error = NULL
+        WHERE id IN ({placeholders})
+    ''', tuple(event_ids))
+    conn.commit()
+    return rows
+
+def dispatch_outbox_batch(batch_size=None):
+    """Expand one batch of pending events into notifications. Returns events processed."""
+    cfg = config['default']
+    batch_size = batch_size or cfg.OUTBOX_BATCH_SIZE
+
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+
+    cursor = conn.cursor()
+    events = []
+
+    try:
+        events = _claim_events(cursor, batch_size, cfg.OUTBOX_STALE_SECONDS)
+        conn.commit()
+        if not events:
+            return 0
+
+        try:
+            rows = _deliver_events(cursor, conn, events)
+        except Exception as e:
+            if len(events) == 1:
+                raise
+            conn.rollback()
+            # One bad event (unknown type, deleted gate pass) fails the whole batch insert -
+            # redo it event by event so only the offender is retried / parked
+            print(f"⚠️ Outbox batch failed ({e}), retrying {len(events)} event(s) one by one")
+            rows = []
+            for event in events:
+                try:
+                    rows.extend(_deliver_events(cursor, conn, [event]))
+                except Exception as event_error:
+                    print(f"❌ Outbox event {event['id']} failed: {event_error}")
+                    conn.rollback()
+                    _release_failed(cursor, conn, [event], str(event_error), cfg.OUTBOX_MAX_ATTEMPTS)
+
+        publish_notifications(rows)
+        print(f"📨 Outbox: {len(events)} event(s) -> {len(rows)} notification(s)")
+        return len(events)
+
+    except Exception as e:
+        print(f"❌ Outbox dispatch error: {e}")
+        conn.rollback()
+        if events:
+            _release_failed(cursor, conn, events, str(e), cfg.OUTBOX_MAX_ATTEMPTS)
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def _release_failed(cursor, conn, events, error, max_attempts):
+    """Put a failed batch back for retry, or park events that keep failing"""
+    try:
+        for event in events:
+            status = 'failed' if event['attempts'] >= max_attempts else 'pending'
+            cursor.execute('''
+                UPDATE notification_outbox
+                SET status = %s, claim_token = NULL, last_error = %s
+                WHERE id = %s
+            ''', (status, error[:500], event['id']))
+        conn.commit()
+    except Exception as release_error:
+        print(f"❌ Could not release outbox events: {release_error}")
+        conn.rollback()
+
+def start_outbox_dispatcher():
+    """Start the background thread that drains the notification outbox"""
+    poll_interval = config['default'].OUTBOX_POLL_INTERVAL
+
+    def dispatcher():
+        while True:
+            try:
+                # Clear before draining so a wake that arrives mid-drain triggers another pass;
+                # keep draining while full batches come back, then wait for a wake-up or the poll tick
+                _wake.clear()
+                while dispatch_outbox_batch() >= config['default'].OUTBOX_BATCH_SIZE:
+                    pass
+                _wake.wait(poll_interval)
+            except Exception as e:
+                print(f"Outbox dispatcher error: {e}")
+                time.sleep(poll_interval)
+
+    thread = threading.Thread(target=dispatcher, name='notification-outbox', daemon=True)
+    thread.start()
+    print("✅ Notification outbox dispatcher started!")
+
+def get_outbox_stats():
+    """Event counts per outbox status plus the age of the oldest pending event"""
+    conn = get_db_connection()
+    if conn is None:
+        return {}
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('SELECT status, COUNT(*) FROM notification_outbox GROUP BY status')
+        stats = {status: count for status, count in cursor.fetchall()}
+        cursor.execute('''
+            SELECT TIMESTAMPDIFF(SECOND, MIN(created_at), NOW())
+            FROM notification_outbox WHERE status = 'pending'
+        ''')
+        stats['oldest_pending_seconds'] = cursor.fetchone()[0]
+        return stats
+    except Exception as e:
+        print(f"Error getting outbox stats: {e}")
+        return {}
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,315 @@
+# notification_pubsub.py - PUB/SUB FOR PUSHING NOTIFICATIONS TO OPEN STREAMS (DB PROBE FAN-OUT ACROSS PROCESSES)
+import queue
+import threading
+import time
+from config import config
+from models import get_db_connection, dict_fetchall
+
+
+class Subscription:
+    """One open stream (SSE connection or long-poll request) for a user"""
+
+    def __init__(self, user_id, max_events):
+        self.user_id = user_id
+        self.events = queue.Queue(maxsize=max_events)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """Next (event, data) or None when nothing arrived within timeout seconds"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Every event already queued, without waiting"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class NotificationBroker:
+    """Fan-out of events to the streams open in this process.
+
+    - publish() targets one user's streams, broadcast() every stream.
+    - A slow client never blocks a publisher: when its queue is full the event
+      is dropped and the subscription is flagged so the stream tells the client
+      to resync from /check_notifications.
+    - subscribe() returns None past max_subscribers so the caller can answer
+      503 and the client falls back to long-poll.
+    """
+
+    def __init__(self, max_subscribers=200, max_events=100):
+        self.max_subscribers = max_subscribers
+        self.max_events = max_events
+
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+        self._published = 0
+        self._dropped = 0
+
+    def subscribe(self, user_id):
+        with self._lock:
+            total = sum(len(subs) for subs in self._subscribers.values())
+            if total >= self.max_subscribers:
+                return None
+            subscription = Subscription(user_id, self.max_events)
+            self._subscribers.setdefault(user_id, []).append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id, [])
+            if subscription in subs:
+                subs.remove(subscription)
+            if not subs:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def _deliver(self, subscriptions, event, data):
+        for subscription in subscriptions:
+            try:
+                subscription.events.put_nowait((event, data))
+                self._published += 1
+            except queue.Full:
+                subscription.overflowed = True
+                self._dropped += 1
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            self._deliver(list(self._subscribers.get(user_id, ())), event, data)
+
+    def broadcast(self, event, data=None):
+        with self._lock:
+            subscriptions = [sub for subs in self._subscribers.values() for sub in subs]
+            self._deliver(subscriptions, event, data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._subscribers),
+                'streams': sum(len(subs) for subs in self._subscribers.values()),
+                'max_streams': self.max_subscribers,
+                'published': self._published,
+                'dropped': self._dropped
+            }
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+# Per-user notification version, bumped on every publish - long-polls wait on this
+_notification_changed = threading.Condition()
+_notification_versions = {}
+
+def get_broker():
+    """Process-wide broker (created on first use)"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                cfg = config['default']
+                _broker = NotificationBroker(
+                    max_subscribers=cfg.STREAM_MAX_CLIENTS,
+                    max_events=cfg.STREAM_QUEUE_SIZE
+                )
+    return _broker
+
+# ==================== CROSS-PROCESS FAN-OUT ====================
+#
+# Notifications are written by whichever process dispatched the outbox event and
+# counters move in whichever process handled the request (or the scheduler
+# leader), so each process watches the database instead of trusting its own
+# publishes: one probe per process reads MAX(notifications.id) and the counters
+# version every STREAM_PROBE_INTERVAL and fans new rows out to its own streams.
+# Local writers just wake the probe, so every event is delivered exactly once.
+
+COUNTERS_VERSION_NAME = 'counters'
+PROBE_FETCH_LIMIT = 500  # New notification rows read per probe pass; beyond this streams are told to resync
+# Ids below MAX(id) that weren't visible yet (a lower id can commit after a higher one) are
+# re-checked by primary key until they show up or PROBE_GAP_SECONDS pass (then: rolled back / skipped id)
+PROBE_GAP_SECONDS = 60
+PROBE_MAX_GAPS = 1000
+
+_probe_wake = threading.Event()
+_probe_thread = None
+_probe_lock = threading.Lock()
+_probe_state = {'last_notification_id': None, 'counters_version': None, 'probes': 0, 'errors': 0}
+_probe_gaps = {}  # notification id -> monotonic deadline; only touched by the probe thread
+
+def create_live_update_state_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS live_update_state (
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        INSERT IGNORE INTO live_update_state (name, version) VALUES (%s, 0)
+    ''', (COUNTERS_VERSION_NAME,))
+
+def _read_markers(cursor):
+    """(max notification id, counters version) - a primary-key lookup each"""
+    cursor.execute('''
+        SELECT (SELECT COALESCE(MAX(id), 0) FROM notifications),
+               (SELECT version FROM live_update_state WHERE name = %s)
+    ''', (COUNTERS_VERSION_NAME,))
+    return cursor.fetchone()
+
+def _fetch_new_notifications(cursor, last_id, max_id):
+    """Rows in (last_id, max_id] plus late commits of earlier gap ids; records the new gaps.
+
+    Returns (rows, overflowed) - overflowed when the range was too large to replay.
+    """
+    now = time.monotonic()
+    for gap_id, deadline in list(_probe_gaps.items()):
+        if deadline < now:
+            del _probe_gaps[gap_id]
+
+    rows = []
+    if _probe_gaps:
+        gap_ids = sorted(_probe_gaps)
+        cursor.execute(f'''
+            SELECT id, user_id, message, type, gate_pass_id FROM notifications
+            WHERE id IN ({', '.join(['%s'] * len(gap_ids))})
+        ''', tuple(gap_ids))
+        rows = dict_fetchall(cursor)
+        for row in rows:
+            _probe_gaps.pop(row['id'], None)
+
+    if max_id <= last_id:
+        return rows, False
+
+    cursor.execute('''
+        SELECT id, user_id, message, type, gate_pass_id FROM notifications
+        WHERE id > %s AND id <= %s
+        ORDER BY id
+        LIMIT %s
+    ''', (last_id, max_id, PROBE_FETCH_LIMIT))
+    new_rows = dict_fetchall(cursor)
+    if len(new_rows) >= PROBE_FETCH_LIMIT:
+        return rows, True
+
+    seen = {row['id'] for row in new_rows}
+    for missing_id in range(last_id + 1, max_id):
+        if missing_id not in seen and len(_probe_gaps) < PROBE_MAX_GAPS:
+            _probe_gaps[missing_id] = now + PROBE_GAP_SECONDS
+    return rows + new_rows, False
+
+def _fan_out_notifications(rows, overflowed):
+    """Push rows to their owners' streams and wake their long-polls"""
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row['user_id'], []).append({
+            'id': row['id'],
+            'message': row['message'],
+            'type': row['type'],
+            'gate_pass_id': row['gate_pass_id']
+        })
+
+    broker = get_broker()
+    if overflowed:
+        # Burst too large to replay - every open page refetches instead
+        broker.broadcast('resync')
+    for user_id, notifications in by_user.items():
+        broker.publish(user_id, 'notification', {'count': len(notifications), 'notifications': notifications})
+
+    if by_user or overflowed:
+        with _notification_changed:
+            for user_id in by_user:
+                _notification_versions[user_id] = _notification_versions.get(user_id, 0) + 1
+            _notification_changed.notify_all()
+
+def probe_live_updates():
+    """One probe pass: publish notifications / counter changes committed by any process"""
+    conn = get_db_connection()
+    if conn is None:
+        return False
+
+    cursor = conn.cursor()
+
+    try:
+        max_id, counters_version = _read_markers(cursor)
+        last_id = _probe_state['last_notification_id']
+
+        if last_id is not None:
+            rows, overflowed = _fetch_new_notifications(cursor, last_id, max_id)
+            if rows or overflowed:
+                _fan_out_notifications(rows, overflowed)
+        if last_id is not None and counters_version != _probe_state['counters_version']:
+            get_broker().broadcast('counters')
+
+        # First pass only records where we are - clients load current state on page load
+        _probe_state['last_notification_id'] = max(max_id, last_id or 0)
+        _probe_state['counters_version'] = counters_version
+        _probe_state['probes'] += 1
+        return True
+    except Exception as e:
+        _probe_state['errors'] += 1
+        print(f"Live update probe error: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+def start_live_update_probe():
+    """Start this process's probe thread (once)"""
+    global _probe_thread
+    with _probe_lock:
+        if _probe_thread is not None and _probe_thread.is_alive():
+            return
+        interval = config['default'].STREAM_PROBE_INTERVAL
+
+        def probe_loop():
+            while True:
+                # Clear before probing so a wake that arrives mid-probe triggers another pass
+                _probe_wake.clear()
+                probe_live_updates()
+                _probe_wake.wait(interval)
+
+        _probe_thread = threading.Thread(target=probe_loop, name='live-update-probe', daemon=True)
+        _probe_thread.start()
+    print("✅ Live update probe started!")
+
+def get_probe_stats():
+    return dict(_probe_state, pending_gaps=len(_probe_gaps))
+
+def publish_notifications(rows):
+    """Call after committing notification rows - the probe picks them up from the table"""
+    if rows:
+        _probe_wake.set()
+
+def notification_version(user_id):
+    with _notification_changed:
+        return _notification_versions.get(user_id, 0)
+
+def wait_for_notifications(user_id, version, timeout):
+    """Block until a notification is published for user_id after version (True) or timeout (False)"""
+    with _notification_changed:
+        return _notification_changed.wait_for(
+            lambda: _notification_versions.get(user_id, 0) != version, timeout)
+
+def publish_counters_changed():
+    """Bump the shared counters version so every process tells its streams (returns badge, overdue alarm)"""
+    conn = get_db_connection()
+    if conn is None:
+        return
+
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute('''
+            UPDATE live_update_state SET version = version + 1 WHERE name = %s
+        ''', (COUNTERS_VERSION_NAME,))
+        conn.commit()
+    except Exception as e:
+        print(f"Error bumping counters version: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    _probe_wake.set()
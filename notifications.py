@@ -1,60 +1,122 @@
 # notifications.py - COMPLETE VERSION WITH OVERDUE ALARM SCHEDULER
-import MySQLdb
 from config import config
 from datetime import datetime, timedelta
 import time
 import threading
 from models import get_db_connection, dict_fetchall
+from notification_pubsub import publish_notifications
+from scheduler_leader import wait_for_leadership
+from overdue_severity import overdue_condition, update_overdue_severity
 
-def create_notification(user_id, message, notification_type, gate_pass_id=None):
-    """Create notification with better error handling"""
+# No NOW() in VALUES - created_at defaults, and a placeholder-only VALUES lets
+# MySQLdb's executemany collapse the batch into a single multi-row INSERT
+NOTIFICATION_INSERT_SQL = '''
+    INSERT INTO notifications (user_id, gate_pass_id, message, type)
+    VALUES (%s, %s, %s, %s)
+'''
+
+# Per-user badge counters, kept in step with every insert / mark-read
+NOTIFICATION_COUNTER_SQL = '''
+    INSERT INTO notification_counters (user_id, unread_count, total_count)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count),
+                            total_count = total_count + VALUES(total_count)
+'''
+
+def insert_notifications(cursor, rows):
+    """Queue rows of (user_id, message, type, gate_pass_id) on the caller's cursor - no commit.
+
+    Lets a route write its notifications in the same transaction as its own update.
+    The recipients' counters are bumped in the same transaction.
+    """
+    values = [(user_id, gate_pass_id, message, notification_type)
+              for user_id, message, notification_type, gate_pass_id in rows if user_id]
+    if values:
+        cursor.executemany(NOTIFICATION_INSERT_SQL, values)
+        
+        per_user = {}
+        for user_id, _, _, _ in values:
+            per_user[user_id] = per_user.get(user_id, 0) + 1
+        # Sorted so concurrent batches lock counter rows in the same order
+        cursor.executemany(NOTIFICATION_COUNTER_SQL,
+                           [(user_id, count, count) for user_id, count in sorted(per_user.items())])
+    return len(values)
+
+def get_notification_counts(cursor, user_id):
+    """(unread_count, total_count) for a user - one primary-key lookup"""
+    cursor.execute('''
+        SELECT unread_count, total_count FROM notification_counters WHERE user_id = %s
+    ''', (user_id,))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+def rebuild_notification_counters(cursor, user_id=None):
+    """Recount counters from the notifications table (backfill / repair after bulk deletes)"""
+    user_filter = 'WHERE user_id = %s' if user_id else ''
+    params = (user_id,) if user_id else ()
+    
+    cursor.execute(f'''
+        UPDATE notification_counters SET unread_count = 0, total_count = 0 {user_filter}
+    ''', params)
+    cursor.execute(f'''
+        INSERT INTO notification_counters (user_id, unread_count, total_count)
+        SELECT user_id, SUM(is_read = FALSE), COUNT(*)
+        FROM notifications {user_filter}
+        GROUP BY user_id
+        ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count), total_count = VALUES(total_count)
+    ''', params)
+
+def create_notifications_batch(rows):
+    """Write notifications with possibly different messages in one INSERT + one commit.
+
+    rows: iterable of (user_id, message, type, gate_pass_id). Returns rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    
     conn = get_db_connection()
     if conn is None:
         print("Failed to get database connection for notification")
-        return
+        return 0
     
     cursor = conn.cursor()
     
     try:
-        # Use simple INSERT without transactions to avoid locks
-        cursor.execute('''
-            INSERT INTO notifications (user_id, gate_pass_id, message, type, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        ''', (user_id, gate_pass_id, message, notification_type))
-        
+        written = insert_notifications(cursor, rows)
         conn.commit()
-        print(f"✅ Notification created for user {user_id}: {message[:50]}...")
-        
-    except MySQLdb.OperationalError as oe:
-        if 'Lock wait timeout' in str(oe):
-            print(f"⚠️ Lock timeout when creating notification, retrying...")
-            try:
-                # Try with a new connection
-                cursor.close()
-                conn.close()
-                
-                conn2 = get_db_connection()
-                cursor2 = conn2.cursor()
-                cursor2.execute('''
-                    INSERT INTO notifications (user_id, gate_pass_id, message, type, created_at)
-                    VALUES (%s, %s, %s, %s, NOW())
-                ''', (user_id, gate_pass_id, message, notification_type))
-                conn2.commit()
-                cursor2.close()
-                conn2.close()
-                print(f"✅ Notification created on retry for user {user_id}")
-            except Exception as e2:
-                print(f"❌ Failed to create notification even on retry: {e2}")
-        else:
-            print(f"❌ MySQL error creating notification: {oe}")
+        publish_notifications(rows)
+        print(f"✅ {written} notification(s) created: {rows[0][1][:50]}...")
+        return written
     except Exception as e:
-        print(f"❌ Error creating notification: {e}")
+        print(f"❌ Error creating notifications: {e}")
+        conn.rollback()
+        return 0
     finally:
-        try:
-            cursor.close()
-            conn.close()
-        except:
-            pass
+        cursor.close()
+        conn.close()
+
+def create_notifications_bulk(recipients, message, notification_type, gate_pass_id=None):
+    """Send the same notification to many users with a single multi-row INSERT.
+
+    recipients: user ids (duplicates and None are skipped). Returns rows written.
+    """
+    seen = set()
+    rows = []
+    for user_id in recipients:
+        if user_id and user_id not in seen:
+            seen.add(user_id)
+            rows.append((user_id, message, notification_type, gate_pass_id))
+    return create_notifications_batch(rows)
+
+def get_role_user_ids(cursor, role, exclude_user_id=None):
+    """Ids of approved users with a role (e.g. every system_admin for a fan-out)"""
+    cursor.execute('SELECT id FROM users WHERE role = %s AND status = %s', (role, 'approved'))
+    return [row[0] for row in cursor.fetchall() if row[0] != exclude_user_id]
+
+def create_notification(user_id, message, notification_type, gate_pass_id=None):
+    """Create a single notification (see create_notifications_bulk for fan-out)"""
+    create_notifications_batch([(user_id, message, notification_type, gate_pass_id)])
 
 def get_user_notifications(user_id, limit=10):
     conn = get_db_connection()
@@ -93,20 +155,26 @@ def mark_notification_read(notification_id, user_id=None):
     cursor = conn.cursor()
     
     try:
-        if user_id:
-            # Only mark read if notification belongs to the user
-            cursor.execute('''
-                UPDATE notifications 
-                SET is_read = TRUE 
-                WHERE id = %s AND user_id = %s
-            ''', (notification_id, user_id))
-        else:
-            # Original behavior (for backward compatibility)
-            cursor.execute('''
-                UPDATE notifications SET is_read = TRUE WHERE id = %s
-            ''', (notification_id,))
+        if not user_id:
+            # Original behavior (for backward compatibility) - the owner is needed for the counter
+            cursor.execute('SELECT user_id FROM notifications WHERE id = %s', (notification_id,))
+            owner = cursor.fetchone()
+            user_id = owner[0] if owner else None
+        
+        # Only mark read if notification belongs to the user
+        cursor.execute('''
+            UPDATE notifications 
+            SET is_read = TRUE 
+            WHERE id = %s AND user_id = %s AND is_read = FALSE
+        ''', (notification_id, user_id))
         
         affected_rows = cursor.rowcount
+        if affected_rows > 0:
+            cursor.execute('''
+                UPDATE notification_counters
+                SET unread_count = GREATEST(unread_count - 1, 0)
+                WHERE user_id = %s
+            ''', (user_id,))
         conn.commit()
         
         if affected_rows > 0:
@@ -122,11 +190,73 @@ def mark_notification_read(notification_id, user_id=None):
         return False
     finally:
         cursor.close()
-        conn.close()    
-        conn.commit()
+        conn.close()
         
-def check_overdue_gate_passes():
-    """Check for overdue gate passes and send notifications"""
+def overdue_notice(pass_number, overdue_days):
+    """(message, notification type) for a pass overdue_days past its return date"""
+    if overdue_days <= 1:
+        # First day overdue - gentle reminder
+        return f"⏰ REMINDER: Gate Pass {pass_number} is 1 day overdue!", 'reminder'
+    elif overdue_days <= 3:
+        # 2-3 days - warning
+        return f"⚠️ WARNING: Gate Pass {pass_number} is {overdue_days} days overdue!", 'warning'
+    elif overdue_days <= 7:
+        # 4-7 days - urgent
+        return f"🚨 URGENT: Gate Pass {pass_number} is {overdue_days} days overdue!", 'alert'
+    # More than 7 days - critical
+    return f"🔥 CRITICAL: Gate Pass {pass_number} is {overdue_days} days overdue!", 'critical'
+
+def store_username_for(store_location):
+    """Store manager account that owns a store location"""
+    return 'store1' if store_location == 'store_1' else 'store2'
+
+def load_overdue_recipients(cursor):
+    """Approved department heads (by department), store managers (by username) and system admins - one query"""
+    cursor.execute('''
+        SELECT id, role, department_id, username FROM users
+        WHERE status = 'approved' AND role IN ('department_head', 'store_manager', 'system_admin')
+    ''')
+    recipients = {'department_head': {}, 'store_manager': {}, 'system_admin': []}
+    for user_id, role, department_id, username in cursor.fetchall():
+        if role == 'department_head':
+            recipients['department_head'].setdefault(department_id, []).append(user_id)
+        elif role == 'store_manager':
+            recipients['store_manager'].setdefault(username, []).append(user_id)
+        else:
+            recipients['system_admin'].append(user_id)
+    return recipients
+
+def mark_passes_notified(cursor, column, pass_ids):
+    """Stamp column = NOW() on every pass in one UPDATE ... WHERE id IN (...)"""
+    if not pass_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(pass_ids))
+    cursor.execute(f'''
+        UPDATE gate_passes SET {column} = NOW() WHERE id IN ({placeholders})
+    ''', tuple(pass_ids))
+
+def check_overdue_gate_passes(pass_ids=None):
+    """Check for overdue gate passes and send notifications.
+
+    Set-based: per batch one pass query, recipients grouped in memory, one
+    multi-row notification INSERT and one UPDATE ... WHERE id IN (...).
+    Batches of OVERDUE_SWEEP_BATCH_SIZE keep each transaction short.
+
+    pass_ids limits the sweep to those passes and skips the 24 h re-notify
+    window - the overdue timer passes the ones that just crossed a threshold.
+    Severity grades are brought up to date first; the sweep reads the stored grade.
+    """
+    batch_size = config['default'].OVERDUE_SWEEP_BATCH_SIZE
+    
+    update_overdue_severity(pass_ids)
+    
+    if pass_ids:
+        scope_sql = f"AND gp.id IN ({', '.join(['%s'] * len(pass_ids))})"
+        scope_params = tuple(pass_ids)
+    else:
+        scope_sql = "AND (gp.last_overdue_notification IS NULL OR gp.last_overdue_notification < DATE_SUB(NOW(), INTERVAL 24 HOUR))"
+        scope_params = ()
+    
     conn = get_db_connection()
     if conn is None:
         return
@@ -134,102 +264,76 @@ def check_overdue_gate_passes():
     cursor = conn.cursor()
     
     try:
-        # Find gate passes that are overdue
-        cursor.execute('''
-            SELECT gp.*, u.name as creator_name, u.id as creator_id,
-                   u.department_id as creator_dept_id,
-                   TIMESTAMPDIFF(DAY, gp.expected_return_date, NOW()) as overdue_days,
-                   d.name as department_name,
-                   dh.id as dept_head_id, dh.name as dept_head_name,
-                   sm.id as store_manager_id, sm.name as store_manager_name
-            FROM gate_passes gp
-            JOIN users u ON gp.created_by = u.id
-            JOIN departments d ON gp.department_id = d.id
-            LEFT JOIN users dh ON d.id = dh.department_id AND dh.role = 'department_head' AND dh.status = 'approved'
-            LEFT JOIN users sm ON gp.store_location = CASE 
-                WHEN sm.username = 'store1' THEN 'store_1'
-                WHEN sm.username = 'store2' THEN 'store_2'
-                ELSE NULL 
-            END AND sm.role = 'store_manager' AND sm.status = 'approved'
-            WHERE gp.material_type = 'returnable' 
-            AND gp.expected_return_date < NOW() 
-            AND gp.actual_return_date IS NULL
-            AND gp.status = 'approved'
-            AND (gp.last_overdue_notification IS NULL OR gp.last_overdue_notification < DATE_SUB(NOW(), INTERVAL 24 HOUR))
-        ''')
-        
-        overdue_passes = dict_fetchall(cursor)
+        recipients = None
+        notified = 0
+        last_id = 0
         
-        for gate_pass in overdue_passes:
-            overdue_days = gate_pass['overdue_days'] or 0
+        while True:
+            # Find gate passes that are overdue (stamped passes drop out, the id cursor guarantees progress)
+            cursor.execute(f'''
+                SELECT gp.id, gp.pass_number, gp.created_by, gp.department_id, gp.store_location,
+                       TIMESTAMPDIFF(DAY, gp.expected_return_date, NOW()) as overdue_days,
+                       u.name as creator_name, d.name as department_name
+                FROM gate_passes gp
+                JOIN users u ON gp.created_by = u.id
+                JOIN departments d ON gp.department_id = d.id
+                WHERE {overdue_condition('gp')}
+                {scope_sql}
+                AND gp.id > %s
+                ORDER BY gp.id
+                LIMIT %s
+            ''', scope_params + (last_id, batch_size))
+            overdue_passes = dict_fetchall(cursor)
+            if not overdue_passes:
+                break
             
-            # Determine severity
-            if overdue_days == 1:
-                # First day overdue - gentle reminder
-                message = f"⏰ REMINDER: Gate Pass {gate_pass['pass_number']} is 1 day overdue!"
-                notif_type = 'reminder'
+            if recipients is None:
+                recipients = load_overdue_recipients(cursor)
+            
+            # Every notification for this batch goes out in one multi-row INSERT
+            rows = []
+            for gate_pass in overdue_passes:
+                overdue_days = gate_pass['overdue_days'] or 0
+                message, notif_type = overdue_notice(gate_pass['pass_number'], overdue_days)
                 
-            elif overdue_days <= 3:
-                # 2-3 days - warning
-                message = f"⚠️ WARNING: Gate Pass {gate_pass['pass_number']} is {overdue_days} days overdue!"
-                notif_type = 'warning'
+                # 1. Notify CREATOR
+                rows.append((gate_pass['created_by'], message, notif_type, gate_pass['id']))
                 
-            elif overdue_days <= 7:
-                # 4-7 days - urgent
-                message = f"🚨 URGENT: Gate Pass {gate_pass['pass_number']} is {overdue_days} days overdue!"
-                notif_type = 'alert'
+                # 2. Notify DEPARTMENT HEAD
+                for dept_head_id in recipients['department_head'].get(gate_pass['department_id'], []):
+                    if dept_head_id != gate_pass['created_by']:
+                        rows.append((dept_head_id,
+                                     f"{message} Created by: {gate_pass['creator_name']}",
+                                     notif_type, gate_pass['id']))
                 
-            else:
-                # More than 7 days - critical
-                message = f"🔥 CRITICAL: Gate Pass {gate_pass['pass_number']} is {overdue_days} days overdue!"
-                notif_type = 'critical'
-            
-            # 1. Notify CREATOR
-            create_notification(
-                gate_pass['creator_id'], 
-                message, 
-                notif_type, 
-                gate_pass['id']
-            )
-            
-            # 2. Notify DEPARTMENT HEAD
-            if gate_pass['dept_head_id']:
-                create_notification(
-                    gate_pass['dept_head_id'],
-                    f"{message} Created by: {gate_pass['creator_name']}",
-                    notif_type,
-                    gate_pass['id']
-                )
-            
-            # 3. Notify STORE MANAGER (if store was involved)
-            if gate_pass['store_manager_id']:
-                create_notification(
-                    gate_pass['store_manager_id'],
-                    f"🏪 Store Alert: Material from Gate Pass {gate_pass['pass_number']} is {overdue_days} day(s) overdue",
-                    'store_alert',
-                    gate_pass['id']
-                )
+                # 3. Notify STORE MANAGER (if store was involved)
+                if gate_pass['store_location']:
+                    for store_manager_id in recipients['store_manager'].get(store_username_for(gate_pass['store_location']), []):
+                        rows.append((store_manager_id,
+                                     f"🏪 Store Alert: Material from Gate Pass {gate_pass['pass_number']} is {overdue_days} day(s) overdue",
+                                     'store_alert', gate_pass['id']))
+                
+                # 4. Notify ALL SYSTEM ADMINS for critical overdue (>7 days)
+                if overdue_days > 7:
+                    for admin_id in recipients['system_admin']:
+                        rows.append((admin_id,
+                                     f"🔥 CRITICAL OVERDUE: Gate Pass {gate_pass['pass_number']} is {overdue_days} days overdue! Department: {gate_pass['department_name']}",
+                                     'critical', gate_pass['id']))
             
-            # 4. Notify ALL SYSTEM ADMINS for critical overdue (>7 days)
-            if overdue_days > 7:
-                cursor.execute('SELECT id FROM users WHERE role = "system_admin" AND status = "approved"')
-                admins = dict_fetchall(cursor)
-                for admin in admins:
-                    create_notification(
-                        admin['id'],
-                        f"🔥 CRITICAL OVERDUE: Gate Pass {gate_pass['pass_number']} is {overdue_days} days overdue! Department: {gate_pass['department_name']}",
-                        'critical',
-                        gate_pass['id']
-                    )
+            # 5. Update last notification time - one statement for the batch
+            batch_ids = [gate_pass['id'] for gate_pass in overdue_passes]
+            insert_notifications(cursor, rows)
+            mark_passes_notified(cursor, 'last_overdue_notification', batch_ids)
+            conn.commit()
+            publish_notifications(rows)
             
-            # 5. Update last notification time
-            cursor.execute('''
-                UPDATE gate_passes 
-                SET last_overdue_notification = NOW() 
-                WHERE id = %s
-            ''', (gate_pass['id'],))
+            notified += len(batch_ids)
+            last_id = batch_ids[-1]
+            if len(overdue_passes) < batch_size:
+                break
         
-        conn.commit()
+        if notified:
+            print(f"⏰ Overdue sweep: {notified} pass(es) notified")
         
     except Exception as e:
         print(f"Error checking overdue gate passes: {e}")
@@ -239,7 +343,9 @@ def check_overdue_gate_passes():
         conn.close()
 
 def check_store_overdue_passes():
-    """Check for overdue passes related to stores"""
+    """Check for overdue passes related to stores (same set-based batches as the main sweep)"""
+    batch_size = config['default'].OVERDUE_SWEEP_BATCH_SIZE
+    
     conn = get_db_connection()
     if conn is None:
         return
@@ -247,58 +353,49 @@ def check_store_overdue_passes():
     cursor = conn.cursor()
     
     try:
-        # Find store-related overdue passes
-        cursor.execute('''
-            SELECT gp.*, u.name as creator_name, 
-                   d.name as department_name, gp.store_location,
-                   TIMESTAMPDIFF(DAY, gp.expected_return_date, NOW()) as overdue_days
-            FROM gate_passes gp
-            JOIN users u ON gp.created_by = u.id
-            JOIN departments d ON gp.department_id = d.id
-            WHERE gp.material_type = 'returnable' 
-            AND gp.expected_return_date < NOW() 
-            AND gp.actual_return_date IS NULL
-            AND gp.status = 'approved'
-            AND gp.store_location IS NOT NULL
-            AND (gp.last_store_notification IS NULL OR gp.last_store_notification < DATE_SUB(NOW(), INTERVAL 12 HOUR))
-        ''')
-        
-        store_overdue_passes = dict_fetchall(cursor)
+        recipients = None
+        last_id = 0
         
-        for gate_pass in store_overdue_passes:
-            store_location = gate_pass['store_location']
-            overdue_days = gate_pass['overdue_days'] or 0
+        while True:
+            # Find store-related overdue passes
+            cursor.execute(f'''
+                SELECT gp.id, gp.pass_number, gp.store_location,
+                       TIMESTAMPDIFF(DAY, gp.expected_return_date, NOW()) as overdue_days
+                FROM gate_passes gp
+                WHERE {overdue_condition('gp')}
+                AND gp.store_location IS NOT NULL
+                AND (gp.last_store_notification IS NULL OR gp.last_store_notification < DATE_SUB(NOW(), INTERVAL 12 HOUR))
+                AND gp.id > %s
+                ORDER BY gp.id
+                LIMIT %s
+            ''', (last_id, batch_size))
+            store_overdue_passes = dict_fetchall(cursor)
+            if not store_overdue_passes:
+                break
             
-            # Notify store managers
-            if store_location == 'store_1':
-                store_username = 'store1'
-            else:
-                store_username = 'store2'
+            if recipients is None:
+                recipients = load_overdue_recipients(cursor)
             
-            cursor.execute('''
-                SELECT id FROM users 
-                WHERE username = %s 
-                AND role = 'store_manager' 
-                AND status = 'approved'
-            ''', (store_username,))
+            rows = []
+            for gate_pass in store_overdue_passes:
+                overdue_days = gate_pass['overdue_days'] or 0
+                
+                # Notify store managers
+                for store_manager_id in recipients['store_manager'].get(store_username_for(gate_pass['store_location']), []):
+                    rows.append((store_manager_id,
+                                 f"🏪 Store Alert: Material from Gate Pass {gate_pass['pass_number']} is {overdue_days} day(s) overdue",
+                                 'store_alert', gate_pass['id']))
             
-            store_managers = dict_fetchall(cursor)
-            for store_manager in store_managers:
-                create_notification(
-                    store_manager['id'],
-                    f"🏪 Store Alert: Material from Gate Pass {gate_pass['pass_number']} is {overdue_days} day(s) overdue",
-                    'store_alert',
-                    gate_pass['id']
-                )
+            # Update last store notification time - one statement for the batch
+            batch_ids = [gate_pass['id'] for gate_pass in store_overdue_passes]
+            insert_notifications(cursor, rows)
+            mark_passes_notified(cursor, 'last_store_notification', batch_ids)
+            conn.commit()
+            publish_notifications(rows)
             
-            # Update last store notification time
-            cursor.execute('''
-                UPDATE gate_passes 
-                SET last_store_notification = NOW() 
-                WHERE id = %s
-            ''', (gate_pass['id'],))
-        
-        conn.commit()
+            last_id = batch_ids[-1]
+            if len(store_overdue_passes) < batch_size:
+                break
         
     except Exception as e:
         print(f"Error checking store overdue passes: {e}")
@@ -308,11 +405,17 @@ def check_store_overdue_passes():
         conn.close()
 
 def start_notification_scheduler():
-    """Start scheduler for regular notification checking (every 3 hours)"""
+    """Start scheduler for regular notification checking (every 3 hours).
+
+    Daily re-reminders and store alerts; threshold crossings come from the
+    overdue timer (overdue_scheduler.py). Only the scheduler leader sweeps.
+    """
     def scheduler():
         while True:
             try:
+                wait_for_leadership(None)  # Followers block here until the leader goes away
                 check_overdue_gate_passes()
+                check_store_overdue_passes()
                 time.sleep(10800)  # 3 hours in seconds
             except Exception as e:
                 print(f"Error in notification scheduler: {e}")
@@ -321,21 +424,3 @@ def start_notification_scheduler():
     thread = threading.Thread(target=scheduler, daemon=True)
     thread.start()
     print("✅ Notification scheduler started!")
-
-def start_overdue_alarm_scheduler():
-    """Start scheduler for continuous overdue checking (every 30 seconds)"""
-    def alarm_scheduler():
-        while True:
-            try:
-                # Check every 30 seconds for immediate alerts
-                check_overdue_gate_passes()
-                check_store_overdue_passes()
-                time.sleep(30)
-            except Exception as e:
-                print(f"Alarm scheduler error: {e}")
-                time.sleep(60)  # Wait 1 minute before retrying
-    
-    # Start in separate thread
-    thread = threading.Thread(target=alarm_scheduler, daemon=True)
-    thread.start()
-    print("✅ Overdue alarm scheduler started!")
\ No newline at end of file
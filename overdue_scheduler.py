@@ -0,0 +1,195 @@
+# overdue_scheduler.py - EVENT-DRIVEN OVERDUE TIMER (MIN-HEAP OF expected_return_date DEADLINES)
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from config import config
+from models import get_db_connection
+from notifications import check_overdue_gate_passes
+from overdue_severity import update_overdue_severity
+from scheduler_leader import is_scheduler_leader, wait_for_leadership
+
+# Whole days past expected_return_date at which overdue_notice() changes level:
+# overdue (reminder), more than 1 day (warning), more than 3 (urgent), more than 7 (critical)
+OVERDUE_FIRE_OFFSETS_DAYS = (0, 2, 4, 8)
+
+# Fire just after each threshold: the severity SQL grades with NOW() at second
+# precision, so a check in the threshold's own second would still see 'none'
+OVERDUE_FIRE_DELAY = timedelta(seconds=1)
+
+
+class OverdueTimer:
+    """Min-heap of (fire_at, gate_pass_id, version) deadlines.
+
+    Re-scheduling or cancelling a pass bumps its version; heap entries with an
+    old version are skipped when they surface, so updates are O(log n) pushes
+    instead of heap rebuilds.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._versions = {}
+        self._armed_for = {}
+        self._cond = threading.Condition()
+
+    def schedule(self, gate_pass_id, expected_return_date, now=None):
+        """(Re)arm every future severity deadline for a pass"""
+        now = now or datetime.now()
+        with self._cond:
+            if gate_pass_id in self._versions and self._armed_for.get(gate_pass_id) == expected_return_date:
+                return  # Unchanged (e.g. a periodic reload) - keep the existing entries
+            version = self._versions.get(gate_pass_id, 0) + 1
+            self._versions[gate_pass_id] = version
+            self._armed_for[gate_pass_id] = expected_return_date
+            pushed = False
+            for offset in OVERDUE_FIRE_OFFSETS_DAYS:
+                fire_at = expected_return_date + timedelta(days=offset) + OVERDUE_FIRE_DELAY
+                if fire_at > now:
+                    heapq.heappush(self._heap, (fire_at, gate_pass_id, version))
+                    pushed = True
+            if not pushed:
+                # Past the last threshold - the periodic sweep owns its daily reminders
+                self._forget(gate_pass_id)
+            self._cond.notify()
+
+    def _forget(self, gate_pass_id):
+        self._versions.pop(gate_pass_id, None)
+        self._armed_for.pop(gate_pass_id, None)
+
+    def cancel(self, gate_pass_id):
+        with self._cond:
+            self._forget(gate_pass_id)
+
+    def clear(self):
+        """Drop every deadline (a process that loses leadership reloads when it wins again)"""
+        with self._cond:
+            self._heap = []
+            self._versions.clear()
+            self._armed_for.clear()
+
+    def pop_due(self, now=None):
+        """Ids of passes with a deadline at or before now"""
+        now = now or datetime.now()
+        due = set()
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, gate_pass_id, version = heapq.heappop(self._heap)
+                if self._versions.get(gate_pass_id) == version:
+                    due.add(gate_pass_id)
+                    last_fire_at = self._armed_for[gate_pass_id] + timedelta(days=OVERDUE_FIRE_OFFSETS_DAYS[-1])
+                    if fire_at == last_fire_at + OVERDUE_FIRE_DELAY:
+                        self._forget(gate_pass_id)  # Last threshold - nothing left to arm
+            self._drop_stale_head()
+        return due
+
+    def _drop_stale_head(self):
+        while self._heap and self._versions.get(self._heap[0][1]) != self._heap[0][2]:
+            heapq.heappop(self._heap)
+
+    def seconds_until_next(self, now=None):
+        now = now or datetime.now()
+        with self._cond:
+            self._drop_stale_head()
+            if not self._heap:
+                return None
+            return max((self._heap[0][0] - now).total_seconds(), 0)
+
+    def wait(self, timeout):
+        """Sleep until timeout or until schedule() adds a deadline"""
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {'deadlines': len(self._heap), 'passes': len(self._versions)}
+
+
+_timer = OverdueTimer()
+
+def get_overdue_timer():
+    return _timer
+
+def schedule_overdue_check(gate_pass_id, expected_return_date):
+    """Call when a returnable pass is created or its expected_return_date changes.
+
+    Only the scheduler leader pops the heap, so other processes don't keep
+    deadlines at all - the leader's periodic reload picks their passes up.
+    """
+    if gate_pass_id and expected_return_date and is_scheduler_leader():
+        _timer.schedule(gate_pass_id, expected_return_date)
+
+def cancel_overdue_check(gate_pass_id):
+    """Call when a pass is returned - its pending deadlines stop firing"""
+    _timer.cancel(gate_pass_id)
+
+def load_overdue_deadlines():
+    """Arm the timer for every open returnable pass that still has a threshold ahead of it"""
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+
+    cursor = conn.cursor()
+
+    try:
+        horizon_days = max(OVERDUE_FIRE_OFFSETS_DAYS)
+        cursor.execute('''
+            SELECT id, expected_return_date FROM gate_passes
+            WHERE material_type = 'returnable'
+            AND actual_return_date IS NULL
+            AND status NOT IN ('rejected', 'returned', 'force_returned')
+            AND expected_return_date > DATE_SUB(NOW(), INTERVAL %s DAY)
+        ''', (horizon_days,))
+        rows = cursor.fetchall()
+        now = datetime.now()
+        for gate_pass_id, expected_return_date in rows:
+            if expected_return_date:
+                _timer.schedule(gate_pass_id, expected_return_date, now)
+        return len(rows)
+    except Exception as e:
+        print(f"Error loading overdue deadlines: {e}")
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def start_overdue_alarm_scheduler():
+    """Fire overdue notifications exactly when a pass crosses a threshold (no periodic table scans).
+
+    Deadlines are reloaded every OVERDUE_TIMER_RELOAD_SECONDS so passes created
+    or edited by other processes are picked up. Only the scheduler leader fires;
+    a process that takes over reloads first.
+    """
+    cfg = config['default']
+    reload_interval = cfg.OVERDUE_TIMER_RELOAD_SECONDS
+
+    def timer_loop():
+        next_reload = 0
+        while True:
+            try:
+                if not is_scheduler_leader():
+                    _timer.clear()
+                    wait_for_leadership(cfg.SCHEDULER_LEADER_CHECK_SECONDS)
+                    next_reload = 0
+                    continue
+
+                if time.monotonic() >= next_reload:
+                    # Catches passes approved after their return date, which never had a deadline armed
+                    update_overdue_severity()
+                    loaded = load_overdue_deadlines()
+                    print(f"⏱️ Overdue timer armed for {loaded} pass(es)")
+                    next_reload = time.monotonic() + reload_interval
+
+                due = _timer.pop_due()
+                if due:
+                    check_overdue_gate_passes(pass_ids=sorted(due))
+
+                wait = _timer.seconds_until_next()
+                until_reload = max(next_reload - time.monotonic(), 0)
+                _timer.wait(until_reload if wait is None else min(wait, until_reload))
+            except Exception as e:
+                print(f"Overdue timer error: {e}")
+                time.sleep(60)
+
+    thread = threading.Thread(target=timer_loop, name='overdue-timer', daemon=True)
+    thread.start()
+    print("✅ Overdue alarm scheduler started!")
@@ -0,0 +1,99 @@
+# overdue_severity.py - MATERIALIZED gate_passes.overdue_severity (KEPT CURRENT BY THE OVERDUE SCHEDULER)
+from models import get_db_connection
+from counter_cache import invalidate_counters
+
+def overdue_condition(alias=''):
+    """Overdue filter for views: the stored grade, OR'd with passes that crossed their
+    return date since the scheduler last graded them (idx_gp_overdue_severity / idx_gp_overdue)
+    """
+    p = f"{alias}." if alias else ''
+    return (f"({p}overdue_severity IN ('reminder', 'warning', 'urgent', 'critical')"
+            f" OR ({p}overdue_severity = 'none' AND {p}status = 'approved'"
+            f" AND {p}material_type = 'returnable' AND {p}actual_return_date IS NULL"
+            f" AND {p}expected_return_date < NOW()))")
+
+OVERDUE_SEVERITY_SQL = overdue_condition()
+
+# Grade as of NOW(), same day thresholds as overdue_notice() and the timer's OVERDUE_FIRE_OFFSETS_DAYS
+SEVERITY_CASE_SQL = '''CASE
+    WHEN material_type <> 'returnable' OR status <> 'approved'
+         OR actual_return_date IS NOT NULL OR expected_return_date IS NULL
+         OR expected_return_date >= NOW() THEN 'none'
+    WHEN expected_return_date <= DATE_SUB(NOW(), INTERVAL 8 DAY) THEN 'critical'
+    WHEN expected_return_date <= DATE_SUB(NOW(), INTERVAL 4 DAY) THEN 'urgent'
+    WHEN expected_return_date <= DATE_SUB(NOW(), INTERVAL 2 DAY) THEN 'warning'
+    ELSE 'reminder'
+END'''
+
+# Append to the SET list (after status) of every UPDATE that changes status or expected_return_date
+SET_OVERDUE_SEVERITY_SQL = f"overdue_severity = {SEVERITY_CASE_SQL}"
+
+def add_overdue_severity_column(cursor):
+    """Add the column and its index (idempotent), then grade every open pass"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'gate_passes' AND COLUMN_NAME = 'overdue_severity'
+    ''')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('''
+            ALTER TABLE gate_passes
+            ADD COLUMN overdue_severity ENUM('none', 'reminder', 'warning', 'urgent', 'critical')
+                NOT NULL DEFAULT 'none',
+            ADD INDEX idx_gp_overdue_severity (overdue_severity, expected_return_date)
+        ''')
+        print("🛠️ Added gate_passes.overdue_severity")
+
+    graded = refresh_overdue_severity(cursor)
+    print(f"⏰ Graded {graded} overdue pass(es)")
+
+def refresh_overdue_severity(cursor, pass_ids=None):
+    """Re-grade only the passes whose severity changed; returns the number of rows updated.
+
+    Without pass_ids two index range reads cover every possible change: open
+    passes that just went past their return date (idx_gp_overdue, still 'none')
+    and passes already flagged (idx_gp_overdue_severity) that moved up a level
+    or were returned / rejected in the meantime.
+    """
+    if pass_ids:
+        placeholders = ', '.join(['%s'] * len(pass_ids))
+        cursor.execute(f'''
+            UPDATE gate_passes SET overdue_severity = {SEVERITY_CASE_SQL}
+            WHERE id IN ({placeholders}) AND overdue_severity <> {SEVERITY_CASE_SQL}
+        ''', tuple(pass_ids))
+        return cursor.rowcount
+
+    cursor.execute(f'''
+        UPDATE gate_passes SET overdue_severity = {SEVERITY_CASE_SQL}
+        WHERE status = 'approved' AND material_type = 'returnable'
+        AND actual_return_date IS NULL AND expected_return_date < NOW()
+        AND overdue_severity = 'none'
+    ''')
+    updated = cursor.rowcount
+
+    cursor.execute(f'''
+        UPDATE gate_passes SET overdue_severity = {SEVERITY_CASE_SQL}
+        WHERE {OVERDUE_SEVERITY_SQL} AND overdue_severity <> {SEVERITY_CASE_SQL}
+    ''')
+    return updated + cursor.rowcount
+
+def update_overdue_severity(pass_ids=None):
+    """refresh_overdue_severity() in its own transaction; counters are invalidated when anything moved"""
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+
+    cursor = conn.cursor()
+
+    try:
+        updated = refresh_overdue_severity(cursor, pass_ids)
+        conn.commit()
+        if updated:
+            invalidate_counters()
+        return updated
+    except Exception as e:
+        print(f"Error updating overdue severity: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
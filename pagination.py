@@ -0,0 +1,61 @@
+# pagination.py - KEYSET (CURSOR) PAGINATION HELPERS FOR LIST VIEWS
+import base64
+from datetime import datetime
+from config import config
+from models import dict_fetchall
+
+CURSOR_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+def get_page_size(requested=None):
+    """Page size from ?per_page=, clamped to 1..MAX (falls back to the configured default)"""
+    settings = config['default']
+    try:
+        size = int(requested) if requested else settings.GATE_PASS_PAGE_SIZE
+    except (TypeError, ValueError):
+        size = settings.GATE_PASS_PAGE_SIZE
+    return max(1, min(size, settings.GATE_PASS_MAX_PAGE_SIZE))
+
+def encode_cursor(sort_value, row_id):
+    """Opaque URL-safe cursor for the last row of a page (sort_value is a datetime)"""
+    raw = f"{sort_value.strftime(CURSOR_TIME_FORMAT)}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(datetime, id) from a cursor, or None if missing/malformed (-> first page)"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        sort_text, row_id = raw.split('|', 1)
+        return datetime.strptime(sort_text, CURSOR_TIME_FORMAT), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def keyset_condition(cursor, sort_column='gp.created_at', id_column='gp.id'):
+    """(sql, params) selecting rows strictly after the cursor in (sort DESC, id DESC) order.
+
+    Returns ('1=1', ()) for the first page so callers can always AND it in.
+    """
+    position = decode_cursor(cursor)
+    if position is None:
+        return '1=1', ()
+    sort_value, row_id = position
+    return (f"({sort_column} < %s OR ({sort_column} = %s AND {id_column} < %s))",
+            (sort_value, sort_value, row_id))
+
+def fetch_page(cursor, sql, params, page_size, sort_key='created_at', id_key='id'):
+    """Run a keyset query (sql must already end with ORDER BY sort DESC, id DESC).
+
+    Fetches one extra row to know whether another page exists.
+    Returns (rows, next_cursor) - next_cursor is None on the last page.
+    """
+    cursor.execute(f"{sql} LIMIT %s", tuple(params) + (page_size + 1,))
+    rows = dict_fetchall(cursor)
+
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_key], last[id_key])
@@ -0,0 +1,410 @@
+# photo_storage.py - CONTENT-ADDRESSED, DATE-SHARDED PHOTO STORAGE (LOCAL DISK OR S3-COMPATIBLE BACKEND)
+import hashlib
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from config import config
+
+# Leading bytes -> file extension for the image types the camera / file picker produce
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'RIFF', 'webp'),
+)
+IMAGE_EXTENSIONS = tuple(extension for _, extension in IMAGE_SIGNATURES)
+
+# Keys never change content, so every copy (browser, proxy, bucket) may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class PhotoStorageError(Exception):
+    """Photo rejected by the storage layer (too large, not an image)"""
+
+
+def image_extension(head):
+    """Extension for the first bytes of an image, or None if it isn't a supported type"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            if extension == 'webp' and head[8:12] != b'WEBP':
+                continue
+            return extension
+    return None
+
+def photo_key(digest, extension, when=None):
+    """uploads/yyyy/mm/dd/ab/<sha256>.<ext> - the same key on every backend.
+
+    The date shard keeps directories small; the two-character hash shard
+    spreads a busy day. Same content on the same day maps to the same key.
+    """
+    when = when or datetime.now()
+    return f"uploads/{when:%Y/%m/%d}/{digest[:2]}/{digest}.{extension}"
+
+def is_valid_key(key):
+    """Keys the media route may serve - photos only, no path traversal"""
+    return (key.startswith('uploads/') and '..' not in key.split('/')
+            and key.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS)
+
+def content_type_for(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+# ==================== BACKENDS ====================
+
+class LocalPhotoStorage:
+    """Photos under MEDIA_ROOT (default backend - single host or shared volume)"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        """Filesystem path, or None on backends without one"""
+        return os.path.join(self.root, key)
+
+    def put_file(self, temp_path, key):
+        """Take ownership of a fully written temp file"""
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    def put_bytes(self, data, key):
+        fd, temp_path = _temp_file()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        self.put_file(temp_path, key)
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def read(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+    def url(self, key):
+        """Direct (presigned) URL, or None when the app serves the bytes itself"""
+        return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3PhotoStorage:
+    """S3-compatible object store (AWS S3, MinIO, ...), so app servers share no disk.
+
+    - put_file() uses boto3's managed transfer: bodies over multipart_threshold
+      go up as a multipart upload in multipart_chunk_size parts.
+    - url() returns a presigned GET URL; the media route redirects to it so
+      photo bytes don't pass through the app.
+    - Needs boto3 (only imported when this backend is configured).
+    """
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 prefix='', presign_seconds=3600, multipart_threshold=8 * 1024 * 1024,
+                 multipart_chunk_size=8 * 1024 * 1024):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("PHOTO_STORAGE_BACKEND = 's3' needs boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_seconds = presign_seconds
+        self._client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+        self._transfer = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunk_size
+        )
+
+    def _object_key(self, key):
+        return f"{self.prefix}{key}"
+
+    def local_path(self, key):
+        return None
+
+    def put_file(self, temp_path, key):
+        try:
+            self._client.upload_file(
+                temp_path, self.bucket, self._object_key(key),
+                ExtraArgs={'ContentType': content_type_for(key), 'CacheControl': IMMUTABLE_CACHE_CONTROL},
+                Config=self._transfer
+            )
+        finally:
+            os.remove(temp_path)
+
+    def put_bytes(self, data, key):
+        self._client.put_object(
+            Bucket=self.bucket, Key=self._object_key(key), Body=data,
+            ContentType=content_type_for(key), CacheControl=IMMUTABLE_CACHE_CONTROL
+        )
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def open(self, key):
+        return self._client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+
+    def read(self, key):
+        body = self.open(key)
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def url(self, key):
+        return self._client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._object_key(key)},
+            ExpiresIn=self.presign_seconds
+        )
+
+    def delete(self, key):
+        self._client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+class ReadThroughCache:
+    """Wraps any backend: read() results are kept in an in-process LRU bounded by total bytes.
+
+    Photo keys are immutable, so entries never need invalidating - only evicting.
+    Everything except read() is passed straight to the wrapped backend.
+    """
+
+    def __init__(self, backend, max_bytes, max_item_bytes=None):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max_bytes // 8
+
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def read(self, key):
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return data
+            self._misses += 1
+
+        data = self.backend.read(key)
+        if len(data) <= self.max_item_bytes:
+            with self._lock:
+                if key not in self._data:
+                    self._data[key] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._data.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+def create_storage_from_config():
+    cfg = config['default']
+    if cfg.PHOTO_STORAGE_BACKEND == 's3':
+        backend = S3PhotoStorage(
+            cfg.PHOTO_S3_BUCKET,
+            endpoint_url=cfg.PHOTO_S3_ENDPOINT_URL,
+            region=cfg.PHOTO_S3_REGION,
+            access_key=cfg.PHOTO_S3_ACCESS_KEY,
+            secret_key=cfg.PHOTO_S3_SECRET_KEY,
+            prefix=cfg.PHOTO_S3_PREFIX,
+            presign_seconds=cfg.PHOTO_S3_PRESIGN_SECONDS,
+            multipart_threshold=cfg.PHOTO_S3_MULTIPART_THRESHOLD,
+            multipart_chunk_size=cfg.PHOTO_S3_MULTIPART_CHUNK_SIZE
+        )
+    else:
+        backend = LocalPhotoStorage(cfg.MEDIA_ROOT)
+
+    if cfg.PHOTO_READ_CACHE_MAX_BYTES:
+        backend = ReadThroughCache(backend, cfg.PHOTO_READ_CACHE_MAX_BYTES)
+    return backend
+
+
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+def get_photo_storage():
+    """Process-wide backend from config (re-created after fork - boto3 clients aren't fork-safe)"""
+    global _storage, _storage_pid
+    if _storage is None or _storage_pid != os.getpid():
+        with _storage_lock:
+            if _storage is None or _storage_pid != os.getpid():
+                _storage = create_storage_from_config()
+                _storage_pid = os.getpid()
+    return _storage
+
+def set_photo_storage(backend):
+    """Swap the backend (e.g. a stand-in object store in a dev setup)"""
+    global _storage, _storage_pid
+    _storage = backend
+    _storage_pid = os.getpid()
+
+
+# ==================== SAVING PHOTOS ====================
+
+def _commit_temp_file(temp_path, digest, extension):
+    """Hand a fully written temp file to the backend under its content key; an identical photo already there wins"""
+    key = photo_key(digest, extension)
+    storage = get_photo_storage()
+    if storage.exists(key):
+        os.remove(temp_path)
+        print(f"♻️ Duplicate photo reused: {key}")
+        return key
+
+    storage.put_file(temp_path, key)
+    return key
+
+def _temp_file():
+    temp_dir = config['default'].UPLOAD_TEMP_FOLDER
+    os.makedirs(temp_dir, exist_ok=True)
+    # Keep it on the same filesystem as MEDIA_ROOT so the local backend's move is an atomic rename
+    return tempfile.mkstemp(dir=temp_dir, suffix='.part')
+
+def save_photo_stream(stream, max_bytes=None, chunk_size=None):
+    """Copy a file-like stream into storage chunk by chunk; returns the photo key.
+
+    The hash is computed while writing, so the body is read exactly once and
+    never held in memory beyond one chunk.
+    """
+    cfg = config['default']
+    max_bytes = max_bytes or cfg.PHOTO_MAX_BYTES
+    chunk_size = chunk_size or cfg.PHOTO_UPLOAD_CHUNK_SIZE
+
+    fd, temp_path = _temp_file()
+    digest = hashlib.sha256()
+    size = 0
+    extension = None
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = image_extension(chunk[:16])
+                    if extension is None:
+                        raise PhotoStorageError('Only JPEG, PNG or WebP photos are accepted')
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PhotoStorageError(f'Photo is larger than {max_bytes // (1024 * 1024)}MB')
+                digest.update(chunk)
+                f.write(chunk)
+
+        if size == 0:
+            raise PhotoStorageError('Empty upload')
+
+        return _commit_temp_file(temp_path, digest.hexdigest(), extension)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def save_photo_bytes(data):
+    """Store an in-memory photo (legacy base64 form fields); returns the photo key"""
+    extension = image_extension(data[:16])
+    if extension is None:
+        raise PhotoStorageError('Only JPEG, PNG or WebP photos are accepted')
+
+    fd, temp_path = _temp_file()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return _commit_temp_file(temp_path, hashlib.sha256(data).hexdigest(), extension)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def save_photo_file(path, keep_source=False):
+    """Move an existing file (e.g. a staged upload) into storage; returns the photo key.
+
+    keep_source stores a copy and leaves path in place (removed by the caller once
+    whatever references the photo has been committed).
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        extension = image_extension(f.read(16))
+        if extension is None:
+            raise PhotoStorageError('Only JPEG, PNG or WebP photos are accepted')
+        f.seek(0)
+        for chunk in iter(lambda: f.read(config['default'].PHOTO_UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    if keep_source:
+        fd, temp_path = _temp_file()
+        os.close(fd)
+        try:
+            shutil.copyfile(path, temp_path)
+            return _commit_temp_file(temp_path, digest.hexdigest(), extension)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    return _commit_temp_file(path, digest.hexdigest(), extension)
+
+def copy_local_photos_to_backend():
+    """One-off move to a shared backend: upload every photo under MEDIA_ROOT/uploads that it lacks"""
+    storage = get_photo_storage()
+    root = config['default'].MEDIA_ROOT
+    copied = 0
+
+    for folder, _, files in os.walk(os.path.join(root, 'uploads')):
+        for name in files:
+            key = os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/')
+            if not is_valid_key(key) or storage.exists(key):
+                continue
+            with open(os.path.join(root, key), 'rb') as f:
+                storage.put_bytes(f.read(), key)
+            copied += 1
+
+    print(f"📤 Copied {copied} photo(s) to the {config['default'].PHOTO_STORAGE_BACKEND} backend")
+    return copied
+
+if __name__ == '__main__':
+    # python photo_storage.py migrate  -> copy local uploads into the configured backend
+    if sys.argv[1:] == ['migrate']:
+        copy_local_photos_to_backend()
+    else:
+        print("Usage: python photo_storage.py migrate")
@@ -0,0 +1,120 @@
+# photo_uploads.py - STREAMED MATERIAL PHOTO UPLOADS (STAGED FILES + IMAGE TOKENS)
+import os
+import re
+import secrets
+import time
+from config import config
+from photo_storage import IMAGE_EXTENSIONS, image_extension, save_photo_file
+
+TOKEN_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class PhotoUploadError(Exception):
+    """Upload rejected (too large, not an image, unknown token)"""
+
+
+def _staging_dir(user_id):
+    return os.path.join(config['default'].PHOTO_STAGING_FOLDER, str(int(user_id)))
+
+def stage_photo_stream(stream, user_id):
+    """Copy an upload body to a staging file in PHOTO_UPLOAD_CHUNK_SIZE pieces and return its token.
+
+    Nothing larger than one chunk is held in memory. The body is rejected
+    past PHOTO_MAX_BYTES or when it doesn't start like a JPEG/PNG/WebP.
+    """
+    cfg = config['default']
+    staging_dir = _staging_dir(user_id)
+    os.makedirs(staging_dir, exist_ok=True)
+
+    token = secrets.token_hex(16)
+    partial_path = os.path.join(staging_dir, f"{token}.part")
+    size = 0
+    extension = None
+
+    try:
+        with open(partial_path, 'wb') as f:
+            while True:
+                chunk = stream.read(cfg.PHOTO_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = image_extension(chunk[:16])
+                    if extension is None:
+                        raise PhotoUploadError('Only JPEG, PNG or WebP photos are accepted')
+                size += len(chunk)
+                if size > cfg.PHOTO_MAX_BYTES:
+                    raise PhotoUploadError(f'Photo is larger than {cfg.PHOTO_MAX_BYTES // (1024 * 1024)}MB')
+                f.write(chunk)
+
+        if size == 0:
+            raise PhotoUploadError('Empty upload')
+
+        os.replace(partial_path, os.path.join(staging_dir, f"{token}.{extension}"))
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    print(f"📷 Staged photo {token} ({size} bytes)")
+    return token
+
+def _find_staged(user_id, token):
+    """Path of a staged file - only tokens staged by this user resolve"""
+    if not token or not TOKEN_PATTERN.match(token):
+        return None
+    staging_dir = _staging_dir(user_id)
+    for extension in IMAGE_EXTENSIONS:
+        path = os.path.join(staging_dir, f"{token}.{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def claim_photo_tokens(tokens, user_id):
+    """Copy staged photos into photo storage; returns their keys (paths relative to static/).
+
+    The staged files stay behind, so the tokens still work if the gate pass
+    insert fails - call release_photo_tokens() after the commit.
+    Unknown or foreign tokens raise PhotoUploadError before anything is stored.
+    """
+    staged = []
+    for token in tokens:
+        path = _find_staged(user_id, token)
+        if path is None:
+            raise PhotoUploadError('Photo upload expired or not found - please capture it again')
+        staged.append(path)
+
+    return [save_photo_file(path, keep_source=True) for path in staged]
+
+def release_photo_tokens(tokens, user_id):
+    """Delete the staged files of claimed tokens (the purge job catches any left behind)"""
+    for token in tokens:
+        path = _find_staged(user_id, token)
+        if path is None:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def purge_stale_uploads(max_age_hours=None):
+    """Delete staged photos never claimed by a gate pass (abandoned forms)"""
+    cfg = config['default']
+    max_age = (max_age_hours or cfg.PHOTO_STAGING_MAX_AGE_HOURS) * 3600
+    cutoff = time.time() - max_age
+    removed = 0
+
+    if not os.path.isdir(cfg.PHOTO_STAGING_FOLDER):
+        return 0
+
+    for user_dir in os.scandir(cfg.PHOTO_STAGING_FOLDER):
+        if not user_dir.is_dir():
+            continue
+        for entry in os.scandir(user_dir.path):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+
+    return removed
@@ -7,29 +7,110 @@ from datetime import datetime
 import hashlib
 import secrets
 import os
+import re
+import threading
+from collections import OrderedDict
+from config import config
+
+# ==================== QR RENDER CACHE ====================
+# Render params are part of the cache key - change them and old files simply stop being referenced
+QR_RENDER_PARAMS = {'version': 1, 'box_size': 10, 'border': 4, 'error_correction': 'L'}
+
+QR_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+QR_STORAGE_PREFIX = 'qr'
+
+_qr_png_cache = OrderedDict()
+_qr_cache_lock = threading.Lock()
+
+def qr_cache_key(data):
+    """Content address of a rendered QR: sha256 of payload + render params"""
+    params = ','.join(f"{name}={value}" for name, value in sorted(QR_RENDER_PARAMS.items()))
+    return hashlib.sha256(f"{params}|{data}".encode()).hexdigest()
+
+def qr_storage_key(key):
+    """qr/ab/<key>.png in the photo storage backend - every host (and S3) sees the same PNGs"""
+    return f"{QR_STORAGE_PREFIX}/{key[:2]}/{key}.png"
+
+def _render_qr_png(data):
+    qr = qrcode.QRCode(
+        version=QR_RENDER_PARAMS['version'],
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=QR_RENDER_PARAMS['box_size'],
+        border=QR_RENDER_PARAMS['border'],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def _remember_png(key, png):
+    with _qr_cache_lock:
+        _qr_png_cache[key] = png
+        _qr_png_cache.move_to_end(key)
+        while len(_qr_png_cache) > config['default'].QR_CACHE_MAX_ENTRIES:
+            _qr_png_cache.popitem(last=False)
+
+def get_cached_qr_png(key):
+    """PNG bytes for a cache key (memory, then photo storage) or None if it was never rendered"""
+    from photo_storage import get_photo_storage
+    with _qr_cache_lock:
+        png = _qr_png_cache.get(key)
+        if png is not None:
+            _qr_png_cache.move_to_end(key)
+            return png
+    
+    storage = get_photo_storage()
+    storage_key = qr_storage_key(key)
+    try:
+        if not storage.exists(storage_key):
+            return None
+        png = storage.read(storage_key)
+    except Exception as e:
+        print(f"QR read error for {key}: {e}")
+        return None
+    _remember_png(key, png)
+    return png
+
+def render_qr_png(data):
+    """(key, PNG bytes) for data - rendered once, then served from the LRU or photo storage"""
+    from photo_storage import get_photo_storage
+    key = qr_cache_key(data)
+    png = get_cached_qr_png(key)
+    if png is not None:
+        return key, png
+    
+    png = _render_qr_png(data)
+    # Backends write atomically (temp file + rename / single PUT), so readers never see half a PNG
+    get_photo_storage().put_bytes(png, qr_storage_key(key))
+    
+    _remember_png(key, png)
+    return key, png
+
+def qr_image_url(data):
+    """URL of the cached QR PNG for data (served by the qr_image route with long-lived cache headers)"""
+    from flask import url_for
+    try:
+        key, _ = render_qr_png(data)
+        return url_for('qr_image', key=key)
+    except Exception as e:
+        print(f"Error generating QR code: {e}")
+        return None
 
 # ==================== CORE QR FUNCTIONS ====================
 def generate_qr_code(data, filename=None):
     """Generate QR code image as base64 or save to file"""
     try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
+        _, png = render_qr_png(data)
         
         if filename:
-            img.save(filename)
+            with open(filename, 'wb') as f:
+                f.write(png)
         
         # Convert to base64 for HTML display
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        img_str = base64.b64encode(png).decode()
         
         return f"data:image/png;base64,{img_str}"
     
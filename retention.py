@@ -0,0 +1,256 @@
+# retention.py - NOTIFICATION / SECURITY LOG RETENTION, ARCHIVAL AND COMPACTION JOB
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from config import config
+from models import get_db_connection
+from scheduler_leader import wait_for_leadership
+from photo_uploads import purge_stale_uploads
+
+RETENTION_LOCK_NAME = 'gate_pass_retention'
+
+# Notification types the overdue sweeps and manual reminders write - repeats per pass collapse to one row
+OVERDUE_REMINDER_TYPES = ('reminder', 'warning', 'alert', 'critical', 'store_alert')
+
+NOTIFICATION_COLUMNS = 'id, user_id, gate_pass_id, message, type, is_read, created_at'
+SECURITY_LOG_COLUMNS = 'id, gate_pass_id, user_id, alert_type, details, created_at'
+
+def create_archive_tables(cursor):
+    """Archive tables, partitioned by year of created_at (no foreign keys - rows outlive their parents)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS notifications_archive (
+            id INT NOT NULL,
+            user_id INT NOT NULL,
+            gate_pass_id INT NULL,
+            message TEXT NOT NULL,
+            type VARCHAR(30) NOT NULL,
+            is_read BOOLEAN DEFAULT FALSE,
+            created_at DATETIME NOT NULL,
+            archived_at DATETIME NOT NULL,
+            archive_reason ENUM('retention', 'compacted') NOT NULL,
+            PRIMARY KEY (id, created_at),
+            INDEX idx_notif_archive_user (user_id, created_at)
+        )
+        PARTITION BY RANGE (YEAR(created_at)) (
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS security_logs_archive (
+            id INT NOT NULL,
+            gate_pass_id INT NULL,
+            user_id INT NULL,
+            alert_type VARCHAR(50) NOT NULL,
+            details TEXT,
+            created_at DATETIME NOT NULL,
+            archived_at DATETIME NOT NULL,
+            PRIMARY KEY (id, created_at),
+            INDEX idx_seclog_archive_gate_pass (gate_pass_id)
+        )
+        PARTITION BY RANGE (YEAR(created_at)) (
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+    ''')
+
+def ensure_archive_partitions(cursor, table, through_year):
+    """Split the catch-all partition so every year up to through_year has its own partition"""
+    cursor.execute('''
+        SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+    ''', (table,))
+    existing_years = [int(row[0][1:]) for row in cursor.fetchall() if re.fullmatch(r'p\d{4}', row[0])]
+
+    # pmax only holds years above the highest existing partition, so only those can be split
+    # out of it - older missing years stay inside their neighbour's partition
+    first_year = max(existing_years) + 1 if existing_years else datetime.now().year - 1
+    missing = list(range(first_year, through_year + 1))
+    if not missing:
+        return
+
+    partitions = ', '.join(f"PARTITION p{year} VALUES LESS THAN ({year + 1})" for year in missing)
+    try:
+        cursor.execute(f'''
+            ALTER TABLE {table} REORGANIZE PARTITION pmax INTO (
+                {partitions}, PARTITION pmax VALUES LESS THAN MAXVALUE
+            )
+        ''')
+        print(f"🗂️ Added archive partitions {', '.join(f'p{year}' for year in missing)} to {table}")
+    except Exception as e:
+        print(f"⚠️ Could not add partitions to {table}: {e}")
+
+def _move_notifications(cursor, ids, reason):
+    """Copy notifications to the archive, delete them and take them off their owners' counters"""
+    placeholders = ', '.join(['%s'] * len(ids))
+    ids = tuple(ids)
+
+    cursor.execute(f'''
+        SELECT user_id, COUNT(*), SUM(is_read = FALSE)
+        FROM notifications WHERE id IN ({placeholders})
+        GROUP BY user_id
+    ''', ids)
+    per_user = sorted(cursor.fetchall())
+
+    cursor.execute(f'''
+        INSERT IGNORE INTO notifications_archive ({NOTIFICATION_COLUMNS}, archived_at, archive_reason)
+        SELECT {NOTIFICATION_COLUMNS}, NOW(), %s FROM notifications WHERE id IN ({placeholders})
+    ''', (reason,) + ids)
+    cursor.execute(f'DELETE FROM notifications WHERE id IN ({placeholders})', ids)
+
+    cursor.executemany('''
+        UPDATE notification_counters
+        SET total_count = GREATEST(total_count - %s, 0),
+            unread_count = GREATEST(unread_count - %s, 0)
+        WHERE user_id = %s
+    ''', [(total, unread or 0, user_id) for user_id, total, unread in per_user])
+
+    return len(ids)
+
+def _archive_in_batches(conn, cursor, select_sql, params, move, batch_size):
+    """Repeatedly select up to batch_size ids and move them, one short transaction per batch"""
+    moved = 0
+    while True:
+        cursor.execute(f"{select_sql} LIMIT %s", tuple(params) + (batch_size,))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return moved
+        moved += move(ids)
+        conn.commit()
+        if len(ids) < batch_size:
+            return moved
+
+def archive_read_notifications(conn, cursor, days, batch_size):
+    """Read notifications older than days -> notifications_archive"""
+    return _archive_in_batches(conn, cursor, '''
+        SELECT id FROM notifications
+        WHERE is_read = TRUE AND created_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+        ORDER BY id
+    ''', (days,), lambda ids: _move_notifications(cursor, ids, 'retention'), batch_size)
+
+def compact_overdue_reminders(conn, cursor, batch_size):
+    """Keep only the newest overdue reminder per (user, gate pass); older repeats are archived.
+
+    The GROUP BY scan runs once - the candidate ids are then moved batch_size at a time.
+    """
+    type_placeholders = ', '.join(['%s'] * len(OVERDUE_REMINDER_TYPES))
+    cursor.execute(f'''
+        SELECT n.id FROM notifications n
+        JOIN (
+            SELECT user_id, gate_pass_id, MAX(id) AS keep_id
+            FROM notifications
+            WHERE gate_pass_id IS NOT NULL AND type IN ({type_placeholders}) AND message LIKE %s
+            GROUP BY user_id, gate_pass_id
+            HAVING COUNT(*) > 1
+        ) latest ON n.user_id = latest.user_id AND n.gate_pass_id = latest.gate_pass_id AND n.id < latest.keep_id
+        WHERE n.type IN ({type_placeholders}) AND n.message LIKE %s
+        ORDER BY n.id
+    ''', OVERDUE_REMINDER_TYPES + ('%overdue%',) + OVERDUE_REMINDER_TYPES + ('%overdue%',))
+    candidate_ids = [row[0] for row in cursor.fetchall()]
+
+    moved = 0
+    for start in range(0, len(candidate_ids), batch_size):
+        moved += _move_notifications(cursor, candidate_ids[start:start + batch_size], 'compacted')
+        conn.commit()
+    return moved
+
+def archive_security_logs(conn, cursor, days, batch_size):
+    """Security logs older than days -> security_logs_archive"""
+    def move(ids):
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f'''
+            INSERT IGNORE INTO security_logs_archive ({SECURITY_LOG_COLUMNS}, archived_at)
+            SELECT {SECURITY_LOG_COLUMNS}, NOW() FROM security_logs WHERE id IN ({placeholders})
+        ''', tuple(ids))
+        cursor.execute(f'DELETE FROM security_logs WHERE id IN ({placeholders})', tuple(ids))
+        return len(ids)
+
+    return _archive_in_batches(conn, cursor, '''
+        SELECT id FROM security_logs
+        WHERE created_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+        ORDER BY id
+    ''', (days,), move, batch_size)
+
+def purge_dispatched_outbox(conn, cursor, days, batch_size):
+    """Delivered outbox events are only useful for debugging - drop them after a few days"""
+    purged = 0
+    while True:
+        cursor.execute('''
+            DELETE FROM notification_outbox
+            WHERE status = 'done' AND processed_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+            LIMIT %s
+        ''', (days, batch_size))
+        deleted = cursor.rowcount
+        conn.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+
+def run_retention():
+    """One retention pass. Returns a summary dict, or None if it didn't run."""
+    cfg = config['default']
+    conn = get_db_connection()
+    if conn is None:
+        print("❌ Retention: database connection failed")
+        return None
+
+    cursor = conn.cursor()
+
+    try:
+        # Only one process runs the job; the others skip this round
+        cursor.execute('SELECT GET_LOCK(%s, 0)', (RETENTION_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            print("⏭️ Retention already running in another process")
+            return None
+
+        try:
+            next_year = datetime.now().year + 1
+            ensure_archive_partitions(cursor, 'notifications_archive', next_year)
+            ensure_archive_partitions(cursor, 'security_logs_archive', next_year)
+
+            summary = {
+                'compacted_reminders': compact_overdue_reminders(conn, cursor, cfg.RETENTION_BATCH_SIZE),
+                'archived_notifications': archive_read_notifications(
+                    conn, cursor, cfg.NOTIFICATION_RETENTION_DAYS, cfg.RETENTION_BATCH_SIZE),
+                'archived_security_logs': archive_security_logs(
+                    conn, cursor, cfg.SECURITY_LOG_RETENTION_DAYS, cfg.RETENTION_BATCH_SIZE),
+                'purged_outbox_events': purge_dispatched_outbox(
+                    conn, cursor, cfg.OUTBOX_RETENTION_DAYS, cfg.RETENTION_BATCH_SIZE),
+                'purged_staged_photos': purge_stale_uploads()
+            }
+            print(f"🧹 Retention done: {summary}")
+            return summary
+        finally:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (RETENTION_LOCK_NAME,))
+            cursor.fetchone()
+
+    except Exception as e:
+        print(f"❌ Retention error: {e}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def start_retention_scheduler():
+    """Run the retention job shortly after start-up and then every RETENTION_INTERVAL_HOURS (scheduler leader only)"""
+    interval = config['default'].RETENTION_INTERVAL_HOURS * 3600
+
+    def scheduler():
+        time.sleep(300)  # Let start-up traffic settle first
+        while True:
+            try:
+                wait_for_leadership(None)
+                run_retention()
+                time.sleep(interval)
+            except Exception as e:
+                print(f"Retention scheduler error: {e}")
+                time.sleep(3600)
+
+    thread = threading.Thread(target=scheduler, name='retention', daemon=True)
+    thread.start()
+    print("✅ Retention scheduler started!")
+
+if __name__ == '__main__':
+    # python retention.py  -> run one retention pass now
+    sys.exit(0 if run_retention() is not None else 1)
@@ -0,0 +1,144 @@
+# scheduler_leader.py - SINGLE-LEADER ELECTION FOR BACKGROUND SWEEPS ACROSS WORKER PROCESSES
+import os
+import threading
+import MySQLdb
+from config import config
+from models import get_db_pool
+
+LEADER_LOCK_NAME = 'gate_pass_scheduler_leader'
+
+
+class LeaderElector:
+    """Holds a MySQL named lock (GET_LOCK) on a dedicated connection.
+
+    - Every process runs an elector; whoever holds the lock is the leader and
+      runs the sweeps, the rest only check is_leader() and idle.
+    - The lock lives as long as the leader's connection: if the process dies
+      the server drops the connection and releases it, and a follower takes
+      over on its next check (within ``check_interval`` seconds).
+    - The dedicated connection never goes back to the pool, so the lock can't
+      leak to an unrelated request.
+    """
+
+    def __init__(self, lock_name, check_interval=5):
+        self.lock_name = lock_name
+        self.check_interval = check_interval
+
+        self._conn = None
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._elections = 0
+
+    # ==================== LOCK HANDLING ====================
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = MySQLdb.connect(**get_db_pool().connect_kwargs)
+        return self._conn
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _query_one(self, sql, params):
+        cursor = self._connect().cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _check(self):
+        """Try to take the lock as follower, confirm we still hold it as leader"""
+        try:
+            if self._leader.is_set():
+                still_held = self._query_one('SELECT IS_USED_LOCK(%s) = CONNECTION_ID()', (self.lock_name,))
+                if not still_held:
+                    self._step_down("lock no longer held")
+            elif self._query_one('SELECT GET_LOCK(%s, 0)', (self.lock_name,)) == 1:
+                self._elections += 1
+                self._leader.set()
+                print(f"👑 Scheduler leader elected (pid {os.getpid()})")
+        except Exception as e:
+            # Lost connection means lost lock - another process may take over
+            self._drop_connection()
+            if self._leader.is_set():
+                self._step_down(f"connection error: {e}")
+
+    def _step_down(self, reason):
+        self._leader.clear()
+        print(f"⚠️ Scheduler leadership lost (pid {os.getpid()}): {reason}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._check()
+            self._stop.wait(self.check_interval)
+
+        if self._leader.is_set():
+            try:
+                self._query_one('SELECT RELEASE_LOCK(%s)', (self.lock_name,))
+            except Exception:
+                pass
+            self._leader.clear()
+        self._drop_connection()
+
+    # ==================== PUBLIC API ====================
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='scheduler-leader', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Release leadership (e.g. at shutdown) so a follower takes over immediately"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.check_interval + 1)
+
+    def is_leader(self):
+        return self._leader.is_set()
+
+    def wait_for_leadership(self, timeout):
+        """True once this process leads; False after timeout seconds as follower"""
+        return self._leader.wait(timeout)
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'is_leader': self.is_leader(),
+            'elections_won': self._elections,
+            'check_interval': self.check_interval
+        }
+
+
+_elector = None
+_elector_pid = None
+_elector_lock = threading.Lock()
+
+def get_leader_elector():
+    """Process-wide elector (re-created after fork - a child must win its own lock)"""
+    global _elector, _elector_pid
+    if _elector is None or _elector_pid != os.getpid():
+        with _elector_lock:
+            if _elector is None or _elector_pid != os.getpid():
+                _elector = LeaderElector(LEADER_LOCK_NAME, config['default'].SCHEDULER_LEADER_CHECK_SECONDS)
+                _elector_pid = os.getpid()
+    return _elector
+
+def start_leader_election():
+    import atexit
+    elector = get_leader_elector()
+    elector.start()
+    atexit.register(elector.stop)
+    print("✅ Scheduler leader election started!")
+
+def is_scheduler_leader():
+    return get_leader_elector().is_leader()
+
+def wait_for_leadership(timeout):
+    return get_leader_elector().wait_for_leadership(timeout)
@@ -30,13 +30,8 @@ def setup_system():
     if not run_command("python generate_icons.py", "Generating PWA icons"):
         return False
     
-    # Step 3: Initialize database
-    print("\nInitializing database...")
-    try:
-        import app
-        print("Database initialized successfully!")
-    except Exception as e:
-        print(f"Database initialization error: {e}")
+    # Step 3: Initialize database (apply schema migrations + print report)
+    if not run_command("python migrations.py init", "Initializing database"):
         return False
     
     # Step 4: Reset passwords
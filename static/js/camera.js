@@ -1,6 +1,8 @@
-// camera.js - UPDATED VERSION
+// camera.js - UPDATED VERSION (load js/photo_upload.js first - photos are uploaded as binary JPEGs)
 let stream = null;
-let photoCount = 0;
+let photoCount = 0;      // Photos uploaded and added to the form
+let pendingUploads = 0;  // Captured, upload still in flight
+let selectionId = 0;     // Bumped on every new capture run / file selection - late uploads of an old one are ignored
 const maxPhotos = 4;
 let captureInterval = null;
 
@@ -44,7 +46,7 @@ async function startCamera() {
         document.getElementById('stopCamera').style.display = 'inline-block';
         
         // Start automatic photo capture
-        photoCount = 0;
+        startNewSelection();
         document.getElementById('capturedPhotos').innerHTML = '';
         captureInterval = setInterval(capturePhoto, 3000); // 3 seconds interval
         
@@ -77,6 +79,9 @@ function capturePhoto() {
         stopCamera();
         return;
     }
+    if (photoCount + pendingUploads >= maxPhotos) {
+        return; // Enough uploads in flight - capture again only if one of them fails
+    }
     
     const video = document.getElementById('video');
     const canvas = document.getElementById('canvas');
@@ -95,61 +100,95 @@ function capturePhoto() {
     // Draw video frame to canvas
     context.drawImage(video, 0, 0, canvas.width, canvas.height);
     
-    // Convert to data URL
-    const photoData = canvas.toDataURL('image/jpeg', 0.8);
-    
-    // Display captured photo
-    displayCapturedPhoto(photoData, photoCount + 1);
+    const selection = selectionId;
+    pendingUploads++;
     
-    // Store in hidden input
-    addPhotoToForm(photoData);
-    
-    photoCount++;
+    // Encode as a binary JPEG, show it and upload it - the form gets the image token
+    PhotoUpload.canvasToBlob(canvas, 0.8).then(photoBlob => {
+        const photoCol = displayCapturedPhoto(URL.createObjectURL(photoBlob), photoCount + pendingUploads);
+        return uploadPhoto(photoBlob, selection).then(added => {
+            // A failed upload frees its slot so the camera takes another photo
+            if (!added && selection === selectionId) photoCol.remove();
+            return added;
+        });
+    }).catch(err => {
+        console.error('Error capturing photo:', err);
+        return false;
+    }).then(added => {
+        if (selection !== selectionId) return;
+        pendingUploads--;
+        if (added) photoCount++;
+        if (photoCount >= maxPhotos) showCaptureComplete();
+    });
+}
+
+function showCaptureComplete() {
+    stopCamera();
     
-    if (photoCount >= maxPhotos) {
-        stopCamera();
-        
-        // Show completion message
-        const photoContainer = document.getElementById('capturedPhotos');
-        photoContainer.innerHTML += `
-            <div class="col-12">
-                <div class="alert alert-success text-center">
-                    <i class="fas fa-check-circle"></i> 
-                    Successfully captured ${maxPhotos} photos!
-                </div>
+    // Show completion message
+    const photoContainer = document.getElementById('capturedPhotos');
+    photoContainer.innerHTML += `
+        <div class="col-12">
+            <div class="alert alert-success text-center">
+                <i class="fas fa-check-circle"></i> 
+                Successfully captured ${maxPhotos} photos!
             </div>
-        `;
+        </div>
+    `;
+}
+
+function startNewSelection() {
+    // Drop the tokens of the previous capture run / file selection
+    selectionId++;
+    photoCount = 0;
+    pendingUploads = 0;
+    const form = document.getElementById('gatePassForm');
+    if (form) {
+        form.querySelectorAll('input[name="image_tokens[]"]').forEach(input => input.remove());
     }
 }
 
-function displayCapturedPhoto(photoData, number) {
+function displayCapturedPhoto(photoUrl, number) {
     const photoContainer = document.getElementById('capturedPhotos');
     
     const photoCol = document.createElement('div');
     photoCol.className = 'col-md-3 col-6 mb-3';
     photoCol.innerHTML = `
         <div class="text-center">
-            <img src="${photoData}" class="captured-photo" alt="Photo ${number}">
+            <img src="${photoUrl}" class="captured-photo" alt="Photo ${number}">
             <div class="small text-muted">Photo ${number}</div>
         </div>
     `;
     
     photoContainer.appendChild(photoCol);
+    return photoCol;
 }
 
-function addPhotoToForm(photoData) {
+function addPhotoToForm(token) {
     let form = document.getElementById('gatePassForm');
     if (!form) {
         console.error('Gate pass form not found');
-        return;
+        return false;
     }
     
     const input = document.createElement('input');
     input.type = 'hidden';
-    input.name = 'captured_images[]';
-    input.value = photoData;
+    input.name = 'image_tokens[]';
+    input.value = token;
     
     form.appendChild(input);
+    return true;
+}
+
+// Resolves true once the token is in the form; false on failure or when the
+// capture run / file selection it belongs to has been replaced meanwhile
+function uploadPhoto(photoBlob, selection) {
+    return PhotoUpload.upload(photoBlob)
+        .then(token => selection === selectionId && addPhotoToForm(token))
+        .catch(err => {
+            if (selection === selectionId) alert('Photo upload failed: ' + err.message);
+            return false;
+        });
 }
 
 // Fallback function for file upload
@@ -176,39 +215,34 @@ function showFileUploadFallback() {
 function handleFileUpload(input) {
     const files = input.files;
     const uploadedPhotos = document.getElementById('uploadedPhotos');
-    const form = document.getElementById('gatePassForm');
     
-    // Clear existing photos
+    // Clear existing photos and their image tokens
     uploadedPhotos.innerHTML = '';
-    
-    // Remove existing file inputs
-    const existingFileInputs = form.querySelectorAll('input[name="uploaded_images[]"]');
-    existingFileInputs.forEach(input => input.remove());
+    startNewSelection();
+    const selection = selectionId;
     
     for (let i = 0; i < Math.min(files.length, 4); i++) {
         const file = files[i];
-        const reader = new FileReader();
         
-        reader.onload = function(e) {
-            // Display photo
-            const photoCol = document.createElement('div');
-            photoCol.className = 'col-md-3 col-6 mb-3';
-            photoCol.innerHTML = `
-                <div class="text-center">
-                    <img src="${e.target.result}" class="captured-photo" alt="Uploaded Photo ${i + 1}">
-                    <div class="small text-muted">Photo ${i + 1}</div>
-                </div>
-            `;
-            uploadedPhotos.appendChild(photoCol);
-            
-            // Create hidden input for base64 data
-            const hiddenInput = document.createElement('input');
-            hiddenInput.type = 'hidden';
-            hiddenInput.name = 'captured_images[]';
-            hiddenInput.value = e.target.result;
-            form.appendChild(hiddenInput);
-        };
+        // Display photo
+        const photoCol = document.createElement('div');
+        photoCol.className = 'col-md-3 col-6 mb-3';
+        photoCol.innerHTML = `
+            <div class="text-center">
+                <img src="${URL.createObjectURL(file)}" class="captured-photo" alt="Uploaded Photo ${i + 1}">
+                <div class="small text-muted">Photo ${i + 1}</div>
+            </div>
+        `;
+        uploadedPhotos.appendChild(photoCol);
         
-        reader.readAsDataURL(file);
+        // Upload the file as-is (no base64 round trip); mark the ones that need re-selecting
+        uploadPhoto(file, selection).then(added => {
+            if (added) {
+                photoCount++;
+            } else if (selection === selectionId) {
+                photoCol.querySelector('.small').innerHTML = '<span class="text-danger">Upload failed - select again</span>';
+            }
+        });
     }
+
 }
\ No newline at end of file
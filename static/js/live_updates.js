@@ -0,0 +1,95 @@
+// static/js/live_updates.js - PUSHED NOTIFICATIONS / COUNTER CHANGES (SSE WITH LONG-POLL FALLBACK)
+//
+// Pages listen for DOM events instead of polling:
+//   gatepass:notification  detail = {count, notifications: [{message, type, gate_pass_id}]}
+//   gatepass:counters      gate pass counters changed (returns badge, overdue alarm)
+//   gatepass:resync        events were dropped - refetch /check_notifications
+//                          (also fired every RESYNC_INTERVAL_MS as a safety net)
+const GatePassLive = (function() {
+    const STREAM_URL = '/stream/notifications';
+    const RESYNC_INTERVAL_MS = 60000;
+    let source = null;
+    let mode = null;
+    let started = false;
+
+    function emit(name, detail) {
+        document.dispatchEvent(new CustomEvent('gatepass:' + name, { detail: detail || {} }));
+    }
+
+    function startStream() {
+        mode = 'sse';
+        let opened = false;
+        source = new EventSource(STREAM_URL);
+
+        source.addEventListener('ready', () => { opened = true; });
+        source.addEventListener('notification', e => emit('notification', JSON.parse(e.data)));
+        source.addEventListener('counters', () => emit('counters'));
+        source.addEventListener('resync', () => emit('resync'));
+
+        source.onerror = function() {
+            // EventSource reconnects by itself after a normal close; only give up
+            // when the server refused the stream (503 / proxy that can't hold it)
+            if (!opened || source.readyState === EventSource.CLOSED) {
+                source.close();
+                source = null;
+                startLongPoll();
+            } else {
+                // Reconnected streams may have missed events while down
+                opened = false;
+                source.addEventListener('ready', () => emit('resync'), { once: true });
+            }
+        };
+    }
+
+    function startLongPoll() {
+        if (mode === 'poll') return;
+        mode = 'poll';
+        console.log('Live updates: falling back to long-poll');
+
+        function poll() {
+            fetch(STREAM_URL + '?mode=poll', { cache: 'no-store' })
+                .then(response => response.json().then(data => ({ status: response.status, data: data })))
+                .then(({ status, data }) => {
+                    if (status === 503 || !data.success) {
+                        setTimeout(poll, ((data && data.retry_after) || 5) * 1000);
+                        return;
+                    }
+                    data.events.forEach(item => emit(item.event, item.data));
+                    if (data.resync) emit('resync');
+                    poll();
+                })
+                .catch(() => setTimeout(poll, 10000));
+        }
+
+        poll();
+    }
+
+    function start() {
+        if (started) return;
+        started = true;
+        if (window.EventSource) {
+            startStream();
+        } else {
+            startLongPoll();
+        }
+        // Low-frequency fallback in case a push was missed (proxy hiccup, probe error)
+        setInterval(() => {
+            if (!document.hidden) emit('resync');
+        }, RESYNC_INTERVAL_MS);
+    }
+
+    // Collapse bursts of events (e.g. a batch of approvals) into one refresh
+    function debounce(fn, wait) {
+        let timer = null;
+        return function() {
+            clearTimeout(timer);
+            timer = setTimeout(fn, wait);
+        };
+    }
+
+    return {
+        start: start,
+        debounce: debounce,
+        mode: () => mode
+    };
+})();
@@ -0,0 +1,35 @@
+// static/js/photo_upload.js - STREAMED MATERIAL PHOTO UPLOADS (BINARY PUT -> IMAGE TOKEN)
+//
+// Each photo is sent as a raw JPEG body as soon as it is captured/selected;
+// the gate pass form only carries the returned tokens in image_tokens[].
+const PhotoUpload = (function() {
+    const UPLOAD_URL = '/gate_pass/photos';
+
+    // canvas -> JPEG Blob (binary, ~25% smaller than a base64 data URL)
+    function canvasToBlob(canvas, quality) {
+        return new Promise((resolve, reject) => {
+            canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Could not encode photo')),
+                          'image/jpeg', quality);
+        });
+    }
+
+    // Resolves with the image token, rejects with the server's message
+    function upload(blob) {
+        return fetch(UPLOAD_URL, {
+            method: 'PUT',
+            headers: { 'Content-Type': blob.type || 'image/jpeg' },
+            body: blob,
+            credentials: 'same-origin'
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.message || 'Photo upload failed');
+                return data.token;
+            });
+    }
+
+    return {
+        canvasToBlob: canvasToBlob,
+        upload: upload
+    };
+})();
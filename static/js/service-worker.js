@@ -38,6 +38,11 @@ self.addEventListener('activate', event => {
 });
 
 self.addEventListener('fetch', event => {
+    // Live notification streams / long-polls must always hit the network
+    if (event.request.url.includes('/stream/')) return;
+    // Uploads and form posts can't be cached (Cache.put only takes GET)
+    if (event.request.method !== 'GET') return;
+    
     event.respondWith(
         caches.match(event.request)
             .then(response => {